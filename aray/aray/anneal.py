@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# anneal.py - simulated annealing over poses with incremental energy
+
+import math
+import time
+import random
+import multiprocessing
+from dataclasses import dataclass, asdict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .types import Point
+from .problem import Problem
+from .boxlet import polygon_points
+from .valid import valid_pose
+from .rigid import rigid_placements
+from .timing import Profile, stage, count
+from .observe import Observer, LiveView
+
+
+@dataclass
+class AnnealStats:
+    ''' Throughput metrics for an annealing run '''
+    iterations: int = 0
+    accepted: int = 0
+    improved: int = 0  # new best valid poses found
+    seconds: float = 0.0
+
+    @property
+    def iterations_per_second(self) -> float:
+        return self.iterations / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.iterations if self.iterations > 0 else 0.0
+
+    def metrics(self) -> dict:
+        return dict(asdict(self),
+                    iterations_per_second=self.iterations_per_second,
+                    acceptance_rate=self.acceptance_rate)
+
+
+def outside_distance(inside: np.ndarray) -> np.ndarray:
+    ''' Get the city-block distance from each grid cell to the nearest inside cell '''
+    # city-block distance is separable, so sweep each axis forwards and back
+    far = inside.shape[0] + inside.shape[1]
+    distance = np.where(inside, 0, far)
+    for axis in (0, 1):
+        d = np.moveaxis(distance, axis, 0)  # a view, so sweeps write through
+        for i in range(1, d.shape[0]):
+            np.minimum(d[i], d[i - 1] + 1, out=d[i])
+        for i in range(d.shape[0] - 2, -1, -1):
+            np.minimum(d[i], d[i + 1] + 1, out=d[i])
+    return distance
+
+
+class Annealer:
+    ''' Single-vertex move annealer with energy terms updated per move
+
+    Energy is a weighted sum of the edge stretch beyond epsilon, how far
+    vertices and edge midpoints sit outside the hole, and the dislikes.
+    Escape is looked up on a grid at double resolution, so that edge
+    midpoints land exactly on it.
+    A move only touches the moved vertex's edges and one column of the
+    hole-to-pose distance matrix, so it costs O(degree + H).
+    '''
+
+    def __init__(self, problem: Problem, vertices: Optional[List[Point]] = None,
+                 seed: Optional[int] = None, stretch_weight: float = 100.0,
+                 escape_weight: float = 10.0, dislike_weight: float = 0.01):
+        self.problem = problem
+        self.rng = random.Random(seed)
+        self.stretch_weight = stretch_weight
+        self.escape_weight = escape_weight
+        self.dislike_weight = dislike_weight
+        # doubled hole lattice as a grid over the bounding box
+        hole = np.array(problem.hole, dtype=np.int64)
+        self.hole = hole
+        self.lo = hole.min(axis=0)
+        self.hi = hole.max(axis=0)
+        shape = tuple(2 * (self.hi - self.lo) + 1)
+        inside = np.zeros(shape, dtype=bool)
+        doubled = [Point(2 * h.x, 2 * h.y) for h in problem.hole]
+        points = np.array(sorted(polygon_points(doubled)), dtype=np.int64)
+        inside[points[:, 0] - 2 * self.lo[0], points[:, 1] - 2 * self.lo[1]] = True
+        self.outside = outside_distance(inside)
+        # figure
+        self.edges = np.array(problem.edges, dtype=np.int64).reshape(-1, 2)
+        self.d_old = np.array(problem.dists, dtype=np.float64)
+        self.slack = problem.epsilon / 1e6
+        n = len(problem.vertices)
+        self.incident = [np.array(problem.edge_map.get(i, []), dtype=np.int64)
+                         for i in range(n)]
+        self.neighbors = [np.where(self.edges[e, 0] == i, self.edges[e, 1], self.edges[e, 0])
+                          for i, e in enumerate(self.incident)]
+        if vertices is None:
+            vertices = self.centered_start()
+        self.reset(vertices)
+        self.stats = AnnealStats()
+        self.best: Optional[List[Point]] = None
+        self.best_dislikes: Optional[int] = None
+
+    def centered_start(self) -> List[Point]:
+        ''' Get the original figure translated to the middle of the hole '''
+        original = np.array(self.problem.vertices, dtype=np.int64)
+        shift = (self.lo + self.hi) // 2 - (original.min(axis=0) + original.max(axis=0)) // 2
+        return [Point(*p) for p in np.clip(original + shift, self.lo, self.hi).tolist()]
+
+    def reset(self, vertices: List[Point]):
+        ''' Set the pose and recompute every energy term from scratch '''
+        pose = np.array(vertices, dtype=np.int64).reshape(-1, 2)
+        self.pose = np.clip(pose, self.lo, self.hi)
+        a, b = self.pose[self.edges[:, 0]], self.pose[self.edges[:, 1]]
+        self.stretch = self.edge_stretch(((a - b) ** 2).sum(axis=1), self.d_old)
+        self.edge_escape = self.escape(a + b)
+        self.vertex_escape = self.escape(2 * self.pose)
+        # hole vertex x pose vertex squared distances, and the nearest per hole vertex
+        self.hole_dists = ((self.hole[:, None, :] - self.pose[None, :, :]) ** 2).sum(axis=2)
+        self.nearest = self.hole_dists.min(axis=1)
+        self.dislikes = int(self.nearest.sum())
+        self.penalty = self.constraint_energy  # running total, kept up to date by apply
+
+    def edge_stretch(self, d_new: np.ndarray, d_old: np.ndarray) -> np.ndarray:
+        ''' Get how far each edge is stretched beyond epsilon '''
+        return np.maximum(np.abs(d_new / d_old - 1) - self.slack, 0)
+
+    def escape(self, doubled: np.ndarray) -> np.ndarray:
+        ''' Get how far each point, given in doubled coordinates, is outside the hole '''
+        return self.outside[doubled[..., 0] - 2 * self.lo[0], doubled[..., 1] - 2 * self.lo[1]]
+
+    @property
+    def constraint_energy(self) -> float:
+        ''' Get the penalty part of the energy, zero for (nearly) valid poses '''
+        return (self.stretch_weight * self.stretch.sum()
+                + self.escape_weight * (self.edge_escape.sum() + self.vertex_escape.sum()))
+
+    @property
+    def energy(self) -> float:
+        return self.penalty + self.dislike_weight * self.dislikes
+
+    def move_delta(self, v: int, p: np.ndarray) -> Tuple[float, tuple]:
+        ''' Get the change in energy from moving vertex v to p, and the new terms '''
+        edges, nbrs = self.incident[v], self.neighbors[v]
+        others = self.pose[nbrs]
+        stretch = self.edge_stretch(((others - p) ** 2).sum(axis=1), self.d_old[edges])
+        edge_escape = self.escape(others + p)
+        vertex_escape = self.escape(2 * p)
+        column = ((self.hole - p) ** 2).sum(axis=1)
+        nearest = np.minimum(self.nearest, column)
+        # hole vertices whose nearest pose vertex was v, and now is further away
+        lost = np.flatnonzero((self.hole_dists[:, v] == self.nearest) & (column > self.nearest))
+        if len(lost):
+            rows = self.hole_dists[lost].copy()
+            rows[:, v] = column[lost]
+            nearest[lost] = rows.min(axis=1)
+        penalty = (self.stretch_weight * (stretch.sum() - self.stretch[edges].sum())
+                   + self.escape_weight * (edge_escape.sum() - self.edge_escape[edges].sum()
+                                           + vertex_escape - self.vertex_escape[v]))
+        dislikes = int(nearest.sum())
+        delta = penalty + self.dislike_weight * (dislikes - self.dislikes)
+        return delta, (stretch, edge_escape, vertex_escape, column, nearest, penalty, dislikes)
+
+    def apply(self, v: int, p: np.ndarray, terms: tuple):
+        ''' Commit a move computed by move_delta '''
+        stretch, edge_escape, vertex_escape, column, nearest, penalty, dislikes = terms
+        edges = self.incident[v]
+        self.pose[v] = p
+        self.stretch[edges] = stretch
+        self.edge_escape[edges] = edge_escape
+        self.vertex_escape[v] = vertex_escape
+        self.hole_dists[:, v] = column
+        self.nearest = nearest
+        self.dislikes = dislikes
+        self.penalty += penalty
+
+    def propose(self, radius: int) -> Tuple[int, np.ndarray]:
+        ''' Pick a random vertex and a random nearby spot for it '''
+        v = self.rng.randrange(len(self.pose))
+        dx = self.rng.randint(-radius, radius)
+        dy = self.rng.randint(-radius, radius)
+        p = np.clip(self.pose[v] + (dx, dy), self.lo, self.hi)
+        return v, p
+
+    def record(self):
+        ''' Keep the current pose if it is valid and the best so far '''
+        dislikes = self.dislikes
+        if self.best_dislikes is not None and dislikes >= self.best_dislikes:
+            return
+        vertices = [Point(*p) for p in self.pose.tolist()]
+        if valid_pose(self.problem, vertices):
+            self.best = vertices
+            self.best_dislikes = dislikes
+            self.stats.improved += 1
+
+    def run(self, iterations: int, t_start: float = 10.0, t_end: float = 0.01,
+            max_radius: Optional[int] = None, observer: Optional[Observer] = None) -> Optional[List[Point]]:
+        ''' Anneal on a geometric cooling schedule, return the best valid pose found
+
+        observer, if given, sees (iteration, pose, dislikes) every iteration.
+        '''
+        if max_radius is None:
+            max_radius = max(1, int(max(self.hi - self.lo)) // 8)
+        start = time.time()
+        cooling = (t_end / t_start) ** (1 / max(1, iterations))
+        temperature = t_start
+        for _ in range(iterations):
+            radius = max(1, round(max_radius * temperature / t_start))
+            v, p = self.propose(radius)
+            delta, terms = self.move_delta(v, p)
+            if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                self.apply(v, p, terms)
+                self.stats.accepted += 1
+                # the running penalty drifts in floating point, so confirm in full
+                if self.penalty < 1e-6 and self.constraint_energy == 0:
+                    self.penalty = 0.0
+                    self.record()
+            temperature *= cooling
+            self.stats.iterations += 1
+            if observer is not None:
+                observer.observe(self.stats.iterations, self.pose, self.dislikes)
+        self.stats.seconds += time.time() - start
+        return self.best
+
+
+def _anneal_start(args) -> Tuple[Optional[int], Optional[List[Point]], dict]:
+    number, seed, vertices, iterations, t_start, t_end = args
+    annealer = Annealer(Problem.get(number), vertices, seed=seed)
+    annealer.run(iterations, t_start, t_end)
+    return annealer.best_dislikes, annealer.best, annealer.stats.metrics()
+
+
+def multistart(number: int, starts: int, iterations: int, processes: Optional[int] = None,
+               t_start: float = 10.0, t_end: float = 0.01):
+    ''' Anneal problem number from several seeds in a process pool
+
+    Starts from the best rigid placements of the figure where there are any,
+    and the centered figure otherwise.
+    Returns the best (dislikes, vertices) found, or (None, None), and the
+    metrics of every start.
+    '''
+    seeds = [p.vertices for p in rigid_placements(Problem.get(number), limit=starts)]
+    count('rigid_seeds', len(seeds))
+    seeds += [None] * (starts - len(seeds))
+    tasks = [(number, seed, vertices, iterations, t_start, t_end)
+             for seed, vertices in enumerate(seeds)]
+    best_dislikes, best, metrics = None, None, []
+    with stage('anneal'), multiprocessing.Pool(processes) as pool:
+        for dislikes, vertices, stats in pool.imap_unordered(_anneal_start, tasks):
+            metrics.append(stats)
+            count('iterations', stats['iterations'])
+            if dislikes is not None and (best_dislikes is None or dislikes < best_dislikes):
+                best_dislikes, best = dislikes, vertices
+    return (best_dislikes, best), metrics
+
+
+if __name__ == '__main__':
+    import json
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('problem_number', type=int)
+    parser.add_argument('-s', '--starts', type=int, default=8)
+    parser.add_argument('-i', '--iterations', type=int, default=100_000)
+    parser.add_argument('-p', '--processes', type=int, default=None)
+    parser.add_argument('--profile', default=None, help='append a JSON timing record to this file')
+    parser.add_argument('-w', '--watch', action='store_true', help='watch one start live instead')
+    args = parser.parse_args()
+    if args.watch:
+        annealer = Annealer(Problem.get(args.problem_number), seed=0)
+        with LiveView(args.problem_number) as view:
+            annealer.run(args.iterations, observer=view)
+            view.flush(annealer.stats.iterations, annealer.best or annealer.pose, annealer.best_dislikes)
+        dislikes, vertices = annealer.best_dislikes, annealer.best
+        print(json.dumps(annealer.stats.metrics()))
+    else:
+        with Profile('anneal', args.problem_number, args.profile, starts=args.starts,
+                     iterations=args.iterations) as profile:
+            (dislikes, vertices), metrics = multistart(
+                args.problem_number, args.starts, args.iterations, args.processes)
+            profile.info['dislikes'] = dislikes
+        for m in metrics:
+            print(json.dumps(m))
+    print('best dislikes', dislikes)
+    if vertices is not None:
+        print(json.dumps({'vertices': vertices}))
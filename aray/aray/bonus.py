@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# bonus.py - which bonuses poses unlock, and which unlocks to chase
+
+import glob
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from .types import Point
+from .problem import Problem, Bonus, BONUSES, BASE_PATH
+from .util import dist
+
+
+def unlocked(problem: Problem, vertices: List[Point]) -> List[Bonus]:
+    ''' Get the bonuses a pose unlocks, by having a vertex on their position '''
+    placed = set(Point(*v) for v in vertices)
+    return [b for b in problem.bonuses if b.position in placed]
+
+
+def unlock_cost(bonus: Bonus, vertices: Optional[List[Point]]) -> Optional[int]:
+    ''' Get the squared distance from a pose to a bonus position, zero if unlocked, None without a pose '''
+    if vertices is None:
+        return None
+    return min(dist(bonus.position, Point(*v)) for v in vertices)
+
+
+@dataclass
+class Chase:
+    ''' A bonus to unlock in one problem's pose, to use in another's '''
+    source: int  # problem whose pose must cover the bonus position
+    bonus: Bonus  # bonus.problem is the problem it gets used in
+    cost: Optional[int]  # squared distance the source pose is from it, None without a pose
+
+    @property
+    def unlocked(self) -> bool:
+        return self.cost == 0
+
+
+class BonusGraph:
+    ''' Directed graph of problems, with an edge from each problem to where its bonuses can be used '''
+
+    def __init__(self, problems: Dict[int, Problem]):
+        self.problems = problems
+        # map from target problem -> list of (source problem, bonus)
+        self.incoming: Dict[int, List[Chase]] = {n: [] for n in problems}
+        for source, problem in problems.items():
+            for bonus in problem.bonuses:
+                self.incoming.setdefault(bonus.problem, []).append(Chase(source, bonus, None))
+
+    @classmethod
+    def load(cls, numbers: Optional[Iterable[int]] = None) -> 'BonusGraph':
+        ''' Load a graph over the given problems, or every downloaded one '''
+        if numbers is None:
+            paths = glob.glob(os.path.join(BASE_PATH, 'problems', '*.json'))
+            numbers = sorted(int(os.path.basename(p)[:-len('.json')]) for p in paths)
+        return cls({n: Problem.get(n) for n in numbers})
+
+    def available(self, target: int) -> List[Chase]:
+        ''' Get the bonuses other problems can unlock for target '''
+        return list(self.incoming.get(target, []))
+
+    def plan(self, poses: Dict[int, List[Point]], targets: Optional[Iterable[int]] = None,
+             kinds: Sequence[str] = BONUSES) -> Dict[int, Chase]:
+        ''' Pick, per target problem, the bonus to use given the current poses
+
+        Bonuses already unlocked by the current poses come first, then ones
+        whose source pose is nearest to the position (so cheapest to bend
+        onto it), then by the order of kinds. Sources without a pose come
+        last. Each pose can only use one bonus, so at most one is picked per
+        target; any target whose kinds have no bonus available is left out.
+        '''
+        if targets is None:
+            targets = self.problems.keys()
+        plan = {}
+        for target in targets:
+            options = []
+            for chase in self.available(target):
+                if chase.bonus.bonus not in kinds:
+                    continue
+                cost = unlock_cost(chase.bonus, poses.get(chase.source))
+                options.append(Chase(chase.source, chase.bonus, cost))
+            if options:
+                plan[target] = min(options, key=lambda c: (
+                    c.cost is None, c.cost or 0, kinds.index(c.bonus.bonus)))
+        return plan
+
+
+if __name__ == '__main__':
+    import json
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('poses', nargs='*', help='pose files named <problem>-*.json')
+    parser.add_argument('-k', '--kinds', nargs='+', default=list(BONUSES), choices=BONUSES)
+    args = parser.parse_args()
+    poses = {}
+    for path in args.poses:
+        number = int(os.path.basename(path).split('-')[0])
+        with open(path) as f:
+            poses[number] = [Point(*v) for v in json.load(f)['vertices']]
+    graph = BonusGraph.load()
+    for target, chase in sorted(graph.plan(poses, kinds=args.kinds).items()):
+        status = 'unlocked' if chase.unlocked else f'cost {chase.cost}'
+        print(f'{target}: {chase.bonus.bonus} from {chase.source} at {tuple(chase.bonus.position)} ({status})')
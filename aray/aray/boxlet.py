@@ -2,7 +2,6 @@
 # boxlet.py - Boxlet class and utilities
 
 # %%
-import matplotlib.pyplot as plt
 import random
 from collections import namedtuple, defaultdict
 from dataclasses import dataclass
@@ -12,6 +11,7 @@ from .util import floor, ceil
 from .types import Point, Quad
 from .intersect import intersections
 from .partition import partition
+from .timing import timed
 
 
 @dataclass
@@ -80,6 +80,7 @@ class Boxlet:
                 yield Point(t.x, y)
 
 
+@timed('lattice')
 def polygon_points(polygon: List[Point]) -> Set[Point]:
     """ Get all of the points inside a polygon """
     points = set()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# cpsat.py - CP-SAT encodings of poses in the hole, needs ortools
+'''
+Ways to keep pose edges inside the hole:
+
+- forbidden tables: forbid every (ax, ay, bx, by) assignment of an edge that leaves
+  the hole, as in golf's constrain_forbidden; exact, but the tables grow
+  with lattice points times ring size and explode on big holes
+- allowed tables: the complement, every assignment that stays inside, from
+  tables.allowed_tables; exact and no lazy cuts, but larger still
+- crossings: forbid a pose edge from properly crossing a hole edge, with
+  sign literals of orientation expressions, as prototyped in golf/multiply.py
+
+Crossings only rule out proper crossings, so edges that leave the hole
+through a hole vertex or run along outside are left to the lazy cuts of
+PoseModel.solve, like golf's valid_solution.
+'''
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from ortools.sat.python.cp_model import CpModel, CpSolver, Domain, IntVar, OPTIMAL, FEASIBLE
+
+from .types import Point, Pair
+from .problem import Problem
+from .boxlet import polygon_points
+from .stretch import center_stretch
+from .valid import edges_in_hole, pocket_edges
+from .tables import Lattice, pair_tables, allowed_table, index_rows
+from .plan import Plan, ALLOWED, FORBIDDEN, CROSSING
+
+# a pose vertex as CP-SAT variables, anything with x, y like golf's Coord
+VarPoint = Tuple[IntVar, IntVar]
+# (min x, min y, max x, max y) of the pose variables
+Bound = Tuple[int, int, int, int]
+
+
+def hole_bound(hole: List[Point]) -> Bound:
+    xs, ys = [h.x for h in hole], [h.y for h in hole]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def column_runs(points: Sequence[Point]) -> List[Tuple[int, int, int]]:
+    ''' Get the (x, y_lo, y_hi) runs of consecutive lattice points down each column
+
+    A table over these and y_lo <= y <= y_hi is exact, and far smaller than
+    a table of the points themselves on big holes.
+    '''
+    runs = []
+    for x, y in sorted(points):
+        if runs and runs[-1][0] == x and runs[-1][2] == y - 1:
+            runs[-1][2] = y
+        else:
+            runs.append([x, y, y])
+    return [tuple(r) for r in runs]
+
+
+def sign_literals(model: CpModel, expr, name: str):
+    ''' Get literals (pos, neg) that must be true when expr > 0 and expr < 0
+
+    Only that direction is enforced, which is all that forbidding a sign
+    pattern needs: the solver is free to leave both false at zero.
+    '''
+    pos = model.NewBoolVar(f'{name}>0')
+    neg = model.NewBoolVar(f'{name}<0')
+    model.Add(expr <= 0).OnlyEnforceIf(pos.Not())
+    model.Add(expr >= 0).OnlyEnforceIf(neg.Not())
+    model.AddAtMostOne([pos, neg])
+    return pos, neg
+
+
+class Crossings:
+    ''' Constrain segments between pose vertices to not properly cross the pocket edges of the hole
+
+    For pose edge a-b and hole edge u-v, a proper crossing is a and b
+    strictly on opposite sides of line u-v, and u and v strictly on opposite
+    sides of line a-b. With the hole fixed the first side test is linear in
+    a. The second, cross(b - a, u - a), is bilinear, but it expands to
+    (bx - ax) * uy - (by - ay) * ux - (bx * ay - by * ax), where only the
+    last term multiplies variables and it doesn't depend on u. So each pose
+    edge costs two AddMultiplicationEquality and everything else is linear
+    sign literals, shared between the edges of a vertex and the two hole
+    edges of a hole vertex.
+    '''
+
+    def __init__(self, model: CpModel, hole: List[Point], pose_vars: Sequence[VarPoint],
+                 bound: Optional[Bound] = None, edges: Optional[List[int]] = None):
+        self.model = model
+        self.hole = hole
+        self.pose_vars = pose_vars
+        self.bound = bound if bound is not None else hole_bound(hole)
+        self.edges = pocket_edges(hole) if edges is None else edges
+        self.sides = {}  # (pose vertex, hole edge) -> sign literals of the vertex against the hole edge line
+        self.products = 0  # AddMultiplicationEquality constraints added
+
+    def side(self, j: int, i: int):
+        ''' Get the sign literals of pose vertex j against the line of hole edge i '''
+        if (j, i) not in self.sides:
+            (px, py), u, v = self.pose_vars[j], self.hole[i], self.hole[(i + 1) % len(self.hole)]
+            expr = (v.x - u.x) * (py - u.y) - (v.y - u.y) * (px - u.x)
+            self.sides[j, i] = sign_literals(self.model, expr, f'S{j}H{i}')
+        return self.sides[j, i]
+
+    def cross_term(self, j: int, k: int) -> IntVar:
+        ''' Get a variable equal to bx * ay - by * ax for pose vertices a = j, b = k '''
+        ax, ay = self.pose_vars[j]
+        bx, by = self.pose_vars[k]
+        lo_x, lo_y, hi_x, hi_y = self.bound
+        corners = [x * y for x in (lo_x, hi_x) for y in (lo_y, hi_y)]
+        lo, hi = min(corners), max(corners)
+        bxay = self.model.NewIntVar(lo, hi, f'P{k}xP{j}y')
+        byax = self.model.NewIntVar(lo, hi, f'P{k}yP{j}x')
+        self.model.AddMultiplicationEquality(bxay, [bx, ay])
+        self.model.AddMultiplicationEquality(byax, [by, ax])
+        self.products += 2
+        term = self.model.NewIntVar(lo - hi, hi - lo, f'X{j}_{k}')
+        self.model.Add(term == bxay - byax)
+        return term
+
+    def add(self, j: int, k: int, enforce: Sequence = ()) -> int:
+        ''' Forbid pose edge j-k from properly crossing any pocket edge, return how many were constrained
+
+        enforce is as for OnlyEnforceIf, e.g. to let a WALLHACK vertex's edges out.
+        '''
+        if not self.edges:
+            return 0
+        (ax, ay), (bx, by) = self.pose_vars[j], self.pose_vars[k]
+        term = self.cross_term(j, k)
+        corners = {}  # hole vertex -> sign literals of it against line a-b
+        for h in {h for i in self.edges for h in (i, (i + 1) % len(self.hole))}:
+            u = self.hole[h]
+            expr = (bx - ax) * u.y - (by - ay) * u.x - term
+            corners[h] = sign_literals(self.model, expr, f'S{j}_{k}H{h}')
+        for i in self.edges:
+            a_pos, a_neg = self.side(j, i)
+            b_pos, b_neg = self.side(k, i)
+            u_pos, u_neg = corners[i]
+            v_pos, v_neg = corners[(i + 1) % len(self.hole)]
+            # not (a, b straddle line u-v and u, v straddle line a-b), over the four sign patterns
+            for a, b in ((a_pos, b_neg), (a_neg, b_pos)):
+                for u, v in ((u_pos, v_neg), (u_neg, v_pos)):
+                    clause = self.model.AddBoolOr([a.Not(), b.Not(), u.Not(), v.Not()])
+                    if enforce:
+                        clause.OnlyEnforceIf(list(enforce))
+        return len(self.edges)
+
+
+def model_size(model: CpModel) -> Dict:
+    ''' Count what's in a model: variables, constraints, table values and products '''
+    proto = model.Proto()
+    tables = products = 0
+    for constraint in proto.constraints:
+        if constraint.has_table():
+            tables += len(constraint.table.values)
+        elif constraint.has_int_prod():
+            products += 1
+    return dict(variables=len(proto.variables), constraints=len(proto.constraints),
+                table_values=tables, products=products)
+
+
+class PoseModel:
+    ''' A CP-SAT model of a pose: vertices on the lattice points of the hole, edges on their rings
+
+    Nothing keeps edges inside the hole until one of the add_ methods is
+    called; solve() then cuts off any invalid edge it still finds.
+    '''
+
+    def __init__(self, problem: Problem):
+        self.problem = problem
+        self.bound = hole_bound(problem.hole)
+        self.model = CpModel()
+        lo_x, lo_y, hi_x, hi_y = self.bound
+        self.runs = column_runs(polygon_points(problem.hole))
+        self.pose_vars = []
+        for i in range(len(problem.vertices)):
+            x = self.model.NewIntVar(lo_x, hi_x, f'P{i}x')
+            y = self.model.NewIntVar(lo_y, hi_y, f'P{i}y')
+            y_lo = self.model.NewIntVar(lo_y, hi_y, f'P{i}ylo')
+            y_hi = self.model.NewIntVar(lo_y, hi_y, f'P{i}yhi')
+            self.model.AddAllowedAssignments([x, y_lo, y_hi], self.runs)
+            self.model.Add(y_lo <= y)
+            self.model.Add(y <= y_hi)
+            self.pose_vars.append(Point(x, y))
+        self.rings = {d: center_stretch(d, problem.epsilon) for d in set(problem.dists)}
+        for (j, k), d in zip(problem.edges, problem.dists):
+            a, b = self.pose_vars[j], self.pose_vars[k]
+            dx = self.model.NewIntVar(lo_x - hi_x, hi_x - lo_x, f'E{j}_{k}x')
+            dy = self.model.NewIntVar(lo_y - hi_y, hi_y - lo_y, f'E{j}_{k}y')
+            self.model.Add(dx == b.x - a.x)
+            self.model.Add(dy == b.y - a.y)
+            self.model.AddAllowedAssignments([dx, dy], self.rings[d])
+        self.rounds = 0  # solves, each after the first follows a round of cuts
+        self.cuts = 0
+
+    def add_forbidden(self, forbidden_edges: List[List[Pair]]):
+        ''' Forbid the assignments per edge, as from forbidden.forbidden '''
+        for (j, k), pairs in zip(self.problem.edges, forbidden_edges):
+            if pairs:
+                a, b = self.pose_vars[j], self.pose_vars[k]
+                self.model.AddForbiddenAssignments([a.x, a.y, b.x, b.y],
+                                                   [(p.a.x, p.a.y, p.b.x, p.b.y) for p in pairs])
+
+    def add_allowed(self, tables: Dict[int, np.ndarray], edges: Optional[List[int]] = None):
+        ''' Allow only the table rows for the given edges (default all), tables per length as from tables.allowed_tables '''
+        for i in range(len(self.problem.edges)) if edges is None else edges:
+            (j, k), d = self.problem.edges[i], self.problem.dists[i]
+            a, b = self.pose_vars[j], self.pose_vars[k]
+            self.model.AddAllowedAssignments([a.x, a.y, b.x, b.y], tables[d].tolist())
+
+    def add_plan(self, plan: Plan, lattice: Optional[Lattice] = None):
+        ''' Encode each edge class as planned by plan.plan; free and lazy classes need nothing here '''
+        lattice = lattice or Lattice(self.problem.hole)
+        for c in plan.classes:
+            if c.encoding not in (ALLOWED, FORBIDDEN):
+                continue
+            allowed, forbidden = pair_tables(lattice, self.rings[c.d])
+            # one python list per class, shared by its edges
+            table = (allowed if c.encoding == ALLOWED else forbidden).tolist()
+            if c.encoding == FORBIDDEN and not table:
+                continue
+            add = self.model.AddAllowedAssignments if c.encoding == ALLOWED else self.model.AddForbiddenAssignments
+            for i in c.edges:
+                a, b = (self.pose_vars[j] for j in self.problem.edges[i])
+                add([a.x, a.y, b.x, b.y], table)
+        if plan.edges(CROSSING):
+            self.add_crossings(plan.edges(CROSSING))
+
+    def add_crossings(self, edges: Optional[List[int]] = None) -> Crossings:
+        ''' Forbid the given pose edges (default all) from crossing pocket edges '''
+        crossings = Crossings(self.model, self.problem.hole, self.pose_vars, self.bound)
+        for i in range(len(self.problem.edges)) if edges is None else edges:
+            crossings.add(*self.problem.edges[i])
+        return crossings
+
+    def size(self) -> Dict:
+        return model_size(self.model)
+
+    def solve(self, timeout: float = 60.0, max_rounds: int = 100) -> Optional[List[Point]]:
+        ''' Solve, cutting off invalid edges and solving again, until a valid pose or timeout '''
+        solver = CpSolver()
+        deadline = time.perf_counter() + timeout
+        edges = np.array(self.problem.edges, dtype=np.int64)
+        for _ in range(max_rounds):
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                return None
+            solver.parameters.max_time_in_seconds = left
+            self.rounds += 1
+            if solver.Solve(self.model) not in (OPTIMAL, FEASIBLE):
+                return None
+            vertices = np.array([(solver.Value(p.x), solver.Value(p.y)) for p in self.pose_vars], dtype=np.int64)
+            ok = edges_in_hole(self.problem.hole, vertices[edges[:, 0]], vertices[edges[:, 1]],
+                               check_endpoints=False)
+            if ok.all():
+                return [Point(int(x), int(y)) for x, y in vertices]
+            for i in np.flatnonzero(~ok):
+                j, k = edges[i]
+                a, b = self.pose_vars[j], self.pose_vars[k]
+                self.model.AddForbiddenAssignments([a.x, a.y, b.x, b.y], [tuple(vertices[[j, k]].ravel().tolist())])
+                self.cuts += 1
+        return None
+
+
+class IndexModel(PoseModel):
+    ''' A CP-SAT model of a pose with one variable per vertex, its index into the hole's lattice points
+
+    x and y follow from the index by AddElement, and each edge is a table of
+    allowed (index a, index b) pairs, half the arity of the (ax, ay, bx, by)
+    tables. The tables are exact, so nothing is left to cut, and each vertex
+    starts out with only the indexes every one of its edges allows.
+    '''
+
+    def __init__(self, problem: Problem, lattice: Optional[Lattice] = None, max_rows: Optional[int] = None):
+        self.problem = problem
+        self.bound = hole_bound(problem.hole)
+        self.model = CpModel()
+        self.lattice = lattice or Lattice(problem.hole)
+        self.rings = {d: center_stretch(d, problem.epsilon) for d in set(problem.dists)}
+        self.tables = {d: index_rows(self.lattice, allowed_table(self.lattice, ring, max_rows))
+                       for d, ring in self.rings.items()}
+        # a vertex can only be where each of its edges has a row starting
+        domains = [None] * len(problem.vertices)
+        for (j, k), d in zip(problem.edges, problem.dists):
+            for v, column in ((j, 0), (k, 1)):
+                values = np.unique(self.tables[d][:, column])
+                domains[v] = values if domains[v] is None else np.intersect1d(domains[v], values)
+        xs, ys = self.lattice.points[:, 0].tolist(), self.lattice.points[:, 1].tolist()
+        lo_x, lo_y, hi_x, hi_y = self.bound
+        self.index_vars, self.pose_vars = [], []
+        for i, values in enumerate(domains):
+            values = range(len(xs)) if values is None else values.tolist()
+            index = self.model.NewIntVarFromDomain(Domain.FromValues(values), f'P{i}')
+            x = self.model.NewIntVar(lo_x, hi_x, f'P{i}x')
+            y = self.model.NewIntVar(lo_y, hi_y, f'P{i}y')
+            self.model.AddElement(index, xs, x)
+            self.model.AddElement(index, ys, y)
+            self.index_vars.append(index)
+            self.pose_vars.append(Point(x, y))
+        for (j, k), d in zip(problem.edges, problem.dists):
+            self.model.AddAllowedAssignments([self.index_vars[j], self.index_vars[k]], self.tables[d].tolist())
+        self.rounds = 0
+        self.cuts = 0
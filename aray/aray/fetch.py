@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# fetch.py - concurrent problem downloads into the one problem cache every solver reads
+
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .problem import CACHE_ENV, DEFAULT_CACHE, cache_path, problem_path
+from .submit import api_url, KEY_ENV, RETRY_STATUS
+
+NUM_PROBLEMS = 132
+
+# how a problem got into the cache
+CACHED = 'cached'  # already there and intact, no request made
+FETCHED = 'fetched'  # downloaded
+UNCHANGED = 'unchanged'  # revalidated, the server answered 304
+
+
+def meta_dir(cache: Optional[str] = None) -> str:
+    ''' Where downloads keep their metadata and partial files, so the cache itself only holds problems '''
+    return os.path.join(cache_path(cache), '.meta')
+
+
+def meta_path(number: int, cache: Optional[str] = None) -> str:
+    ''' Sidecar with the ETag and content hash of a downloaded problem '''
+    return os.path.join(meta_dir(cache), f'{number}.etag')
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+# map from problem path -> (stat key, metadata), so each file is hashed once per process
+_intact: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+
+
+def intact(number: int, cache: Optional[str] = None) -> Optional[Dict]:
+    ''' Get the cached problem's metadata if it is intact, else None
+
+    Downloaded problems must still match the hash recorded with them, ones
+    that came with the repo only have to parse. A file is only checked again
+    once its size or modification time changes.
+    '''
+    path = problem_path(number, cache)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    if path in _intact and _intact[path][0] == key:
+        return _intact[path][1]
+    with open(path, 'rb') as f:
+        data = f.read()
+    meta_file = meta_path(number, cache)
+    if os.path.exists(meta_file):
+        with open(meta_file) as f:
+            meta = json.load(f)
+        if meta.get('sha256') != content_hash(data):
+            return None
+    else:
+        try:
+            json.loads(data)
+        except ValueError:
+            return None
+        meta = {'sha256': content_hash(data)}
+    _intact[path] = (key, meta)
+    return meta
+
+
+@dataclass
+class Fetch:
+    number: int
+    path: str
+    state: str  # CACHED, FETCHED or UNCHANGED
+
+
+class Fetcher:
+    ''' Fill the problem cache over one pooled session, a thread per connection
+
+    Intact cached problems are used as they are, unless revalidate, which
+    asks the server with If-None-Match instead.
+    '''
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 cache: Optional[str] = None, concurrency: int = 16,
+                 retries: int = 3, timeout: float = 30.0):
+        self.api_key = api_key
+        self.base_url = (base_url or api_url()).rstrip('/')
+        self.cache = cache_path(cache)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.session = requests.Session()
+        # idempotent GETs, so urllib3 can do the retrying
+        retry = Retry(total=retries, backoff_factor=0.2, status_forcelist=RETRY_STATUS,
+                      respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __enter__(self) -> 'Fetcher':
+        return self
+
+    def __exit__(self, *exc):
+        self.session.close()
+
+    def headers(self) -> Dict:
+        # only needed on a miss, so a warm cache works without a key
+        api_key = self.api_key if self.api_key is not None else os.environ[KEY_ENV]
+        return {'Authorization': 'Bearer ' + api_key}
+
+    def fetch(self, number: int, revalidate: bool = False) -> Fetch:
+        ''' Make sure problem number is in the cache, downloading it if needed '''
+        path = problem_path(number, self.cache)
+        meta = intact(number, self.cache)
+        if meta is not None and not revalidate:
+            return Fetch(number, path, CACHED)
+        headers = self.headers()
+        if meta is not None and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        r = self.session.get(f'{self.base_url}/api/problems/{number}', headers=headers, timeout=self.timeout)
+        if r.status_code == 304:
+            return Fetch(number, path, UNCHANGED)
+        r.raise_for_status()
+        data = r.content
+        json.loads(data)  # don't cache anything that isn't a problem
+        meta = dict(etag=r.headers.get('ETag'), sha256=content_hash(data))
+        os.makedirs(meta_dir(self.cache), exist_ok=True)
+        # write then rename, so readers in other processes never see half a file
+        for target, body in ((path, data), (meta_path(number, self.cache), json.dumps(meta).encode())):
+            tmp = os.path.join(meta_dir(self.cache), f'{os.path.basename(target)}.{os.getpid()}.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, target)
+        return Fetch(number, path, FETCHED)
+
+    def prefetch(self, numbers: Iterable[int], revalidate: bool = False) -> Dict[int, Fetch]:
+        ''' Fetch all the problems at once, return how each got into the cache '''
+        numbers = list(numbers)
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            fetches = pool.map(lambda n: self.fetch(n, revalidate), numbers)
+            return dict(zip(numbers, fetches))
+
+
+def fetch_problem(number: int, cache: Optional[str] = None) -> str:
+    ''' Get the path to a cached problem, downloading it on a miss '''
+    if intact(number, cache) is not None:
+        return problem_path(number, cache)
+    with Fetcher(cache=cache, concurrency=1) as fetcher:
+        return fetcher.fetch(number).path
+
+
+def load_problem(number: int, cache: Optional[str] = None) -> Dict:
+    ''' Get the problem JSON, from the cache '''
+    with open(fetch_problem(number, cache)) as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    import argparse
+    from collections import Counter
+    parser = argparse.ArgumentParser(description='download problems into the shared cache')
+    parser.add_argument('problems', type=int, nargs='*', help=f'default is 1 to {NUM_PROBLEMS}')
+    parser.add_argument('-c', '--cache', default=None, help=f'default is ${CACHE_ENV} or {DEFAULT_CACHE}')
+    parser.add_argument('-j', '--concurrency', type=int, default=16)
+    parser.add_argument('-r', '--revalidate', action='store_true', help='ask the server about cached problems')
+    args = parser.parse_args()
+    numbers = args.problems or range(1, NUM_PROBLEMS + 1)
+    with Fetcher(cache=args.cache, concurrency=args.concurrency) as fetcher:
+        fetches = fetcher.prefetch(numbers, args.revalidate)
+    print(dict(Counter(f.state for f in fetches.values())), 'in', fetcher.cache)
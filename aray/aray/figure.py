@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# figure.py - precomputed distance bounds between figure vertices
+
+import math
+from typing import Dict, Tuple
+
+import numpy as np
+
+from .types import Point
+from .problem import Problem
+from .util import dist
+
+# map from figure key -> (V, V) bounds, so each problem's figure is only solved once
+_BOUNDS: Dict[Tuple, np.ndarray] = {}
+# map from figure key -> (V, V) squared bounds, for the per placement checks
+_REACH: Dict[Tuple, np.ndarray] = {}
+
+
+def figure_key(problem: Problem) -> Tuple:
+    ''' Get a hashable key for everything the bounds depend on '''
+    return (len(problem.vertices), tuple(map(tuple, problem.edges)),
+            tuple(problem.dists), problem.epsilon)
+
+
+def path_bounds(problem: Problem) -> np.ndarray:
+    ''' Get the (V, V) longest each pair of vertices can be apart, along shortest stretched paths '''
+    n = len(problem.vertices)
+    bounds = np.full((n, n), np.inf)
+    np.fill_diagonal(bounds, 0)
+    scale = math.sqrt(1 + problem.epsilon / 1e6)
+    for (a, b), d in zip(problem.edges, problem.dists):
+        bounds[a, b] = bounds[b, a] = min(bounds[a, b], math.sqrt(d) * scale)
+    for k in range(n):  # Floyd-Warshall
+        np.minimum(bounds, bounds[:, k, None] + bounds[None, k, :], out=bounds)
+    return bounds
+
+
+def get_bounds(problem: Problem) -> np.ndarray:
+    ''' Get path_bounds for a problem, computed once and cached '''
+    key = figure_key(problem)
+    bounds = _BOUNDS.get(key)
+    if bounds is None:
+        bounds = _BOUNDS[key] = path_bounds(problem)
+        bounds.flags.writeable = False  # shared between callers
+    return bounds
+
+
+def get_reach(problem: Problem) -> np.ndarray:
+    ''' Get the squared bounds, with a little slack for float error on the sums of roots, cached like get_bounds '''
+    key = figure_key(problem)
+    reach = _REACH.get(key)
+    if reach is None:
+        reach = _REACH[key] = get_bounds(problem) ** 2 * (1 + 1e-9)
+        reach.flags.writeable = False  # shared between callers
+    return reach
+
+
+def within_reach(reach: np.ndarray, i: int, p: Point, j: int, q: Point) -> bool:
+    ''' Return True if vertex i at p and vertex j at q are no further apart than their bound '''
+    return dist(p, q) <= reach[i, j]
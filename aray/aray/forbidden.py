@@ -3,6 +3,7 @@
 #!/usr/bin/env python3
 import os
 import json
+import struct
 import subprocess
 from ctypes import c_uint16, Structure
 from typing import List, Tuple, Set, NamedTuple
@@ -14,6 +15,7 @@ from aray.boxlet import polygon_points
 from aray.stretch import center_stretch
 from aray.dislike import dislikes
 from aray.util import dist
+from aray.timing import timed, count
 
 class POINT(Structure):
     _pack_ = 1
@@ -134,11 +136,18 @@ def bytes_to_pair(data):
     return Pair(Point(int(data[0]), int(data[1])), Point(int(data[2]), int(data[3])))
 
 
+def pair_from_record(record):
+    ''' Convert an (ax, ay, bx, by) record of the forbidden edges file to a Pair '''
+    return Pair(Point(record[0], record[1]), Point(record[2], record[3]))
+
+
 def pair_to_delta(pair):
     return (pair.b.x - pair.a.x, pair.b.y - pair.a.y)
 
 
-def get_forbidden(problem_number):
+@timed('forbidden')
+def get_forbidden(problem_number) -> List[List[Pair]]:
+    ''' Get the forbidden pairs for each problem edge, from the cc_gang/forbidden output '''
     filepath = f'/tmp/{problem_number}_forbidden_edges.bin'
     if not os.path.exists(filepath):
         cmd = ['/home/aray/code/icfp2021/icfp2021/cc_gang/forbidden',
@@ -149,15 +158,24 @@ def get_forbidden(problem_number):
     with open(filepath, 'rb') as f:
         data = f.read()
     print(f'loaded {filepath}')
-    assert len(data) % 8 == 0, f'{len(data)} is not a multiple of 4'
-    all_pairs = 
-    
-    all_pairs = [bytes_to_pair(data[i:i + 4]) for i in range(0, len(data), 4)]
-    all_deltas = set(pair_to_delta(p) for p in all_pairs)
-    return
+    assert len(data) % 8 == 0, f'{len(data)} is not a multiple of 8'
+    # records are little endian uint16 (ax, ay, bx, by), grouped here by delta
+    by_delta = defaultdict(list)
+    for record in struct.iter_unpack('<HHHH', data):
+        pair = pair_from_record(record)
+        by_delta[pair_to_delta(pair)].append(pair)
+    count('forbidden_pairs', len(data) // 8)
+    problem = Problem.get(problem_number)
+    forbidden_edges = []
+    for d in problem.dists:
+        pairs = []
+        for c in center_stretch(d, problem.epsilon):
+            pairs.extend(by_delta.get((c.x, c.y), []))
+        forbidden_edges.append(pairs)
+    return forbidden_edges
 
 
 if __name__ == '__main__':
     import sys
     problem_number = int(sys.argv[1])
-    print(get_forbidden(problem_number))
+    print([len(f) for f in get_forbidden(problem_number)])
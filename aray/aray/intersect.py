@@ -2,7 +2,6 @@
 # intersect.py - line intersection
 
 # %%
-import matplotlib.pyplot as plt
 import random
 from collections import namedtuple, defaultdict
 from dataclasses import dataclass
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# match.py - match hole vertices to figure vertices for zero-dislike poses
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .types import Point
+from .problem import Problem
+from .util import dist
+from .figure import get_reach
+
+
+def to_bitset(flags: np.ndarray) -> int:
+    ''' Get the bitset of the set flags in a boolean array '''
+    return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+
+def bit_indexes(bits: int) -> Iterator[int]:
+    ''' Generate the set bit indexes of a bitset, lowest first '''
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+@dataclass
+class MatchStats:
+    ''' Counters for how much work matching is doing '''
+    nodes: int = 0  # assignments tried
+    revisions: int = 0  # arcs revised
+    wipeouts: int = 0  # assignments that emptied another hole vertex's domain
+    matches: int = 0  # assignments yielded
+    seconds: float = 0.0
+
+
+class HoleMatcher:
+    ''' Backtracking search for injective maps of hole vertices to figure vertices
+
+    Two hole vertices can only take figure vertices i and j if the distance
+    between them is possible for i and j: within epsilon of the edge length
+    if i-j is an edge, and at most the stretched shortest path otherwise.
+    Domains are bitsets over figure vertices, made arc consistent with AC-3
+    at the root and forward checked after every assignment.
+    '''
+
+    def __init__(self, problem: Problem, bounds: Optional[np.ndarray] = None):
+        self.problem = problem
+        self.hole = problem.hole
+        n = len(problem.vertices)
+        # squared, with a little slack for float error on the sums of roots
+        self.reach = get_reach(problem) if bounds is None else bounds ** 2 * (1 + 1e-9)
+        self.edge_a = np.array([a for a, _ in problem.edges], dtype=np.int64)
+        self.edge_b = np.array([b for _, b in problem.edges], dtype=np.int64)
+        self.edge_d = np.array(problem.dists, dtype=np.int64)
+        self.full = (1 << n) - 1
+        self.supports: Dict[Tuple[int, int], int] = {}  # (domain, hole distance) -> bitset
+        m = len(problem.hole)
+        self.hole_dists = [[dist(self.hole[h], self.hole[k]) for k in range(m)] for h in range(m)]
+        self.stats = MatchStats()
+
+    def compatibility(self, d: int) -> np.ndarray:
+        ''' Get the (V, V) matrix of which figure vertex pairs can sit at squared distance d apart '''
+        compatible = self.reach >= d
+        np.fill_diagonal(compatible, False)
+        # exactly, in integers, as valid.stretch_ok
+        ok = 1_000_000 * np.abs(d - self.edge_d) <= self.problem.epsilon * self.edge_d
+        compatible[self.edge_a, self.edge_b] = ok
+        compatible[self.edge_b, self.edge_a] = ok
+        return compatible
+
+    def support(self, domain: int, d: int) -> int:
+        ''' Get the bitset of figure vertices that can sit at squared distance d from one in domain '''
+        key = (domain, d)
+        support = self.supports.get(key)
+        if support is None:
+            rows = self.compatibility(d)[list(bit_indexes(domain))]
+            support = self.supports[key] = to_bitset(rows.any(axis=0))
+        return support
+
+    def revise(self, domains: List[int], h: int, k: int) -> bool:
+        ''' Remove figure vertices from h's domain with no partner in k's, return True if changed '''
+        self.stats.revisions += 1
+        before = domains[h]
+        after = before & self.support(domains[k], self.hole_dists[h][k])
+        if after == before:
+            return False
+        domains[h] = after
+        return True
+
+    def propagate(self, domains: List[int], arcs: Optional[Iterable[Tuple[int, int]]] = None,
+                  requeue: bool = True) -> bool:
+        ''' Run AC-3 over arcs (h, k), or all arcs, return False on a dead end
+
+        Without requeue, only revise the given arcs once (forward checking).
+        '''
+        m = len(self.hole)
+        if arcs is None:
+            arcs = [(h, k) for h in range(m) for k in range(m) if h != k]
+        queue = deque(arcs)
+        queued = set(queue)
+        while queue:
+            arc = queue.popleft()
+            queued.discard(arc)
+            h, k = arc
+            if not self.revise(domains, h, k):
+                continue
+            if domains[h] == 0:
+                self.stats.wipeouts += 1
+                return False
+            if not requeue:
+                continue
+            for l in range(m):
+                if l != h and l != k and (l, h) not in queued:
+                    queue.append((l, h))
+                    queued.add((l, h))
+        return True
+
+    def root_domains(self) -> List[int]:
+        ''' Get the arc consistent domains before any assignment, empty on a dead end '''
+        domains = [self.full] * len(self.hole)
+        if not self.propagate(domains):
+            return [0] * len(self.hole)
+        return domains
+
+    def matches(self, depth: Optional[int] = None,
+                domains: Optional[List[int]] = None) -> Iterator[Dict[int, Point]]:
+        ''' Generate consistent maps from figure vertex index -> hole point
+
+        With depth, yield consistent assignments of any depth hole vertices
+        instead of all of them, to use as pins for a solver.
+        Domains can be given to restrict which figure vertices each hole
+        vertex may take.
+        '''
+        if depth is None:
+            depth = len(self.hole)
+        domains = [self.full] * len(self.hole) if domains is None else list(domains)
+        start = time.time()
+        try:
+            # AC-3 assumes every hole vertex gets matched, so only applies to complete matches
+            if depth < len(self.hole) or self.propagate(domains):
+                yield from self._search(domains, {}, depth)
+        finally:
+            self.stats.seconds += time.time() - start
+
+    def _search(self, domains: List[int], assigned: Dict[int, int],
+                depth: int) -> Iterator[Dict[int, Point]]:
+        if len(assigned) == depth:
+            self.stats.matches += 1
+            yield {i: self.hole[h] for h, i in assigned.items()}
+            return
+        # hole vertices still open, most constrained first
+        open_ = [k for k in range(len(self.hole)) if k not in assigned and domains[k]]
+        if len(assigned) + len(open_) < depth:
+            return
+        h = min(open_, key=lambda k: domains[k].bit_count())
+        for i in bit_indexes(domains[h]):
+            self.stats.nodes += 1
+            pruned = list(domains)
+            pruned[h] = 1 << i
+            # forward check only; full AC-3 below the root costs more than it prunes
+            remaining = 0
+            for k in open_:
+                if k != h:
+                    self.revise(pruned, k, h)
+                    remaining += pruned[k] != 0
+            if len(assigned) + 1 + remaining < depth:
+                self.stats.wipeouts += 1
+                continue
+            assigned[h] = i
+            yield from self._search(pruned, assigned, depth)
+            del assigned[h]
+        if len(assigned) + len(open_) - 1 >= depth:
+            # leave h unmatched
+            skipped = list(domains)
+            skipped[h] = 0
+            yield from self._search(skipped, assigned, depth)
+
+
+def hole_matches(problem: Problem, depth: Optional[int] = None) -> Iterator[Dict[int, Point]]:
+    ''' Generate maps from figure vertex index -> hole point, consistent with edge lengths '''
+    return HoleMatcher(problem).matches(depth)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# mockserver.py - local stand-in for the poses.live problem and solution endpoints
+
+import os
+import re
+import json
+import uuid
+import hashlib
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from .problem import Problem, Pose, BASE_PATH
+from .valid import valid_pose
+from .dislike import dislikes
+from .submit import TokenBucket, PENDING, VALID, INVALID
+
+PROBLEM_PATH = re.compile(r'^/api/problems/(\d+)$')
+SOLUTIONS_PATH = re.compile(r'^/api/problems/(\d+)/solutions$')
+STATUS_PATH = re.compile(r'^/api/problems/(\d+)/solutions/([0-9a-f-]+)$')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so clients can reuse connections
+    server: 'MockServer'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass  # quiet, tests run lots of these
+
+    def send_json(self, code: int, data: Dict, headers: Optional[Dict] = None):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def refuse(self) -> bool:
+        ''' Answer auth, rate limit and injected failures, return True if answered '''
+        server = self.server
+        with server.lock:
+            server.stats['requests'] += 1
+            if not self.headers.get('Authorization', '').startswith('Bearer '):
+                self.send_json(403, {'error': 'no api key'})
+                return True
+            if server.bucket is not None:
+                wait = server.bucket.take()
+                if wait > 0:
+                    server.stats['limited'] += 1
+                    self.send_json(429, {'error': 'slow down'}, {'Retry-After': f'{wait:.3f}'})
+                    return True
+            if server.rng.random() < server.fail_rate:
+                server.stats['failed'] += 1
+                self.send_json(503, {'error': 'try again'})
+                return True
+        return False
+
+    def do_GET(self):
+        if self.refuse():
+            return
+        if self.path == '/api/hello':
+            return self.send_json(200, {'hello': 'OMG ICFP FTW'})
+        match = PROBLEM_PATH.match(self.path)
+        if match:
+            filename = os.path.join(self.server.problems_path, f'{match.group(1)}.json')
+            if not os.path.exists(filename):
+                return self.send_json(404, {'error': 'no such problem'})
+            with open(filename, 'rb') as f:
+                body = f.read()
+            etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                with self.server.lock:
+                    self.server.stats['not_modified'] += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                return self.end_headers()
+            return self.send_json(200, json.loads(body), {'ETag': etag})
+        match = STATUS_PATH.match(self.path)
+        if match:
+            return self.send_json(*self.server.status(int(match.group(1)), match.group(2)))
+        self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if self.refuse():
+            return
+        match = SOLUTIONS_PATH.match(self.path)
+        if not match:
+            return self.send_json(404, {'error': 'not found'})
+        try:
+            pose = json.loads(body)
+        except ValueError:
+            return self.send_json(400, {'error': 'not json'})
+        self.send_json(200, {'id': self.server.add(int(match.group(1)), pose)})
+
+
+class MockServer(ThreadingHTTPServer):
+    ''' poses.live on localhost, scoring poses with aray's own checks
+
+    Problems are served from problems_path, with an ETag of their content
+    hash so clients can revalidate. Each pose reads as PENDING for
+    its first pending_polls status requests. rate limits requests like the
+    real server (429 with Retry-After), and fail_rate answers that fraction
+    of requests with a 503. Use as a context manager to serve in a thread.
+    '''
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, problems_path: Optional[str] = None,
+                 rate: Optional[float] = None, burst: Optional[float] = None,
+                 fail_rate: float = 0.0, pending_polls: int = 1, seed: Optional[int] = None):
+        super().__init__(('127.0.0.1', port), Handler)
+        self.problems_path = problems_path or os.path.join(BASE_PATH, 'problems')
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.fail_rate = fail_rate
+        self.pending_polls = pending_polls
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.poses: Dict[str, Dict] = {}  # pose id -> status and polls left
+        self.stats = dict(requests=0, connections=0, limited=0, failed=0, posted=0, not_modified=0)
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def add(self, problem_number: int, data: Dict) -> str:
+        ''' Score a posted pose, return its id '''
+        try:
+            pose = Pose.from_json(data)
+            # the problem as this server serves it, not whatever the local cache holds
+            problem = Problem.load(os.path.join(self.problems_path, f'{problem_number}.json'))
+            bonus = pose.bonuses[0] if pose.bonuses else None
+            if valid_pose(problem, pose.vertices, bonus):
+                status = dict(state=VALID, dislikes=dislikes(problem.hole, pose.vertices))
+            else:
+                status = dict(state=INVALID, error='Pose is not a valid placement')
+        except (AssertionError, KeyError, TypeError, ValueError, OSError) as e:
+            status = dict(state=INVALID, error=f'Bad pose: {e!r}')
+        pose_id = str(uuid.uuid4())
+        with self.lock:
+            self.poses[pose_id] = dict(problem=problem_number, status=status, polls=self.pending_polls)
+            self.stats['posted'] += 1
+        return pose_id
+
+    def status(self, problem_number: int, pose_id: str):
+        with self.lock:
+            pose = self.poses.get(pose_id)
+            if pose is None or pose['problem'] != problem_number:
+                return 404, {'error': 'no such pose'}
+            if pose['polls'] > 0:
+                pose['polls'] -= 1
+                return 200, {'state': PENDING}
+            return 200, pose['status']
+
+    def __enter__(self) -> 'MockServer':
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='serve a local poses.live, point ICFP2021_API_URL at it')
+    parser.add_argument('-p', '--port', type=int, default=8021)
+    parser.add_argument('-r', '--rate', type=float, default=None, help='requests per second before 429s')
+    parser.add_argument('-f', '--fail-rate', type=float, default=0.0, help='fraction answered with 503')
+    parser.add_argument('--pending-polls', type=int, default=1)
+    args = parser.parse_args()
+    server = MockServer(args.port, rate=args.rate, fail_rate=args.fail_rate, pending_polls=args.pending_polls)
+    print(f'serving on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
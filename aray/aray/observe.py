@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# observe.py - watch a solver run live, rendered in another process at a capped frame rate
+
+import queue
+import multiprocessing
+from time import monotonic
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+from .problem import Problem
+
+# poses are anything np.array can make (N, 2) of, with None or NaN for unplaced vertices,
+# or a function returning one, so solvers only build it when a frame is taken
+PoseLike = Union[np.ndarray, list, Callable[[], Union[np.ndarray, list]]]
+
+# frames are late by at most this many calls, which is nothing next to a frame interval
+CLOCK_STRIDE = 16
+
+
+class Observer:
+    ''' What solvers report progress to; this one ignores it '''
+
+    def observe(self, iteration: int, pose: PoseLike, score):
+        pass
+
+    def flush(self, iteration: int, pose: PoseLike, score):
+        ''' Show this frame whatever the frame rate, e.g. the final pose '''
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> 'Observer':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LiveView(Observer):
+    ''' Stream frames to a renderer process, at most fps of them a second
+
+    Between frames observe() is a counter and now and then a clock check,
+    so calling it every iteration costs the solver well under 1%. A frame
+    that finds the renderer still busy with the last one is dropped rather
+    than queued. Without path it draws in a window, with it each frame
+    overwrites that PNG.
+    '''
+
+    def __init__(self, problem_number: int, fps: float = 10.0, path: Optional[str] = None):
+        self.interval = 1.0 / fps
+        self.next_frame = 0.0
+        self.calls = 0
+        self.sent = 0
+        self.dropped = 0  # renderer was still busy
+        # spawn, so the renderer doesn't inherit the solver's memory or plotting state
+        ctx = multiprocessing.get_context('spawn')
+        self.frames = ctx.Queue(maxsize=1)
+        self.process = ctx.Process(target=show_frames, args=(self.frames, problem_number, path), daemon=True)
+        self.process.start()
+
+    @property
+    def skipped(self) -> int:
+        ''' Calls that came between frames '''
+        return self.calls - self.sent - self.dropped
+
+    def observe(self, iteration: int, pose: PoseLike, score):
+        self.calls += 1
+        # even reading the clock shows up against a fast solver, so only look every CLOCK_STRIDE calls
+        if self.calls % CLOCK_STRIDE or monotonic() < self.next_frame:
+            return
+        self.next_frame = monotonic() + self.interval
+        try:
+            self.frames.put_nowait(frame(iteration, pose, score))
+            self.sent += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, iteration: int, pose: PoseLike, score):
+        self.frames.put(frame(iteration, pose, score))
+        self.calls += 1
+        self.sent += 1
+
+    def close(self, timeout: float = 10.0):
+        ''' Let the renderer draw what it has, then stop it '''
+        if self.process.is_alive():
+            self.frames.put(None)
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+def frame(iteration: int, pose: PoseLike, score) -> tuple:
+    if callable(pose):
+        pose = pose()
+    # a copy, solvers keep changing their pose in place
+    return iteration, np.array(pose, dtype=np.float64).reshape(-1, 2), score
+
+
+def show_frames(frames, problem_number: int, path: Optional[str] = None):
+    ''' Renderer process: draw the latest frame until the None that ends the stream '''
+    import matplotlib
+    if path is not None:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+    from .render import draw_hole, save, GOOD_COLOR
+
+    problem = Problem.get(problem_number)
+    edges = np.array(problem.edges, dtype=np.int64).reshape(-1, 2)
+    fig, ax = plt.subplots(figsize=(6, 6))
+    draw_hole(ax, problem.hole)
+    lines = LineCollection([], colors=GOOD_COLOR, linewidths=1.0, zorder=2)
+    ax.add_collection(lines)
+    # fixed limits, poses wander outside the hole
+    hole = np.array(problem.hole, dtype=np.float64)
+    lo, hi = np.minimum(hole.min(axis=0), 0), hole.max(axis=0)
+    margin = 0.1 * (hi - lo).max()
+    ax.set_xlim(lo[0] - margin, hi[0] + margin)
+    ax.set_ylim(hi[1] + margin, lo[1] - margin)  # y down, like the problems
+    ax.set_aspect('equal')
+    if path is None:
+        plt.show(block=False)
+    done = False
+    while not done:
+        latest = frames.get()
+        if latest is None:
+            break
+        # skip to the newest frame, in case drawing fell behind
+        while True:
+            try:
+                newer = frames.get_nowait()
+            except queue.Empty:
+                break
+            if newer is None:
+                done = True
+                break
+            latest = newer
+        iteration, vertices, score = latest
+        usable = edges[(edges < len(vertices)).all(axis=1)]
+        segments = vertices[usable]
+        lines.set_segments(segments[np.isfinite(segments).all(axis=(1, 2))])
+        ax.set_title(f'{problem_number}: iteration {iteration}, score {score}')
+        if path is not None:
+            save(fig, path)
+        else:
+            fig.canvas.draw_idle()
+            plt.pause(0.001)
+    plt.close(fig)
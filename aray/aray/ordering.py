@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# ordering.py - strategies for picking the next vertex to place
+
+import random
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence
+
+from .partial import Partial
+
+
+def placed_neighbors(partial: Partial, i: int) -> int:
+    ''' Count the placed vertices sharing an edge with vertex i '''
+    count = 0
+    for e in partial.edge_map[i]:
+        edge = partial.edges[e]
+        if partial.vertices[edge.b if edge.a == i else edge.a] is not None:
+            count += 1
+    return count
+
+
+def random_order(partial: Partial) -> int:
+    ''' Pick uniformly among the unplaced vertices '''
+    return random.choice(partial.get_unplaced_points())
+
+
+def most_placed(partial: Partial) -> int:
+    ''' Pick the vertex with the most placed neighbours (most constrained) '''
+    return max(partial.get_unplaced_points(),
+               key=lambda i: (placed_neighbors(partial, i), -i))
+
+
+def smallest_domain(partial: Partial) -> int:
+    ''' Pick the vertex with the fewest remaining placements (fail first) '''
+    return min(partial.get_unplaced_points(),
+               key=lambda i: (len(partial.get_placement_for_point(i)), i))
+
+
+def highest_degree(partial: Partial) -> int:
+    ''' Pick the vertex with the most edges '''
+    return max(partial.get_unplaced_points(),
+               key=lambda i: (len(partial.edge_map[i]), -i))
+
+
+def nearest_to_matched(candidates: Iterable[int], matched: Iterable[int],
+                       adjacency: Mapping[int, Sequence[int]]) -> int:
+    ''' Pick the candidate fewest hops from a matched vertex, over adjacency (vertex -> neighbours)
+
+    With nothing matched, pick the candidate with the most neighbours.
+    Ties go to the lowest index. Shared with vaniver's construct search.
+    '''
+    candidates, matched = list(candidates), list(matched)
+    if not matched:
+        return max(candidates, key=lambda i: (len(adjacency.get(i, ())), -i))
+    # multi-source breadth first search out from the matched vertices
+    hops = {i: 0 for i in matched}
+    queue = deque(matched)
+    while queue:
+        i = queue.popleft()
+        for j in adjacency.get(i, ()):
+            if j not in hops:
+                hops[j] = hops[i] + 1
+                queue.append(j)
+    far = len(adjacency) + 1  # unreachable vertices go last
+    return min(candidates, key=lambda i: (hops.get(i, far), i))
+
+
+def hole_bfs(partial: Partial) -> int:
+    ''' Pick the unplaced vertex fewest hops from a vertex sitting on a hole vertex '''
+    corners = set(partial.hole)
+    matched = [i for i, v in enumerate(partial.vertices) if v in corners]
+    adjacency = {i: [partial.edges[e].b if partial.edges[e].a == i else partial.edges[e].a for e in es]
+                 for i, es in partial.edge_map.items()}
+    return nearest_to_matched(partial.get_unplaced_points(), matched, adjacency)
+
+
+ORDERINGS: Dict[str, Callable[[Partial], int]] = {
+    'random': random_order,
+    'most_placed': most_placed,
+    'smallest_domain': smallest_domain,
+    'highest_degree': highest_degree,
+    'hole_bfs': hole_bfs,
+}
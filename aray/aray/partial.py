@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
 # partial.py - partial solution to the problem
 
+import math
 import random
-import matplotlib.pyplot as plt
-from typing import List, Dict, Optional, Set
-from dataclasses import dataclass
+from fractions import Fraction
+import numpy as np
+from typing import List, Dict, Optional, Set, Tuple
+from dataclasses import dataclass, field, replace
 
 from .problem import Problem, Pose
 from .types import Point, Edge
 from .stretch import stretch
 from .boxlet import Boxlet
+from .figure import get_reach
+from .propagate import Propagator
+from .valid import global_stretch
 
 
 @dataclass
@@ -22,6 +27,26 @@ class Partial:
     edge_map: Dict[int, List[int]]  # map vertex index -> list of edge indexes
     placement: Set[Point]  # all of the points inside the hole
     epsilon: int
+    globalist: bool = False  # one epsilon budget summed over all edges, instead of per edge
+    spent: Fraction = Fraction(0)  # sum of |d_new / d_old - 1| over edges placed so far
+    propagator: Optional[Propagator] = None  # AC-3 domains, kept consistent as points are placed
+    reach: Optional[np.ndarray] = field(default=None, compare=False, repr=False)  # (V, V) squared path bounds, with the GLOBALIST epsilon applied
+
+    @property
+    def budget(self) -> Fraction:
+        ''' Get the GLOBALIST budget, len(edges) * epsilon / 1e6 '''
+        return Fraction(len(self.edges) * self.epsilon, 1_000_000)
+
+    def get_edge_epsilon(self) -> int:
+        ''' Get the epsilon a single edge can stretch by, which is the remaining budget for GLOBALIST '''
+        if not self.globalist:
+            return self.epsilon
+        return math.ceil((self.budget - self.spent) * 1_000_000)
+
+    def get_placed_edges(self, i: int) -> List[int]:
+        ''' Get the indexes of edges from point i to points already placed '''
+        return [e for e in self.edge_map[i]
+                if self.vertices[self.edges[e].b if self.edges[e].a == i else self.edges[e].a] is not None]
 
     def get_unplaced_points(self) -> List[int]:
         ''' Get the indices of points yet to be placed '''
@@ -31,10 +56,19 @@ class Partial:
         ''' Get a random unplaced point '''
         return random.choice(self.get_unplaced_points())
 
+    def get_next_unplaced_point(self, ordering: str = 'random') -> int:
+        ''' Get the next point to place, using a strategy from aray.ordering '''
+        from .ordering import ORDERINGS
+        return ORDERINGS[ordering](self)
+
     def get_placement_for_point(self, i: int) -> List[Point]:
         ''' Get the locations that a point could be placed at '''
-        # start by copying the hole set
-        placement = self.placement.copy()
+        # start by copying the hole set, or what propagation has left of it
+        if self.propagator is not None:
+            placement = set(self.propagator.domain(i))
+        else:
+            placement = self.placement.copy()
+        epsilon = self.get_edge_epsilon()
         # for each edge, intersect the set with the stretch confinement
         # fig, ax = plt.subplots(figsize=(10, 10))
         # ps = list(placement)
@@ -44,28 +78,96 @@ class Partial:
             point = self.vertices[edge.b if edge.a == i else edge.a]
             if point is not None:
                 placement = stretch(
-                    point, self.dists[e], self.epsilon, placement)
+                    point, self.dists[e], epsilon, placement)
                 # ps = list(placement)
                 # ax.scatter([p.x for p in ps], [p.y for p in ps])
         # plt.show()
+        if self.globalist and placement:
+            placement = self.filter_budget(i, placement)
+        # drop points too far along the figure from any other placed point
+        if self.reach is None:
+            self.reach = get_reach(self.reach_problem(self.problem, self.globalist))
+        reach = self.reach
+        placed = [(j, v) for j, v in enumerate(self.vertices) if v is not None and j != i]
+        if placed and placement:
+            points = list(placement)
+            xy = np.array(points)
+            keep = np.ones(len(points), dtype=bool)
+            for j, v in placed:
+                keep &= ((xy - v) ** 2).sum(axis=1) <= reach[i, j]
+            placement = {p for p, k in zip(points, keep) if k}
         return placement
 
+    def filter_budget(self, i: int, placement: Set[Point]) -> Set[Point]:
+        ''' Keep the points for i whose edges to placed points fit in the remaining GLOBALIST budget '''
+        edges = self.get_placed_edges(i)
+        if not edges:
+            return placement
+        points = list(placement)
+        xy = np.array(points)
+        cost = np.zeros(len(points))
+        for e in edges:
+            edge = self.edges[e]
+            other = self.vertices[edge.b if edge.a == i else edge.a]
+            d_new = ((xy - other) ** 2).sum(axis=1)
+            cost += np.abs(d_new - self.dists[e]) / self.dists[e]
+        remaining = float(self.budget - self.spent)
+        keep = cost <= remaining - 1e-9
+        # settle the few within float error of the edge exactly
+        for k in np.flatnonzero(np.abs(cost - remaining) <= 1e-9):
+            keep[k] = self.get_stretch(i, points[k]) <= self.budget - self.spent
+        return {p for p, k in zip(points, keep) if k}
+
+    def get_stretch(self, i: int, point: Point) -> Fraction:
+        ''' Get the budget placing point i at point would spend, exactly '''
+        edges = self.get_placed_edges(i)
+        d_news = []
+        for e in edges:
+            edge = self.edges[e]
+            other = self.vertices[edge.b if edge.a == i else edge.a]
+            d_news.append((point.x - other.x) ** 2 + (point.y - other.y) ** 2)
+        return global_stretch([self.dists[e] for e in edges], d_news)
+
     def get_random_placement_for_point(self, i: int) -> Point:
         ''' Get a random placement for a point '''
-        return random.choice(list(self.get_placements_for_point(i)))
+        return random.choice(list(self.get_placement_for_point(i)))
 
     def place_point(self, i: int, point: Point):
-        ''' Place a point '''
+        ''' Place a point, propagating to the unplaced points' domains if propagating '''
+        if self.globalist:
+            self.spent += self.get_stretch(i, point)
         self.vertices[i] = point
+        if self.propagator is not None:
+            self.propagator.assign(i, point)
+
+    @property
+    def dead_end(self) -> bool:
+        ''' True if propagation has left some point with nowhere to go '''
+        return self.propagator is not None and not self.propagator.consistent
+
+    def copy(self) -> 'Partial':
+        ''' Copy the placed points and domains, sharing everything else, reach included '''
+        propagator = self.propagator.copy() if self.propagator is not None else None
+        return replace(self, vertices=self.vertices.copy(), propagator=propagator)
 
     @classmethod
-    def from_problem(cls, problem: Problem):
-        ''' Create an empty initial partial solution from a problem '''
+    def from_problem(cls, problem: Problem, globalist: bool = False, propagate: bool = False):
+        ''' Create an empty initial partial solution from a problem
+
+        With propagate, placing a point runs AC-3 over the other points'
+        domains, so get_placement_for_point only offers points that still
+        have support and dead ends show up before they are searched.
+        '''
         placement = set()
         for boxlet in Boxlet.from_polygon(problem.hole):
             for p in boxlet.iter_points():
                 placement.add(p)
         vertices = [None for _ in range(len(problem.vertices))]
+        widened = cls.reach_problem(problem, globalist)
+        propagator = None
+        if propagate:
+            propagator = Propagator(widened, placement)
+            propagator.propagate()
         return cls(problem=problem,
                    hole=problem.hole,
                    vertices=vertices,
@@ -73,4 +175,38 @@ class Partial:
                    dists=problem.dists,
                    edge_map=problem.edge_map,
                    placement=placement,
-                   epsilon=problem.epsilon)
+                   epsilon=problem.epsilon,
+                   globalist=globalist,
+                   propagator=propagator,
+                   reach=get_reach(widened))
+
+    @staticmethod
+    def reach_problem(problem: Problem, globalist: bool) -> Problem:
+        ''' Get the problem whose epsilon bounds a single edge, where any one GLOBALIST edge may take the whole budget '''
+        return replace(problem, epsilon=len(problem.edges) * problem.epsilon) if globalist else problem
+
+
+def depth_first(partial: Partial, ordering: str = 'most_placed',
+                max_nodes: Optional[int] = None) -> Tuple[Optional[Partial], int]:
+    ''' Place points depth first, return the first full placement (or None) and the nodes made
+
+    Only edge lengths and the hole's points are checked, not edges leaving the hole.
+    '''
+    nodes = 0
+    stack = [partial]
+    while stack:
+        partial = stack.pop()
+        if not partial.get_unplaced_points():
+            return partial, nodes
+        i = partial.get_next_unplaced_point(ordering)
+        children = []
+        for point in sorted(partial.get_placement_for_point(i)):
+            child = partial.copy()
+            child.place_point(i, point)
+            nodes += 1
+            if not child.dead_end:
+                children.append(child)
+            if max_nodes is not None and nodes >= max_nodes:
+                return None, nodes
+        stack.extend(reversed(children))
+    return None, nodes
@@ -2,7 +2,6 @@
 # boxlet.py - Boxlet class and utilities
 
 # %%
-import matplotlib.pyplot as plt
 import random
 from collections import namedtuple, defaultdict
 from dataclasses import dataclass
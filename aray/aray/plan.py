@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# plan.py - pick how each edge class is kept in the hole, from cheap estimates
+'''
+An edge class is the edges sharing a squared length, and so a ring and a
+table. Per class the planner finds or estimates, the estimates from a few
+sampled ring deltas:
+
+- pairs: (a, b) placements with both ends in the hole
+- near (exact): starts whose segment to some ring delta has a bounding box meeting
+  a pocket's, from Lattice.ring_danger; only these can ever leave the hole
+- forbidden: pairs whose segment leaves the hole, from an exact check of a
+  random sample of the near starts with both ends in the hole
+- rounds: solves a lazy cut loop needs before all the class's edges land
+  inside, taking each edge as a uniform pick of its pairs
+
+and picks the cheapest encoding that fits the budgets: nothing at all if
+no start is near a pocket, so no placement can leave the hole, lazy cuts
+while the rounds of all the lazy classes together stay few, the smaller
+of the allowed and forbidden tables if building them fits, and crossing
+constraints otherwise. A class is never left free on the strength of the
+sampled estimates alone.
+'''
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .problem import Problem
+from .stretch import center_stretch
+from .tables import Lattice
+from .valid import edges_in_hole
+from .timing import timed, count
+
+log = logging.getLogger(__name__)
+
+FREE = 'free'  # no placement leaves the hole, nothing to add
+LAZY = 'lazy'  # cut off bad placements as solves find them
+ALLOWED = 'allowed'  # table of the placements inside
+FORBIDDEN = 'forbidden'  # table of the placements outside
+CROSSING = 'crossing'  # cpsat.Crossings against the pocket edges
+
+SAMPLE_DELTAS = 8  # ring deltas counted per class, the rest scaled from them
+SAMPLE_STARTS = 512  # random near starts checked exactly per sampled delta
+MAX_PAIRS = 10_000_000  # pairs a class's tables may take to build
+MAX_ROWS = 5_000_000  # table rows a class may add to the model, over all its edges
+MAX_ROUNDS = 4.0
+
+
+@dataclass
+class EdgeClass:
+    d: int  # squared length
+    edges: List[int]  # indexes into problem.edges
+    ring: int  # deltas on the ring
+    pairs: float
+    forbidden: float
+    near: int = 0  # starts whose segment could come near a pocket, none means nothing can leave the hole
+    encoding: str = ''
+
+    @property
+    def allowed(self) -> float:
+        return self.pairs - self.forbidden
+
+    @property
+    def rounds(self) -> float:
+        ''' Expected solves until every edge of the class lands on an allowed pair '''
+        if self.forbidden == 0:
+            return 1.0
+        if self.allowed <= 0:
+            return float('inf')
+        return (self.pairs / self.allowed) ** len(self.edges)
+
+
+@dataclass
+class Plan:
+    classes: List[EdgeClass]
+    encodings: Dict[int, str] = field(default_factory=dict)  # edge index -> encoding
+    rounds: float = 1.0  # expected lazy rounds, over all the lazy classes
+
+    def edges(self, encoding: str) -> List[int]:
+        return sorted(i for i, e in self.encodings.items() if e == encoding)
+
+
+def estimate(lattice: Lattice, d: int, edges: List[int], epsilon: int,
+             rng: Optional[np.random.Generator] = None) -> EdgeClass:
+    ''' Estimate the table sizes of an edge class from a sample of its ring '''
+    rng = rng or np.random.default_rng(0)
+    ring = center_stretch(d, epsilon)
+    # starts that some delta's segment could take near a pocket, the only ones that can leave the hole
+    danger = lattice.ring_danger(ring) if len(lattice.pockets) else np.zeros_like(lattice.grid)
+    near = int(np.count_nonzero(lattice.grid & danger))
+    sample = [ring[i] for i in np.linspace(0, len(ring) - 1, min(SAMPLE_DELTAS, len(ring))).astype(int)]
+    pairs = forbidden = 0.0
+    for delta in sample:
+        if lattice.overlap(delta) is None:
+            continue
+        ax, ay, bx, by = lattice.overlap(delta)
+        both = lattice.grid[ax, ay] & lattice.grid[bx, by]
+        pairs += np.count_nonzero(both)
+        suspect = np.flatnonzero(both & danger[ax, ay])
+        if len(suspect) == 0:
+            continue
+        # check random starts with both ends in the hole and near a pocket exactly
+        cells = suspect[rng.integers(0, len(suspect), SAMPLE_STARTS)]
+        starts = np.stack(np.unravel_index(cells, both.shape), axis=1) + (ax.start, ay.start) + lattice.origin
+        bad = ~edges_in_hole(lattice.hole, starts, starts + delta, check_endpoints=False)
+        forbidden += len(suspect) * bad.mean()
+    scale = len(ring) / max(1, len(sample))
+    return EdgeClass(d, edges, len(ring), float(pairs * scale), float(forbidden * scale), near)
+
+
+def choose(c: EdgeClass, lazy_rounds: float = 1.0, max_pairs: int = MAX_PAIRS, max_rows: int = MAX_ROWS,
+           max_rounds: float = MAX_ROUNDS) -> str:
+    ''' Pick the encoding of a class, given the expected rounds of the classes already made lazy '''
+    if c.near == 0:
+        return FREE
+    if lazy_rounds * c.rounds <= max_rounds:
+        return LAZY
+    rows = min(c.allowed, c.forbidden) * len(c.edges)
+    if c.pairs <= max_pairs and rows <= max_rows:
+        return ALLOWED if c.allowed < c.forbidden else FORBIDDEN
+    return CROSSING
+
+
+@timed('plan')
+def plan(problem: Problem, lattice: Optional[Lattice] = None, max_pairs: int = MAX_PAIRS,
+         max_rows: int = MAX_ROWS, max_rounds: float = MAX_ROUNDS) -> Plan:
+    ''' Pick an encoding per edge class of a problem, logging each decision '''
+    lattice = lattice or Lattice(problem.hole)
+    by_length = {}
+    for i, d in enumerate(problem.dists):
+        by_length.setdefault(d, []).append(i)
+    result = Plan([estimate(lattice, d, edges, problem.epsilon) for d, edges in sorted(by_length.items())])
+    # the lazy classes' rounds multiply, so spend the budget on the cheapest ones first
+    for c in sorted(result.classes, key=lambda c: c.rounds):
+        c.encoding = choose(c, result.rounds, max_pairs, max_rows, max_rounds)
+        if c.encoding == LAZY:
+            result.rounds *= c.rounds
+    for c in result.classes:
+        result.encodings.update((i, c.encoding) for i in c.edges)
+        count(f'plan_{c.encoding}', len(c.edges))
+        log.info(f'length {c.d} x{len(c.edges)}: ~{c.pairs:.0f} pairs, {c.near} starts near pockets, ~{c.forbidden:.0f} forbidden, '
+                 f'~{c.rounds:.3g} lazy rounds -> {c.encoding}')
+    log.info(f'~{result.rounds:.3g} lazy rounds in all')
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='show the encoding picked per edge class')
+    parser.add_argument('problems', type=int, nargs='+')
+    parser.add_argument('--max-pairs', type=int, default=MAX_PAIRS)
+    parser.add_argument('--max-rows', type=int, default=MAX_ROWS)
+    parser.add_argument('--max-rounds', type=float, default=MAX_ROUNDS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for number in args.problems:
+        log.info(f'problem {number}')
+        plan(Problem.get(number), max_pairs=args.max_pairs, max_rows=args.max_rows, max_rounds=args.max_rounds)
@@ -4,14 +4,13 @@
 # %%
 import os
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Set, Dict, Optional
 from collections import defaultdict
-import requests
-import matplotlib.pyplot as plt
 
 from .types import Point, Edge
 from .util import dist
+from .timing import stage
 
 
 # Path of 'icfp2021' directory
@@ -19,25 +18,56 @@ BASE_PATH = base = os.path.dirname(os.path.dirname(
     os.path.dirname(os.path.realpath(__file__))))
 
 
+# where problems are cached, unless given a path or ICFP2021_PROBLEMS
+CACHE_ENV = 'ICFP2021_PROBLEMS'
+DEFAULT_CACHE = os.path.join(BASE_PATH, 'problems')
+
+
+def cache_path(cache: Optional[str] = None) -> str:
+    return cache or os.environ.get(CACHE_ENV, DEFAULT_CACHE)
+
+
+def problem_path(number: int, cache: Optional[str] = None) -> str:
+    return os.path.join(cache_path(cache), f'{number}.json')
+
+
 def get_problem_json_path(i: int) -> str:
-    filename = os.path.join(BASE_PATH, 'problems', f'{i}.json')
-    # if it doesn't exist, download it
-    if not os.path.exists(filename):
-        # first ensure the directory exists
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        # download the file
-        print(f'Downloading problem {i}')
-        TEAM_NAME = "OMG ICFP FTW"
-        headers = {"Authorization": "Bearer " + os.environ['ICFP2021_API_KEY']}
-        r = requests.get(
-            f"https://poses.live/api/problems/{i}", headers=headers)
-        r.raise_for_status()
-        data = r.json()
-        print('got data', data)
-        # Write data to file
-        with open(filename, 'w') as f:
-            json.dump(data, f)
-    return filename
+    path = problem_path(i)
+    if os.path.exists(path):
+        return path
+    # only a miss pulls in the networking stack, see fetch.py to download them all at once
+    from .fetch import fetch_problem
+    return fetch_problem(i)
+
+
+# Bonus kinds, see section 6 of the spec
+GLOBALIST = 'GLOBALIST'  # one epsilon budget summed over all edges
+SUPERFLEX = 'SUPERFLEX'  # one edge may stretch any amount
+WALLHACK = 'WALLHACK'  # one vertex may be outside the hole
+BREAK_A_LEG = 'BREAK_A_LEG'  # one edge split in two at a new vertex
+BONUSES = (GLOBALIST, SUPERFLEX, WALLHACK, BREAK_A_LEG)
+
+
+@dataclass
+class Bonus:
+    ''' A bonus unlocked by placing a vertex on position, usable in problem '''
+    bonus: str
+    problem: int
+    position: Point
+
+
+@dataclass
+class UsedBonus:
+    ''' A bonus used by a pose, which was unlocked in problem '''
+    bonus: str
+    problem: int
+    edge: Optional[Edge] = None  # the edge BREAK_A_LEG breaks
+
+    def to_json(self) -> dict:
+        data = dict(bonus=self.bonus, problem=self.problem)
+        if self.edge is not None:
+            data['edge'] = list(self.edge)
+        return data
 
 
 @dataclass
@@ -48,11 +78,16 @@ class Problem:
     dists: List[int]  # squared distance for original edge lengths
     edge_map: Dict[int, List[int]]  # map vertex index -> list of edge indexes
     epsilon: int
+    bonuses: List[Bonus] = field(default_factory=list)  # bonuses this problem can unlock
 
     @classmethod
     def get(cls, number):
-        filename = get_problem_json_path(number)
-        with open(filename, 'r') as f:
+        return cls.load(get_problem_json_path(number))
+
+    @classmethod
+    def load(cls, filename: str):
+        ''' Read a problem from a JSON file in the spec's format '''
+        with stage('load'), open(filename, 'r') as f:
             data = json.load(f)
         hole = [Point(x, y) for x, y in data['hole']]
         vertices = [Point(x, y) for x, y in data['figure']['vertices']]
@@ -65,12 +100,15 @@ class Problem:
         # convert to normal dict
         edge_map = {k: list(v) for k, v in edge_map.items()}
         epsilon = int(data['epsilon'])
-        return cls(hole, vertices, edges, dists, edge_map, epsilon)
+        bonuses = [Bonus(b['bonus'], b['problem'], Point(*b['position']))
+                   for b in data.get('bonuses', [])]
+        return cls(hole, vertices, edges, dists, edge_map, epsilon, bonuses)
 
     def json(self):
         return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=4)
 
     def plot(self, fig=None, ax=None):
+        import matplotlib.pyplot as plt  # here, so the core imports without matplotlib
         if fig is None:
             fig, ax = plt.subplots()
         cycle = self.hole + [self.hole[0]]
@@ -80,13 +118,20 @@ class Problem:
 @dataclass
 class Pose:
     vertices: List[Point]
+    bonuses: List[UsedBonus] = field(default_factory=list)
 
     @classmethod
     def from_json(cls, data, dislikes=None):
         assert isinstance(data, dict), f'{data} is not a dict'
-        assert tuple(data.keys()) == ('vertices',), f'{data} is not a pose'
+        assert set(data.keys()) <= {'vertices', 'bonuses'}, f'{data} is not a pose'
         vertices = [Point(x, y) for x, y in data['vertices']]
-        return cls(vertices)
+        bonuses = [UsedBonus(b['bonus'], b['problem'],
+                             Edge(*b['edge']) if 'edge' in b else None)
+                   for b in data.get('bonuses', [])]
+        return cls(vertices, bonuses)
 
     def json(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=4)
+        data = dict(vertices=self.vertices)
+        if self.bonuses:
+            data['bonuses'] = [b.to_json() for b in self.bonuses]
+        return json.dumps(data, sort_keys=True, indent=4)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# propagate.py - AC-3 constraint propagation over hole lattice bitsets
+
+import time
+from collections import deque, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .types import Point
+from .problem import Problem
+from .boxlet import polygon_points
+from .stretch import center_stretch
+
+
+@dataclass
+class Lattice:
+    ''' Dense row-major bit indexing of the points inside the hole '''
+    xmin: int
+    ymin: int
+    width: int
+    height: int
+    stride: int  # bits per row, width plus padding so shifts never wrap rows
+    mask: int  # bitset of every point inside the hole
+
+    @classmethod
+    def from_points(cls, points: Iterable[Point], pad: int = 0):
+        ''' Create a lattice over points, padded for shifts of up to pad in x '''
+        points = list(points)
+        assert len(points) > 0, 'empty lattice'
+        xmin = min(p.x for p in points)
+        ymin = min(p.y for p in points)
+        width = max(p.x for p in points) - xmin + 1
+        height = max(p.y for p in points) - ymin + 1
+        lattice = cls(xmin, ymin, width, height, width + pad, 0)
+        lattice.mask = lattice.bitset(points)
+        return lattice
+
+    def index(self, point: Point) -> int:
+        ''' Get the bit index of a point '''
+        return (point.x - self.xmin) + (point.y - self.ymin) * self.stride
+
+    def offset(self, delta: Point) -> int:
+        ''' Get the bit offset of a delta between two points '''
+        return delta.x + delta.y * self.stride
+
+    def point(self, index: int) -> Point:
+        ''' Get the point for a bit index '''
+        y, x = divmod(index, self.stride)
+        return Point(x + self.xmin, y + self.ymin)
+
+    def bitset(self, points: Iterable[Point]) -> int:
+        ''' Get the bitset of points, dropping any outside the hole '''
+        indexes = [self.index(p) for p in points
+                   if 0 <= p.x - self.xmin < self.width and 0 <= p.y - self.ymin < self.height]
+        bits = from_indexes(indexes)
+        return bits & self.mask if self.mask else bits
+
+    def indexes(self, bits: int) -> np.ndarray:
+        ''' Get the set bit indexes of a bitset '''
+        if bits == 0:
+            return np.zeros(0, dtype=np.int64)
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        unpacked = np.unpackbits(np.frombuffer(data, dtype=np.uint8),
+                                 bitorder='little')
+        return np.flatnonzero(unpacked)
+
+    def points(self, bits: int) -> List[Point]:
+        ''' Get the list of points in a bitset '''
+        return [self.point(int(i)) for i in self.indexes(bits)]
+
+
+def from_indexes(indexes: Iterable[int]) -> int:
+    ''' Get the bitset with the given (non-negative) bit indexes set '''
+    indexes = np.asarray(list(indexes), dtype=np.int64)
+    if len(indexes) == 0:
+        return 0
+    flags = np.zeros(indexes.max() + 1, dtype=np.uint8)
+    flags[indexes] = 1
+    return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+
+def shift(bits: int, offset: int) -> int:
+    ''' Shift a bitset by a (possibly negative) bit offset '''
+    return bits << offset if offset >= 0 else bits >> -offset
+
+
+def ring_runs(lattice: Lattice, ring: List[Point]) -> List[Tuple[int, int]]:
+    ''' Split a ring of deltas into horizontal runs of (bit offset, length) '''
+    rows = defaultdict(list)  # map from y -> sorted xs
+    for c in ring:
+        rows[c.y].append(c.x)
+    runs = []
+    for y, xs in rows.items():
+        xs.sort()
+        start = prev = xs[0]
+        for x in xs[1:] + [None]:
+            if x is not None and x == prev + 1:
+                prev = x
+                continue
+            runs.append((lattice.offset(Point(start, y)), prev - start + 1))
+            if x is not None:
+                start = prev = x
+    return runs
+
+
+def smear(smeared: Dict[int, int], length: int) -> int:
+    ''' Get smeared[1] OR-ed with itself shifted by 1..length-1, memoized '''
+    if length not in smeared:
+        half = 1 << (length.bit_length() - 1)  # largest power of two <= length
+        if half not in smeared:
+            quarter = smear(smeared, half // 2)
+            smeared[half] = quarter | (quarter << (half // 2))
+        if length != half:
+            smeared[length] = smeared[half] | (smeared[half] << (length - half))
+    return smeared[length]
+
+
+@dataclass
+class PropagationStats:
+    ''' Counters for how much work propagation is doing '''
+    revisions: int = 0  # arcs revised
+    shifts: int = 0  # bitset shifts performed computing supports
+    pruned: int = 0  # domain values removed
+    wipeouts: int = 0  # revisions that emptied a domain
+    seconds: float = 0.0  # wall time spent propagating
+
+
+class Propagator:
+    ''' Vertex domains as lattice bitsets, kept arc consistent with AC-3 '''
+
+    def __init__(self, problem: Problem, placement: Optional[Set[Point]] = None):
+        self.problem = problem
+        epsilon = problem.epsilon
+        rings = {d: center_stretch(d, epsilon) for d in set(problem.dists)}
+        pad = max(abs(c.x) for ring in rings.values() for c in ring)
+        if placement is None:
+            placement = polygon_points(problem.hole)
+        self.lattice = lattice = Lattice.from_points(placement, pad)
+        # map from distance -> ring as horizontal runs, and a bitset of the ring
+        self.ring_runs: Dict[int, List[Tuple[int, int]]] = {}  # (offset, length)
+        self.ring_masks: Dict[int, Tuple[int, int]] = {}  # d -> (base, mask)
+        for d, ring in rings.items():
+            self.ring_runs[d] = ring_runs(lattice, ring)
+            offsets = sorted(lattice.offset(c) for c in ring)
+            base = offsets[0]
+            self.ring_masks[d] = (base, from_indexes(o - base for o in offsets))
+        # map from vertex index -> list of (neighbour index, distance)
+        neighbors = defaultdict(list)
+        for (a, b), d in zip(problem.edges, problem.dists):
+            neighbors[a].append((b, d))
+            neighbors[b].append((a, d))
+        self.neighbors: Dict[int, List[Tuple[int, int]]] = dict(neighbors)
+        self.domains: List[int] = [lattice.mask] * len(problem.vertices)
+        self.stats = PropagationStats()
+
+    def copy(self) -> 'Propagator':
+        ''' Copy domains, sharing the precomputed tables and stats '''
+        novel = object.__new__(Propagator)
+        novel.__dict__.update(self.__dict__)
+        novel.domains = self.domains.copy()
+        return novel
+
+    def domain(self, i: int) -> List[Point]:
+        ''' Get the points still available to vertex i '''
+        return self.lattice.points(self.domains[i])
+
+    def domain_size(self, i: int) -> int:
+        ''' Get the number of points still available to vertex i '''
+        return self.domains[i].bit_count()
+
+    def support(self, j: int, d: int) -> int:
+        ''' Get the bitset of points within ring d of some point in j's domain '''
+        bits = self.domains[j]
+        runs = self.ring_runs[d]
+        support = 0
+        if bits.bit_count() < 2 * len(runs):
+            # few candidates, so stamp the ring down around each one
+            base, ring = self.ring_masks[d]
+            indexes = self.lattice.indexes(bits)
+            for i in indexes:
+                support |= shift(ring, int(i) + base)
+            self.stats.shifts += len(indexes)
+        else:
+            # many candidates, so smear the whole domain along each ring run
+            smeared = {1: bits}  # map from run length -> domain smeared in x
+            for offset, length in runs:
+                support |= shift(smear(smeared, length), offset)
+            self.stats.shifts += len(runs) + 2 * len(smeared)
+        return support & self.lattice.mask
+
+    def revise(self, i: int, j: int, d: int) -> bool:
+        ''' Remove values of i without support in j, return True if changed '''
+        self.stats.revisions += 1
+        before = self.domains[i]
+        after = before & self.support(j, d)
+        if after == before:
+            return False
+        self.stats.pruned += before.bit_count() - after.bit_count()
+        self.domains[i] = after
+        return True
+
+    def propagate(self, arcs: Optional[Iterable[Tuple[int, int, int]]] = None) -> bool:
+        ''' Run AC-3 over arcs (i, j, d), or all arcs, return False on a dead end '''
+        start = time.time()
+        if arcs is None:
+            arcs = [(i, j, d) for i, nbrs in self.neighbors.items()
+                    for j, d in nbrs]
+        queue = deque(arcs)
+        queued = set(queue)
+        try:
+            while queue:
+                arc = queue.popleft()
+                queued.discard(arc)
+                i, j, d = arc
+                if not self.revise(i, j, d):
+                    continue
+                if self.domains[i] == 0:
+                    self.stats.wipeouts += 1
+                    return False
+                for k, dk in self.neighbors[i]:
+                    if k != j and (k, i, dk) not in queued:
+                        queue.append((k, i, dk))
+                        queued.add((k, i, dk))
+            return True
+        finally:
+            self.stats.seconds += time.time() - start
+
+    def assign(self, i: int, point: Point) -> bool:
+        ''' Fix vertex i at point and propagate, return False on a dead end '''
+        self.domains[i] &= self.lattice.bitset([point])
+        if self.domains[i] == 0:
+            self.stats.wipeouts += 1
+            return False
+        return self.propagate((k, i, d) for k, d in self.neighbors.get(i, []))
+
+    @property
+    def consistent(self) -> bool:
+        ''' False if any vertex has run out of places to go '''
+        return all(self.domains)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# render.py - headless drawing of holes, lattices and poses, one collection per layer
+
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.axes import Axes
+from matplotlib.collections import LineCollection
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from .types import Point
+from .problem import Problem, Pose, BASE_PATH
+from .boxlet import polygon_points
+from .valid import pose_edges, edges_ok
+
+# rendered PNGs, named by problem, pose hash and options so a pose is only drawn once
+DEFAULT_CACHE = os.path.join(BASE_PATH, 'renders')
+
+HOLE_COLOR = 'black'
+LATTICE_COLOR = '0.6'
+GOOD_COLOR = 'tab:blue'  # edges in the hole and within epsilon
+BAD_COLOR = 'tab:red'
+
+
+def segments(points: Sequence[Point], edges: Sequence) -> np.ndarray:
+    ''' Get the (E, 2, 2) array of edge endpoints, for a LineCollection '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    return points[edges]
+
+
+def draw_hole(ax: Axes, hole: List[Point], color=HOLE_COLOR, linewidth: float = 1.5) -> LineCollection:
+    cycle = [(i, (i + 1) % len(hole)) for i in range(len(hole))]
+    lines = LineCollection(segments(hole, cycle), colors=color, linewidths=linewidth, zorder=1)
+    ax.add_collection(lines)
+    return lines
+
+
+def draw_lattice(ax: Axes, hole: List[Point], color=LATTICE_COLOR, size: float = 1.0):
+    ''' Scatter every integer point in the hole, as one PathCollection '''
+    points = np.array(sorted(polygon_points(hole)), dtype=np.float64).reshape(-1, 2)
+    return ax.scatter(points[:, 0], points[:, 1], s=size, c=color, linewidths=0, zorder=0)
+
+
+def edge_colors(problem: Problem, pose: Pose) -> List[str]:
+    ''' Color each edge of the pose by whether it keeps to the rules of valid.valid_pose, bonus and all '''
+    bonus = pose.bonuses[0] if pose.bonuses else None
+    edges = pose_edges(problem, bonus) or []
+    ok = edges_ok(problem, pose.vertices, bonus)
+    if ok is None:
+        return [BAD_COLOR] * len(edges)
+    return [GOOD_COLOR if o else BAD_COLOR for o in ok]
+
+
+def draw_pose(ax: Axes, problem: Problem, pose: Pose, linewidth: float = 1.0,
+              marker_size: float = 4.0) -> LineCollection:
+    ''' Draw the pose edges as one LineCollection and its vertices as one PathCollection '''
+    bonus = pose.bonuses[0] if pose.bonuses else None
+    edges = [(a, b) for a, b, _, _ in pose_edges(problem, bonus) or []]
+    lines = LineCollection(segments(pose.vertices, edges), colors=edge_colors(problem, pose),
+                           linewidths=linewidth, zorder=2)
+    ax.add_collection(lines)
+    vertices = np.array(pose.vertices, dtype=np.float64).reshape(-1, 2)
+    ax.scatter(vertices[:, 0], vertices[:, 1], s=marker_size, c=GOOD_COLOR, linewidths=0, zorder=3)
+    return lines
+
+
+def render(problem: Problem, pose: Optional[Pose] = None, lattice: bool = False,
+           title: Optional[str] = None, size: float = 6.0, dpi: int = 100) -> Figure:
+    ''' Draw a problem hole with a pose (default the original figure) on an Agg canvas
+
+    Doesn't touch pyplot, so it works headless and in worker processes.
+    '''
+    pose = pose if pose is not None else Pose(problem.vertices)
+    fig = Figure(figsize=(size, size), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if lattice:
+        draw_lattice(ax, problem.hole)
+    draw_hole(ax, problem.hole)
+    draw_pose(ax, problem, pose)
+    ax.autoscale_view()
+    ax.set_aspect('equal')
+    ax.invert_yaxis()  # problems are drawn with y down
+    if title:
+        ax.set_title(title)
+    return fig
+
+
+def save(fig: Figure, path: str):
+    ''' Write a PNG, via a rename so readers never see half an image '''
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp.png'
+    fig.savefig(tmp, format='png')
+    os.replace(tmp, path)
+
+
+def cache_path(number: int, pose: Optional[Pose], lattice: bool = False,
+               cache: Optional[str] = None) -> str:
+    ''' Get where the image of a pose goes, keyed by the pose hash '''
+    from .store import pose_hash
+    key = pose_hash(pose)[:16] if pose is not None else 'figure'
+    return os.path.join(cache or DEFAULT_CACHE, f'{number}-{key}{"-lattice" if lattice else ""}.png')
+
+
+def render_cached(number: int, pose: Optional[Pose] = None, lattice: bool = False,
+                  cache: Optional[str] = None, title: Optional[str] = None) -> str:
+    ''' Render problem number with pose to the image cache, unless it is already there; return its path '''
+    path = cache_path(number, pose, lattice, cache)
+    if not os.path.exists(path):
+        save(render(Problem.get(number), pose, lattice, title), path)
+    return path
+
+
+def _render_job(job) -> str:
+    return render_cached(*job)
+
+
+if __name__ == '__main__':
+    import argparse
+    from multiprocessing import Pool
+    from .fetch import NUM_PROBLEMS
+    from .store import ResultStore
+    parser = argparse.ArgumentParser(description='render every problem with its best stored pose to PNG')
+    parser.add_argument('problems', type=int, nargs='*', help=f'default is 1 to {NUM_PROBLEMS}')
+    parser.add_argument('-d', '--database', default=None)
+    parser.add_argument('-o', '--output', default=DEFAULT_CACHE, help='image cache directory')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('-l', '--lattice', action='store_true', help='scatter the points inside the hole')
+    args = parser.parse_args()
+    with ResultStore(args.database) as store:
+        best = store.best_all()
+    jobs = []
+    for number in args.problems or range(1, NUM_PROBLEMS + 1):
+        result = best.get(number)
+        pose = result.pose if result is not None else None
+        title = f'{number}: {result.dislikes} dislikes ({result.solver})' if result is not None else f'{number}'
+        jobs.append((number, pose, args.lattice, args.output, title))
+    with Pool(args.jobs) as pool:
+        for path in pool.imap(_render_job, jobs):
+            print(path)
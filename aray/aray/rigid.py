@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# rigid.py - search over rigid placements of the original figure
+
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+from .types import Point
+from .problem import Problem
+from .boxlet import polygon_points
+from .valid import edges_in_hole, stretch_ok
+from .timing import Profile, timed, count
+
+# The 8 lattice isometries fixing the origin, as (xx, xy, yx, yy) matrices
+ISOMETRIES = [(1, 0, 0, 1), (0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0),
+              (1, 0, 0, -1), (-1, 0, 0, 1), (0, 1, 1, 0), (0, -1, -1, 0)]
+
+
+@dataclass
+class Placement:
+    ''' A valid transformed and translated copy of the original figure '''
+    dislikes: int
+    matrix: Tuple[float, float, float, float]  # (xx, xy, yx, yy), before rounding
+    offset: Point  # translation applied after the matrix
+    vertices: List[Point]
+
+
+def distortions(epsilon: int, steps: int) -> List[Tuple[float, float, float, float]]:
+    ''' Get scalings and shears small enough that epsilon might permit them '''
+    if steps <= 0 or epsilon == 0:
+        return []
+    slack = epsilon / 1e6
+    # uniform scaling by s changes squared lengths by s**2
+    lo, hi = math.sqrt(max(0.0, 1 - slack)), math.sqrt(1 + slack)
+    matrices = []
+    for i in range(1, steps + 1):
+        for s in (1 - (1 - lo) * i / steps, 1 + (hi - 1) * i / steps):
+            matrices.append((s, 0.0, 0.0, s))
+        # a shear by k changes squared lengths by at most about k
+        k = slack * i / steps
+        matrices.extend([(1.0, k, 0.0, 1.0), (1.0, -k, 0.0, 1.0),
+                         (1.0, 0.0, k, 1.0), (1.0, 0.0, -k, 1.0)])
+    return matrices
+
+
+def compose(a: Tuple, b: Tuple) -> Tuple:
+    ''' Get the matrix product a @ b of two (xx, xy, yx, yy) matrices '''
+    return (a[0] * b[0] + a[1] * b[2], a[0] * b[1] + a[1] * b[3],
+            a[2] * b[0] + a[3] * b[2], a[2] * b[1] + a[3] * b[3])
+
+
+def transform(vertices: np.ndarray, matrix: Tuple) -> np.ndarray:
+    ''' Apply a matrix to (N, 2) vertices, rounding back to the lattice '''
+    xx, xy, yx, yy = matrix
+    x, y = vertices[:, 0], vertices[:, 1]
+    out = np.stack([xx * x + xy * y, yx * x + yy * y], axis=1)
+    return np.rint(out).astype(np.int64)
+
+
+def placement_mask(placement: Set[Point]) -> Tuple[Point, np.ndarray]:
+    ''' Get the bounding box corner and a boolean grid of the placement points '''
+    points = np.array(sorted(placement), dtype=np.int64)
+    lo = points.min(axis=0)
+    mask = np.zeros(tuple(points.max(axis=0) - lo + 1), dtype=bool)
+    mask[points[:, 0] - lo[0], points[:, 1] - lo[1]] = True
+    return Point(int(lo[0]), int(lo[1])), mask
+
+
+def overlap_counts(mask: np.ndarray, shape: np.ndarray) -> np.ndarray:
+    ''' Count, for every offset of shape within mask, how many of its cells land on mask '''
+    if any(s > m for s, m in zip(shape.shape, mask.shape)):
+        return np.zeros((0, 0), dtype=np.int64)
+    # scipy.signal takes over a second to import, so only workers that search pay for it
+    from scipy.signal import correlate
+    # correlate picks FFT or direct summation, whichever it estimates is faster
+    counts = correlate(mask.astype(np.float64), shape.astype(np.float64), mode='valid')
+    return np.rint(counts).astype(np.int64)
+
+
+class RigidSearch:
+    ''' Score every translation of each transformed figure at once with FFT overlap counts
+
+    Translations keeping every vertex inside the hole are the offsets where
+    the overlap count equals the number of vertices; only those get their
+    edges checked exactly.
+    '''
+
+    def __init__(self, problem: Problem, placement: Optional[Set[Point]] = None):
+        self.problem = problem
+        if placement is None:
+            placement = polygon_points(problem.hole)
+        self.origin, self.mask = placement_mask(placement)
+        self.vertices = np.array(problem.vertices, dtype=np.int64)
+        self.hole = np.array(problem.hole, dtype=np.int64)
+        self.edges = np.array(problem.edges, dtype=np.int64).reshape(-1, 2)
+        self.by_length = np.argsort(-np.array(problem.dists, dtype=np.int64))
+
+    def stretch_ok(self, pose: np.ndarray) -> bool:
+        ''' Return True if every edge of a transformed (untranslated) pose is within epsilon '''
+        a, b = pose[self.edges[:, 0]], pose[self.edges[:, 1]]
+        d_new = ((a - b) ** 2).sum(axis=1).tolist()
+        return all(stretch_ok(d_old, d, self.problem.epsilon)
+                   for d_old, d in zip(self.problem.dists, d_new))
+
+    def edges_ok(self, poses: np.ndarray, batch: int = 8) -> np.ndarray:
+        ''' Get whether every edge lies in the hole, for a (K, N, 2) stack of placed poses '''
+        # check a few edges at a time, longest first, dropping poses as soon as one fails
+        alive = np.arange(len(poses))
+        for i in range(0, len(self.edges), batch):
+            edges = self.edges[self.by_length[i:i + batch]]
+            a, b = poses[alive][:, edges[:, 0]], poses[alive][:, edges[:, 1]]
+            # every vertex is already known to be inside
+            ok = edges_in_hole(self.problem.hole, a.reshape(-1, 2), b.reshape(-1, 2), check_endpoints=False)
+            alive = alive[ok.reshape(len(alive), -1).all(axis=1)]
+            if len(alive) == 0:
+                break
+        keep = np.zeros(len(poses), dtype=bool)
+        keep[alive] = True
+        return keep
+
+    def dislikes(self, pose: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        ''' Get the dislikes of pose under each of (K, 2) offsets
+
+        The nearest pose vertex to hole vertex h under offset t is the nearest
+        to h - t in the untranslated pose, so one distance transform of the
+        pose gives every offset by lookup.
+        '''
+        q = self.hole[None, :, :] - offsets[:, None, :]  # (K, H, 2)
+        lo = np.minimum(q.reshape(-1, 2).min(axis=0), pose.min(axis=0))
+        hi = np.maximum(q.reshape(-1, 2).max(axis=0), pose.max(axis=0))
+        from scipy.ndimage import distance_transform_edt
+        empty = np.ones(tuple(hi - lo + 1), dtype=bool)
+        empty[pose[:, 0] - lo[0], pose[:, 1] - lo[1]] = False
+        nearest = np.rint(distance_transform_edt(empty) ** 2).astype(np.int64)
+        return nearest[q[..., 0] - lo[0], q[..., 1] - lo[1]].sum(axis=1)
+
+    def translation_map(self, pose: np.ndarray, check_edges: bool = True) -> Tuple[Point, np.ndarray]:
+        ''' Get the map of translations keeping pose inside the hole
+
+        Returns (corner, valid), where valid[i, j] says whether translating
+        pose by corner + (i, j) puts every vertex inside the hole, and with
+        check_edges every edge too; the edges of only those offsets get checked.
+        '''
+        lo = pose.min(axis=0)
+        shape = np.zeros(tuple(pose.max(axis=0) - lo + 1), dtype=bool)
+        shape[pose[:, 0] - lo[0], pose[:, 1] - lo[1]] = True
+        valid = overlap_counts(self.mask, shape) == shape.sum()
+        corner = np.array(self.origin) - lo
+        if check_edges and valid.any():
+            offsets = np.argwhere(valid)
+            keep = self.edges_ok(pose[None, :, :] + (offsets + corner)[:, None, :])
+            valid[tuple(offsets[~keep].T)] = False
+        return Point(*corner.tolist()), valid
+
+    def translations(self, pose: np.ndarray, check_edges: bool = False) -> np.ndarray:
+        ''' Get the (K, 2) translations that put every vertex (and optionally edge) of pose inside the hole '''
+        corner, valid = self.translation_map(pose, check_edges)
+        return np.argwhere(valid) + np.array(corner)
+
+    def placements(self, matrix: Tuple, limit: Optional[int] = None) -> List[Placement]:
+        ''' Get the valid placements of the figure transformed by matrix, best first '''
+        pose = transform(self.vertices, matrix)
+        if not self.stretch_ok(pose):
+            return []
+        offsets = self.translations(pose)
+        if len(offsets) == 0:
+            return []
+        # dislikes are cheap next to edge checks, so rank first and check edges in order
+        poses = pose[None, :, :] + offsets[:, None, :]
+        dislikes = self.dislikes(pose, offsets)
+        order = np.argsort(dislikes, kind='stable')
+        step = len(order) if limit is None else 4 * limit
+        found = []
+        for i in range(0, len(order), step):
+            chunk = order[i:i + step]
+            found.extend(chunk[self.edges_ok(poses[chunk])].tolist())
+            if limit is not None and len(found) >= limit:
+                found = found[:limit]
+                break
+        return [Placement(int(dislikes[k]), matrix, Point(*offsets[k].tolist()),
+                          [Point(*p) for p in poses[k].tolist()]) for k in found]
+
+    @timed('rigid')
+    def search(self, steps: int = 0, limit: Optional[int] = None) -> List[Placement]:
+        ''' Get valid placements over all isometries and distortions, best first '''
+        matrices = list(ISOMETRIES)
+        for distortion in distortions(self.problem.epsilon, steps):
+            matrices.extend(compose(m, distortion) for m in ISOMETRIES)
+        seen = set()
+        results = []
+        count('rigid_matrices', len(matrices))
+        for matrix in matrices:
+            # symmetric figures give the same placement under several matrices
+            for placement in self.placements(matrix, limit):
+                key = tuple(placement.vertices)
+                if key not in seen:
+                    seen.add(key)
+                    results.append(placement)
+        results.sort(key=lambda p: p.dislikes)
+        return results[:limit] if limit is not None else results
+
+
+def translation_map(problem: Problem, vertices: Optional[List[Point]] = None,
+                    check_edges: bool = True) -> Tuple[Point, np.ndarray]:
+    ''' Get (corner, valid) where valid[i, j] says if translating vertices by corner + (i, j) is valid
+
+    vertices defaults to the original figure, and are checked as they are,
+    so they need not be within epsilon of it.
+    '''
+    search = RigidSearch(problem)
+    pose = search.vertices if vertices is None else np.array(vertices, dtype=np.int64).reshape(-1, 2)
+    return search.translation_map(pose, check_edges)
+
+
+def rigid_placements(problem: Problem, steps: int = 0, limit: Optional[int] = None) -> List[Placement]:
+    ''' Get valid rigid (or slightly distorted) placements of the figure, best first '''
+    return RigidSearch(problem).search(steps, limit)
+
+
+if __name__ == '__main__':
+    import json
+    import time
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('problem_number', type=int)
+    parser.add_argument('-s', '--steps', type=int, default=0, help='distortion steps')
+    parser.add_argument('-n', '--limit', type=int, default=5)
+    parser.add_argument('--profile', default=None, help='append a JSON timing record to this file')
+    args = parser.parse_args()
+    start = time.time()
+    with Profile('rigid', args.problem_number, args.profile, steps=args.steps, limit=args.limit):
+        found = rigid_placements(Problem.get(args.problem_number), args.steps, args.limit)
+    print(f'{len(found)} placements in {time.time() - start:.2f}s')
+    for p in found:
+        print(p.dislikes, p.matrix, p.offset)
+    if found:
+        print(json.dumps({'vertices': found[0].vertices}))
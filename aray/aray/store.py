@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# store.py - sqlite database of poses found by every solver, with the verified best per problem
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .problem import Problem, Pose, BASE_PATH
+from .dislike import dislikes as get_dislikes
+from .valid import valid_pose
+
+# where the database lives, unless given a path or ARAY_RESULTS
+DEFAULT_PATH = os.path.join(BASE_PATH, 'results.sqlite3')
+
+# solution files from before the store, named like '{problem}-{dislikes}-{solver}.json'
+FILENAME_REGEX = re.compile(r'(\d+)-(\d+)-(.+)\.json$')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS poses (
+    id INTEGER PRIMARY KEY,
+    problem INTEGER NOT NULL,
+    dislikes INTEGER NOT NULL,
+    solver TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    pose_hash TEXT NOT NULL,
+    pose TEXT NOT NULL,
+    valid INTEGER NOT NULL,
+    UNIQUE (problem, pose_hash)
+);
+CREATE INDEX IF NOT EXISTS poses_by_score ON poses (problem, valid, dislikes);
+CREATE TABLE IF NOT EXISTS best (
+    problem INTEGER PRIMARY KEY,
+    dislikes INTEGER NOT NULL,
+    pose_id INTEGER NOT NULL REFERENCES poses (id)
+);
+'''
+
+
+def pose_hash(pose: Pose) -> str:
+    ''' Get a hash of the pose JSON, the same for the same vertices and bonuses '''
+    canonical = json.dumps(json.loads(pose.json()), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass
+class Result:
+    ''' A pose in the store '''
+    id: int
+    problem: int
+    dislikes: int
+    solver: str
+    timestamp: float
+    pose_hash: str
+    pose: Pose
+    valid: bool
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> 'Result':
+        return cls(row['id'], row['problem'], row['dislikes'], row['solver'], row['timestamp'],
+                   row['pose_hash'], Pose.from_json(json.loads(row['pose'])), bool(row['valid']))
+
+
+class ResultStore:
+    ''' Poses keyed by (problem, dislikes, solver, timestamp, pose hash)
+
+    Every pose is scored and checked when added, so the best table only ever
+    holds valid poses. Writes are single transactions in WAL mode, so solver
+    processes can add to the same file at once.
+    '''
+
+    def __init__(self, path: Optional[str] = None, timeout: float = 30.0):
+        self.path = path or os.environ.get('ARAY_RESULTS', DEFAULT_PATH)
+        # autocommit, so transactions are only the ones we begin
+        self.conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self) -> 'ResultStore':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, problem_number: int, pose: Pose, solver: str,
+            problem: Optional[Problem] = None, timestamp: Optional[float] = None) -> Result:
+        ''' Score, check and add a pose, returning its result (the existing one if already stored) '''
+        if problem is None:
+            problem = Problem.get(problem_number)
+        digest = pose_hash(pose)
+        existing = self.conn.execute('SELECT * FROM poses WHERE problem = ? AND pose_hash = ?',
+                                     (problem_number, digest)).fetchone()
+        if existing is not None:
+            return Result.from_row(existing)
+        bonus = pose.bonuses[0] if pose.bonuses else None
+        valid = valid_pose(problem, pose.vertices, bonus)
+        dislikes = get_dislikes(problem.hole, pose.vertices)
+        timestamp = time.time() if timestamp is None else timestamp
+        # take the write lock up front, so the best table can't race another writer
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = self.conn.execute(
+                'INSERT OR IGNORE INTO poses (problem, dislikes, solver, timestamp, pose_hash, pose, valid) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (problem_number, dislikes, solver, timestamp, digest, pose.json(), int(valid)))
+            if cursor.rowcount and valid:
+                self.conn.execute(
+                    'INSERT INTO best (problem, dislikes, pose_id) VALUES (?, ?, ?) '
+                    'ON CONFLICT (problem) DO UPDATE SET dislikes = excluded.dislikes, pose_id = excluded.pose_id '
+                    'WHERE excluded.dislikes < best.dislikes',
+                    (problem_number, dislikes, cursor.lastrowid))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        row = self.conn.execute('SELECT * FROM poses WHERE problem = ? AND pose_hash = ?',
+                                (problem_number, digest)).fetchone()
+        return Result.from_row(row)
+
+    def best(self, problem_number: int) -> Optional[Result]:
+        ''' Get the best valid pose for a problem, if any '''
+        row = self.conn.execute('SELECT poses.* FROM best JOIN poses ON poses.id = best.pose_id '
+                                'WHERE best.problem = ?', (problem_number,)).fetchone()
+        return Result.from_row(row) if row is not None else None
+
+    def best_all(self) -> Dict[int, Result]:
+        ''' Get the best valid pose of every problem that has one '''
+        rows = self.conn.execute('SELECT poses.* FROM best JOIN poses ON poses.id = best.pose_id '
+                                 'ORDER BY best.problem')
+        return {row['problem']: Result.from_row(row) for row in rows}
+
+    def results(self, problem_number: Optional[int] = None, solver: Optional[str] = None,
+                valid: Optional[bool] = None) -> Iterator[Result]:
+        ''' Generate stored poses, best first, optionally filtered '''
+        where, args = [], []
+        for column, value in (('problem', problem_number), ('solver', solver), ('valid', valid)):
+            if value is not None:
+                where.append(f'{column} = ?')
+                args.append(int(value) if isinstance(value, bool) else value)
+        query = 'SELECT * FROM poses'
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query += ' ORDER BY problem, dislikes, timestamp'
+        for row in self.conn.execute(query, args):
+            yield Result.from_row(row)
+
+    def import_files(self, paths: Iterable[str]) -> List[Result]:
+        ''' Add solution files named like '{problem}-{dislikes}-{solver}.json', skipping other names '''
+        added = []
+        for path in paths:
+            match = FILENAME_REGEX.match(os.path.basename(path))
+            if not match:
+                continue
+            with open(path) as f:
+                pose = Pose.from_json(json.load(f))
+            added.append(self.add(int(match.group(1)), pose, match.group(3),
+                                  timestamp=os.path.getmtime(path)))
+        return added
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--database', default=None)
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='add solution files named {problem}-{dislikes}-{solver}.json')
+    import_parser.add_argument('paths', nargs='+')
+    commands.add_parser('best', help='print the best valid pose score per problem')
+    args = parser.parse_args()
+    with ResultStore(args.database) as store:
+        if args.command == 'import':
+            for result in store.import_files(args.paths):
+                print(result.problem, result.dislikes, result.solver, 'valid' if result.valid else 'INVALID')
+        else:
+            for number, result in store.best_all().items():
+                print(number, result.dislikes, result.solver)
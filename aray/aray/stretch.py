@@ -5,8 +5,11 @@
 from math import sin, cos
 from typing import List, Set
 
+import numpy as np
+
 from .util import ceil, floor, dist
 from .types import Point
+from .timing import timed
 
 
 def slow_stretch(a: Point, b: Point, epsilon: int) -> List[Point]:
@@ -14,16 +17,21 @@ def slow_stretch(a: Point, b: Point, epsilon: int) -> List[Point]:
     d = dist(a, b)
     return center_stretch(dist(a, b), epsilon)
 
+@timed('rings')
 def center_stretch(d: int, epsilon: int) -> List[Point]:
-    n = ceil(d ** .5 + 1)
-    center = Point(0, 0)
-    points = []
-    for x in range(-n, n + 1):
-        for y in range(-n, n + 1):
-            p = Point(x, y)
-            if abs(dist(center, Point(x, y))/d - 1) <= epsilon / 1_000_000:
-                points.append(Point(x, y))
-    return points
+    # outer radius grows with epsilon, so size the search box from it
+    n = ceil((d * (1 + epsilon / 1_000_000)) ** .5 + 1)
+    # evaluate the whole box at once, points come out ordered by x then y
+    xs, ys = np.meshgrid(np.arange(-n, n + 1), np.arange(-n, n + 1), indexing='ij')
+    valid = np.abs((xs ** 2 + ys ** 2) / d - 1) <= epsilon / 1_000_000
+    return [Point(int(x), int(y)) for x, y in zip(xs[valid], ys[valid])]
+
+
+def stretch(start: Point, d: int, epsilon: int, placement: Set[Point]) -> Set[Point]:
+    """ Get the valid set of points in placement for a given start and old squared distance """
+    points = (Point(start.x + c.x, start.y + c.y)
+              for c in center_stretch(d, epsilon))
+    return set(p for p in points if p in placement)
 
 
 # def stretch(start: Point, d_old: int, epsilon: int, placement: Set[Point]) -> Set[Point]:
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# submit.py - asyncio submission to poses.live, rate limited, retried and polled for a score
+
+import os
+import time
+import random
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# the server to talk to, set ICFP2021_API_URL to use a local stand-in (see mockserver.py)
+DEFAULT_URL = 'https://poses.live'
+URL_ENV = 'ICFP2021_API_URL'
+KEY_ENV = 'ICFP2021_API_KEY'
+
+# answers worth trying again, anything else is final
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# states of a pose on the server, FAILED is ours for a submission that never got an id
+PENDING = 'PENDING'
+VALID = 'VALID'
+INVALID = 'INVALID'
+FAILED = 'FAILED'
+
+
+def api_url() -> str:
+    return os.environ.get(URL_ENV, DEFAULT_URL).rstrip('/')
+
+
+class TokenBucket:
+    ''' Allow rate requests per second on average, and bursts of up to capacity '''
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        assert rate > 0, f'{rate} is not a rate'
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def take(self, now: Optional[float] = None) -> float:
+        ''' Take a token if there is one and return 0, else return the seconds until there is one '''
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        ''' Wait for a token, callers are served in order '''
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                wait = self.take()
+                if wait == 0:
+                    return
+                await asyncio.sleep(wait)
+
+
+def backoff(attempt: int, base: float, cap: float, rng: random.Random) -> float:
+    ''' Full jitter: uniform up to the exponential delay, so retries from many tasks spread out '''
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+@dataclass
+class Submission:
+    ''' What became of one posted pose '''
+    problem: int
+    pose_id: Optional[str] = None
+    state: str = PENDING
+    dislikes: Optional[int] = None
+    error: Optional[str] = None
+    attempts: int = 0  # requests made for it, retries and polls included
+
+
+class Submitter:
+    ''' Post poses and poll their scores, sharing one connection pool and one rate limit
+
+    The HTTP itself is blocking requests, run in worker threads, so at most
+    concurrency requests are in flight. Use as an async context manager.
+    '''
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 rate: float = 2.0, burst: Optional[float] = None, concurrency: int = 4,
+                 retries: int = 5, backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                 poll_interval: float = 1.0, poll_timeout: float = 120.0,
+                 timeout: float = 30.0, seed: Optional[int] = None):
+        self.api_key = api_key if api_key is not None else os.environ[KEY_ENV]
+        self.base_url = (base_url or api_url()).rstrip('/')
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.poll_interval = poll_interval
+        self.poll_timeout = poll_timeout
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {self.api_key}'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> 'Submitter':
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    async def request(self, method: str, path: str, submission: Optional[Submission] = None,
+                      **kwargs) -> requests.Response:
+        ''' Make a request when the rate limit allows, retrying failures with jittered backoff '''
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        url = self.base_url + path
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            if submission is not None:
+                submission.attempts += 1
+            try:
+                async with self._slots:
+                    r = await asyncio.to_thread(self.session.request, method, url,
+                                                timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(backoff(attempt, self.backoff_base, self.backoff_cap, self.rng))
+                continue
+            if r.status_code not in RETRY_STATUS or attempt == self.retries:
+                r.raise_for_status()
+                return r
+            delay = backoff(attempt, self.backoff_base, self.backoff_cap, self.rng)
+            retry_after = r.headers.get('Retry-After')
+            if retry_after is not None:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass  # an HTTP date, the jitter will do
+            await asyncio.sleep(delay)
+        raise AssertionError('unreachable')
+
+    async def post(self, problem_number: int, pose: Dict,
+                   submission: Optional[Submission] = None) -> Submission:
+        ''' Post a pose, returning its submission with the server's pose id '''
+        submission = submission or Submission(problem_number)
+        r = await self.request('POST', f'/api/problems/{problem_number}/solutions', submission, json=pose)
+        submission.pose_id = r.json()['id']
+        return submission
+
+    async def get_status(self, problem_number: int, pose_id: str,
+                         submission: Optional[Submission] = None) -> Dict:
+        r = await self.request('GET', f'/api/problems/{problem_number}/solutions/{pose_id}', submission)
+        return r.json()
+
+    async def wait(self, submission: Submission) -> Submission:
+        ''' Poll until the server has scored the submission, or poll_timeout passes '''
+        deadline = time.monotonic() + self.poll_timeout
+        while True:
+            status = await self.get_status(submission.problem, submission.pose_id, submission)
+            submission.state = status.get('state', PENDING)
+            if submission.state != PENDING:
+                submission.dislikes = status.get('dislikes')
+                submission.error = status.get('error')
+                return submission
+            if time.monotonic() >= deadline:
+                return submission
+            await asyncio.sleep(self.poll_interval)
+
+    async def submit(self, problem_number: int, pose: Dict, wait: bool = True) -> Submission:
+        ''' Post a pose and, if wait, poll for its score; failures end up in the submission '''
+        submission = Submission(problem_number)
+        try:
+            await self.post(problem_number, pose, submission)
+        except requests.RequestException as e:
+            submission.state, submission.error = FAILED, repr(e)
+            return submission
+        if wait:
+            try:
+                await self.wait(submission)
+            except requests.RequestException as e:
+                submission.error = repr(e)  # posted, but we don't know the score
+        return submission
+
+    async def submit_all(self, poses: Iterable[Tuple[int, Dict]], wait: bool = True) -> List[Submission]:
+        ''' Submit (problem number, pose) pairs at once, in the order given '''
+        return list(await asyncio.gather(*(self.submit(n, pose, wait) for n, pose in poses)))
+
+
+def submit_poses(poses: Iterable[Tuple[int, Dict]], wait: bool = True, **kwargs) -> List[Submission]:
+    ''' Blocking submit_all, for scripts; kwargs go to Submitter '''
+    async def run():
+        async with Submitter(**kwargs) as submitter:
+            return await submitter.submit_all(poses, wait)
+    return asyncio.run(run())
+
+
+if __name__ == '__main__':
+    import json
+    import argparse
+    from .store import ResultStore
+    parser = argparse.ArgumentParser(description='submit the best stored pose for problems')
+    parser.add_argument('problems', type=int, nargs='*', help='default is every problem in the store')
+    parser.add_argument('-d', '--database', default=None)
+    parser.add_argument('-r', '--rate', type=float, default=2.0, help='requests per second')
+    parser.add_argument('--no-wait', action='store_true', help="don't poll for scores")
+    args = parser.parse_args()
+    with ResultStore(args.database) as store:
+        best = store.best_all()
+    numbers = args.problems or list(best)
+    poses = [(n, json.loads(best[n].pose.json())) for n in numbers if n in best]
+    for s in submit_poses(poses, wait=not args.no_wait, rate=args.rate):
+        print(s.problem, s.state, s.dislikes, s.pose_id, s.error or '')
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# tables.py - (ax, ay, bx, by) tables of edge placements, built in numpy
+'''
+For an edge of squared length d, the allowed table is every (a, b) with
+both ends on lattice points of the hole, b - a on the ring of d, and a-b
+inside the hole. It is built a ring delta at a time: shift the lattice
+grid by the delta to get every start a with a + delta in the hole, then
+drop the starts whose segment leaves it. A segment between hole points
+can only leave through the pockets (valid.pocket_edges), so only starts
+whose segment's bounding box meets a pocket edge's get the exact check.
+
+Tables grow as lattice points times ring size, so count the pairs with
+table_size first; it only shifts the grid.
+'''
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .types import Point
+from .problem import Problem
+from .boxlet import polygon_points
+from .stretch import center_stretch
+from .valid import edges_in_hole, pocket_edges
+from .timing import timed, count
+
+
+class Lattice:
+    ''' The lattice points of a hole as a dense boolean grid, indexed from the hole's bounding box corner '''
+
+    def __init__(self, hole: List[Point]):
+        self.hole = hole
+        points = np.array(sorted(polygon_points(hole)), dtype=np.int64).reshape(-1, 2)
+        self.origin = points.min(axis=0)
+        self.grid = np.zeros(points.max(axis=0) - self.origin + 1, dtype=bool)
+        self.grid[tuple((points - self.origin).T)] = True
+        self.points = points  # sorted by x then y, the order of np.argwhere(self.grid)
+        # position of each point in self.points, -1 outside the hole
+        self.index = np.full(self.grid.shape, -1, dtype=np.int32)
+        self.index[self.grid] = np.arange(len(points), dtype=np.int32)
+        # (x0, y0, x1, y1) bounding boxes of the pocket edges, in grid indexes
+        u = np.array(hole, dtype=np.int64)
+        v = np.roll(u, -1, axis=0)
+        pockets = pocket_edges(hole)
+        self.pockets = np.hstack([np.minimum(u, v)[pockets], np.maximum(u, v)[pockets]]) - np.tile(self.origin, 2)
+
+    def overlap(self, delta: Tuple[int, int]) -> Optional[Tuple[slice, slice, slice, slice]]:
+        ''' Get the grid slices of starts a and ends a + delta that can both be in the grid, None if none can '''
+        (w, h), (dx, dy) = self.grid.shape, delta
+        if abs(dx) >= w or abs(dy) >= h:
+            return None
+        return (slice(max(0, -dx), w - max(0, dx)), slice(max(0, -dy), h - max(0, dy)),
+                slice(max(0, dx), w - max(0, -dx)), slice(max(0, dy), h - max(0, -dy)))
+
+    def count(self, delta: Tuple[int, int]) -> int:
+        ''' Count the starts a with a and a + delta in the hole '''
+        if self.overlap(delta) is None:
+            return 0
+        ax, ay, bx, by = self.overlap(delta)
+        return int(np.count_nonzero(self.grid[ax, ay] & self.grid[bx, by]))
+
+    def danger(self, delta: Tuple[int, int]) -> np.ndarray:
+        ''' Get the grid mask of starts whose segment to a + delta has a bounding box meeting a pocket edge's '''
+        return self.paint(delta, delta)
+
+    def ring_danger(self, deltas: List[Tuple[int, int]]) -> np.ndarray:
+        ''' Get a grid mask holding the danger mask of every delta, from the deltas' bounding box '''
+        deltas = np.asarray(deltas).reshape(-1, 2)
+        return self.paint(deltas.min(axis=0), deltas.max(axis=0))
+
+    def paint(self, lo: Tuple[int, int], hi: Tuple[int, int]) -> np.ndarray:
+        ''' Get the grid mask of starts a whose box [a + min(0, lo), a + max(0, hi)] meets a pocket edge's '''
+        w, h = self.grid.shape
+        # the box meets box [p0, p1] when a is in [p0 - max(0, hi), p1 - min(0, lo)]
+        x0 = np.clip(self.pockets[:, 0] - max(0, hi[0]), 0, w)
+        y0 = np.clip(self.pockets[:, 1] - max(0, hi[1]), 0, h)
+        x1 = np.clip(self.pockets[:, 2] - min(0, lo[0]) + 1, 0, w)
+        y1 = np.clip(self.pockets[:, 3] - min(0, lo[1]) + 1, 0, h)
+        # paint the rectangles into a difference array, then sum it up
+        paint = np.zeros((w + 1, h + 1), dtype=np.int32)
+        np.add.at(paint, (x0, y0), 1)
+        np.add.at(paint, (x0, y1), -1)
+        np.add.at(paint, (x1, y0), -1)
+        np.add.at(paint, (x1, y1), 1)
+        return paint.cumsum(axis=0).cumsum(axis=1)[:w, :h] > 0
+
+    def pairs(self, delta: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        ''' Get the (allowed, forbidden) (N, 4) rows for one ring delta '''
+        if self.overlap(delta) is None:
+            return rows(np.zeros((0, 2), dtype=np.int64), delta), rows(np.zeros((0, 2), dtype=np.int64), delta)
+        ax, ay, bx, by = self.overlap(delta)
+        both = np.zeros_like(self.grid)
+        both[ax, ay] = self.grid[ax, ay] & self.grid[bx, by]
+        check = both & self.danger(delta)
+        safe = np.argwhere(both & ~check) + self.origin
+        suspect = np.argwhere(check) + self.origin
+        ok = edges_in_hole(self.hole, suspect, suspect + delta, check_endpoints=False)
+        count('table_checks', len(suspect))
+        return rows(np.vstack([safe, suspect[ok]]), delta), rows(suspect[~ok], delta)
+
+
+def rows(starts: np.ndarray, delta: Tuple[int, int]) -> np.ndarray:
+    # int32, these tables are the big memory in a model
+    return np.hstack([starts, starts + delta]).astype(np.int32).reshape(-1, 4)
+
+
+def index_rows(lattice: Lattice, table: np.ndarray) -> np.ndarray:
+    ''' Convert (N, 4) (ax, ay, bx, by) rows to (N, 2) rows of lattice point indexes '''
+    cells = table.astype(np.int64).reshape(-1, 2, 2) - lattice.origin
+    return lattice.index[cells[..., 0], cells[..., 1]]
+
+
+def table_size(lattice: Lattice, deltas: Sequence[Tuple[int, int]]) -> int:
+    ''' Get the rows of the allowed and forbidden tables of an edge together, without building them '''
+    return sum(lattice.count(delta) for delta in deltas)
+
+
+@timed('tables')
+def pair_tables(lattice: Lattice, deltas: Sequence[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    ''' Get the (allowed, forbidden) (N, 4) tables of (ax, ay, bx, by) for an edge with these ring deltas '''
+    allowed, forbidden = zip(*(lattice.pairs(delta) for delta in deltas)) if deltas else ((), ())
+    allowed = np.vstack(allowed or [np.zeros((0, 4), dtype=np.int32)])
+    forbidden = np.vstack(forbidden or [np.zeros((0, 4), dtype=np.int32)])
+    count('table_rows', len(allowed))
+    return allowed, forbidden
+
+
+def allowed_table(lattice: Lattice, deltas: Sequence[Tuple[int, int]], max_rows: Optional[int] = None) -> np.ndarray:
+    ''' Get the allowed (N, 4) table of an edge, refusing with ValueError if it could pass max_rows '''
+    size = table_size(lattice, deltas)
+    if max_rows is not None and size > max_rows:
+        raise ValueError(f'table of up to {size} rows is over {max_rows}')
+    return pair_tables(lattice, deltas)[0]
+
+
+def table_sizes(problem: Problem, lattice: Optional[Lattice] = None) -> Dict[int, int]:
+    ''' Get table_size per distinct edge length of a problem '''
+    lattice = lattice or Lattice(problem.hole)
+    return {d: table_size(lattice, center_stretch(d, problem.epsilon)) for d in sorted(set(problem.dists))}
+
+
+def allowed_tables(problem: Problem, max_rows: Optional[int] = None) -> Dict[int, np.ndarray]:
+    ''' Get the allowed table per distinct edge length of a problem '''
+    lattice = Lattice(problem.hole)
+    return {d: allowed_table(lattice, center_stretch(d, problem.epsilon), max_rows)
+            for d in sorted(set(problem.dists))}
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='report the allowed table size per edge length')
+    parser.add_argument('problem', type=int)
+    parser.add_argument('-b', '--build', action='store_true', help='build the tables too')
+    args = parser.parse_args()
+    problem = Problem.get(args.problem)
+    lattice = Lattice(problem.hole)
+    for d, size in table_sizes(problem, lattice).items():
+        line = f'{d:>8} {size:>12} rows'
+        if args.build:
+            allowed, forbidden = pair_tables(lattice, center_stretch(d, problem.epsilon))
+            line += f' {len(allowed):>12} allowed {len(forbidden):>10} forbidden'
+        print(line)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# timing.py - per-stage timers and counters, one JSON record per problem run
+
+import os
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterator, Optional
+
+# append every run's record to this file as a line of JSON, unless given a path
+PROFILE_ENV = 'ARAY_PROFILE'
+
+
+class Profile:
+    ''' Wall time per stage and counters for one problem run
+
+    Use as a context manager around the run; while it is open, stage() and
+    count() anywhere in the process record into it. Stages may nest, so
+    their seconds can overlap; 'total' is the wall time of the whole run.
+    '''
+
+    def __init__(self, solver: str, problem: Optional[int] = None,
+                 path: Optional[str] = None, **info):
+        self.solver = solver
+        self.problem = problem
+        self.path = path  # where to append the record, else PROFILE_ENV
+        self.info = dict(info)  # anything else worth grouping runs by
+        self.started = time.time()
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.total: Optional[float] = None
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+        self._tokens = []
+
+    def __enter__(self) -> 'Profile':
+        # total counts from creation, so stages run before entering are part of it
+        self._tokens.append(_ACTIVE.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _ACTIVE.reset(self._tokens.pop())
+        self.total = time.perf_counter() - self._start
+        if exc is not None:
+            self.error = repr(exc)
+        self.emit()
+        return False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        ''' Time the body as one call of stage name '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def count(self, name: str, n: int = 1):
+        ''' Add n to counter name '''
+        self.counts[name] += n
+
+    def record(self) -> Dict:
+        ''' Get the run as a JSON-able dict '''
+        total = self.total if self.total is not None else time.perf_counter() - self._start
+        return dict(solver=self.solver, problem=self.problem, started=self.started,
+                    total=total, seconds=dict(self.seconds), calls=dict(self.calls),
+                    counts=dict(self.counts), info=self.info, error=self.error)
+
+    def emit(self) -> Optional[str]:
+        ''' Append the record to path (or PROFILE_ENV) as a line of JSON, return where if anywhere '''
+        path = self.path or os.environ.get(PROFILE_ENV)
+        if not path:
+            return None
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.record(), sort_keys=True) + '\n')
+        return path
+
+
+_ACTIVE: ContextVar[Optional[Profile]] = ContextVar('profile', default=None)
+
+
+def active() -> Optional[Profile]:
+    ''' Get the profile of the run in progress, if any '''
+    return _ACTIVE.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    ''' Time the body into the run in progress, or do nothing outside of one '''
+    profile = _ACTIVE.get()
+    if profile is None:
+        yield
+        return
+    with profile.stage(name):
+        yield
+
+
+def count(name: str, n: int = 1):
+    ''' Add n to a counter of the run in progress, if any '''
+    profile = _ACTIVE.get()
+    if profile is not None:
+        profile.count(name, n)
+
+
+def timed(name: str) -> Callable:
+    ''' Decorate a function to time each call as stage name '''
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = _ACTIVE.get()
+            if profile is None:
+                return fn(*args, **kwargs)
+            with profile.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load_records(path: str) -> Iterator[Dict]:
+    ''' Read back the records appended to path '''
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
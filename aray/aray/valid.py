@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# valid.py - exact integer checks for whether a pose fits in the hole
+
+from fractions import Fraction
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .types import Point
+from .problem import Problem, UsedBonus, GLOBALIST, SUPERFLEX, WALLHACK, BREAK_A_LEG
+from .util import dist
+from .timing import timed
+
+
+def orient(a: Point, b: Point, c: Point) -> int:
+    ''' Get the sign of the cross product (b - a) x (c - a) '''
+    val = (b.x - a.x) * (c.y - a.y) - (b.y - a.y) * (c.x - a.x)
+    return (val > 0) - (val < 0)
+
+
+def on_segment(p: Point, a: Point, b: Point) -> bool:
+    ''' Return True if p lies on the closed segment a-b '''
+    return (orient(a, b, p) == 0
+            and min(a.x, b.x) <= p.x <= max(a.x, b.x)
+            and min(a.y, b.y) <= p.y <= max(a.y, b.y))
+
+
+def crosses(a: Point, b: Point, c: Point, d: Point) -> bool:
+    ''' Return True if segments a-b and c-d cross at a single interior point '''
+    o1, o2 = orient(a, b, c), orient(a, b, d)
+    o3, o4 = orient(c, d, a), orient(c, d, b)
+    return o1 * o2 < 0 and o3 * o4 < 0
+
+
+def point_in_hole(hole: List[Point], p: Point) -> bool:
+    ''' Return True if p is inside the hole or on its boundary '''
+    inside = False
+    for i in range(len(hole)):
+        u, v = hole[i], hole[(i + 1) % len(hole)]
+        if on_segment(p, u, v):
+            return True
+        if (u.y > p.y) != (v.y > p.y):
+            # does a ray from p towards +x cross edge u-v
+            lhs = (p.x - u.x) * (v.y - u.y)
+            rhs = (p.y - u.y) * (v.x - u.x)
+            if (lhs < rhs) == (v.y > u.y):
+                inside = not inside
+    return inside
+
+
+def edge_in_hole(hole: List[Point], a: Point, b: Point) -> bool:
+    ''' Return True if the whole segment a-b lies inside the hole or on its boundary '''
+    if not point_in_hole(hole, a) or not point_in_hole(hole, b):
+        return False
+    n = len(hole)
+    for i in range(n):
+        if crosses(a, b, hole[i], hole[(i + 1) % n]):
+            return False
+    # Hole vertices touching a-b split it into pieces that each lie wholly
+    # inside or outside, so checking the midpoint of every piece is exact
+    # (in doubled coordinates so the midpoints stay on the integer lattice)
+    cuts = sorted(set([a, b] + [h for h in hole if on_segment(h, a, b)]),
+                  key=lambda p: dist(a, p))
+    doubled = [Point(2 * h.x, 2 * h.y) for h in hole]
+    for p, q in zip(cuts, cuts[1:]):
+        if not point_in_hole(doubled, Point(p.x + q.x, p.y + q.y)):
+            return False
+    return True
+
+
+def _orient(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    ''' Get the sign of (b - a) x (c - a) over broadcast arrays of points '''
+    val = ((b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1])
+           - (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0]))
+    return np.sign(val)
+
+
+def _between(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    ''' Get whether p is within the bounding box of a and b, broadcast '''
+    return ((np.minimum(a[..., 0], b[..., 0]) <= p[..., 0]) & (p[..., 0] <= np.maximum(a[..., 0], b[..., 0]))
+            & (np.minimum(a[..., 1], b[..., 1]) <= p[..., 1]) & (p[..., 1] <= np.maximum(a[..., 1], b[..., 1])))
+
+
+def points_in_hole(hole: List[Point], points: np.ndarray) -> np.ndarray:
+    ''' Vectorized point_in_hole over an (M, 2) array of points '''
+    u = np.array(hole, dtype=np.int64)[None, :, :]
+    v = np.roll(u, -1, axis=1)
+    p = np.asarray(points, dtype=np.int64)[:, None, :]
+    on = ((_orient(u, v, p) == 0) & _between(p, u, v)).any(axis=1)
+    straddle = (u[..., 1] > p[..., 1]) != (v[..., 1] > p[..., 1])
+    lhs = (p[..., 0] - u[..., 0]) * (v[..., 1] - u[..., 1])
+    rhs = (p[..., 1] - u[..., 1]) * (v[..., 0] - u[..., 0])
+    flips = straddle & ((lhs < rhs) == (v[..., 1] > u[..., 1]))
+    return on | (flips.sum(axis=1) % 2 == 1)
+
+
+def edges_in_hole(hole: List[Point], a: np.ndarray, b: np.ndarray,
+                  check_endpoints: bool = True, chunk: int = 1 << 20) -> np.ndarray:
+    ''' Vectorized edge_in_hole over (M, 2) arrays of segment endpoints
+
+    Pass check_endpoints=False if the endpoints are already known to be in the hole.
+
+    Without a proper crossing or a hole vertex inside the segment, the open
+    segment is wholly inside or outside, so its midpoint decides; segments
+    touching a hole vertex fall back to the exact scalar check.
+    '''
+    a = np.asarray(a, dtype=np.int64).reshape(-1, 2)
+    b = np.asarray(b, dtype=np.int64).reshape(-1, 2)
+    rows = max(1, chunk // len(hole))
+    if len(a) > rows:
+        return np.concatenate([edges_in_hole(hole, a[i:i + rows], b[i:i + rows], check_endpoints, chunk)
+                               for i in range(0, len(a), rows)])
+    doubled = [Point(2 * h.x, 2 * h.y) for h in hole]
+    ok = points_in_hole(doubled, a + b)
+    if check_endpoints:
+        ok &= points_in_hole(hole, a) & points_in_hole(hole, b)
+    u = np.array(hole, dtype=np.int64)[None, :, :]
+    v = np.roll(u, -1, axis=1)
+    a3, b3 = a[:, None, :], b[:, None, :]
+    o1, o2 = _orient(a3, b3, u), _orient(a3, b3, v)
+    o3, o4 = _orient(u, v, a3), _orient(u, v, b3)
+    ok &= ~((o1 * o2 < 0) & (o3 * o4 < 0)).any(axis=1)
+    endpoint = (u == a3).all(axis=2) | (u == b3).all(axis=2)
+    touching = ((o1 == 0) & _between(u, a3, b3) & ~endpoint).any(axis=1)
+    for i in np.flatnonzero(ok & touching):
+        ok[i] = edge_in_hole(hole, Point(*a[i].tolist()), Point(*b[i].tolist()))
+    return ok
+
+
+def pocket_edges(hole: List[Point]) -> List[int]:
+    ''' Get the indexes i of hole edges hole[i]-hole[i+1] that are off the convex hull
+
+    A segment between two points of the hole stays inside the convex hull,
+    so only these edges, the ones bounding the pockets around reflex
+    vertices, can be crossed or touched on its way out of the hole.
+    '''
+    u = np.array(hole, dtype=np.int64)
+    v = np.roll(u, -1, axis=0)
+    # signs of every hole vertex against every hole edge line, (edges, vertices)
+    signs = _orient(u[:, None, :], v[:, None, :], u[None, :, :])
+    on_hull = (signs >= 0).all(axis=1) | (signs <= 0).all(axis=1)
+    return np.flatnonzero(~on_hull).tolist()
+
+
+def stretch_ok(d_old: int, d_new: int, epsilon: int) -> bool:
+    ''' Return True if |d_new / d_old - 1| <= epsilon / 1e6, exactly in integers '''
+    return 1_000_000 * abs(d_new - d_old) <= epsilon * d_old
+
+
+def global_stretch(d_olds: List[int], d_news: List[int]) -> Fraction:
+    ''' Get the sum over edges of |d_new / d_old - 1|, exactly '''
+    return sum((Fraction(abs(d_new - d_old), d_old) for d_old, d_new in zip(d_olds, d_news)),
+               Fraction(0))
+
+
+def globalist_ok(d_olds: List[int], d_news: List[int], epsilon: int, num_edges: int) -> bool:
+    ''' Return True if the total stretch is within the GLOBALIST budget of num_edges * epsilon / 1e6 '''
+    return global_stretch(d_olds, d_news) * 1_000_000 <= num_edges * epsilon
+
+
+def pose_edges(problem: Problem, bonus: Optional[UsedBonus] = None) -> Optional[List[Tuple[int, int, int, int]]]:
+    ''' Get the (a, b, d_old, scale) edges of a pose, where stretch applies to scale * d_new
+
+    BREAK_A_LEG replaces its edge (i, j) by (i, k) and (j, k) for a new vertex
+    k, each a quarter of the length; None if the broken edge doesn't exist.
+    '''
+    edges = [(a, b, d, 1) for (a, b), d in zip(problem.edges, problem.dists)]
+    if bonus is None or bonus.bonus != BREAK_A_LEG:
+        return edges
+    k = len(problem.vertices)
+    for index, (a, b, d, _) in enumerate(edges):
+        if {a, b} == set(bonus.edge):
+            return edges[:index] + [(a, k, d, 4), (b, k, d, 4)] + edges[index + 1:]
+    return None
+
+
+def edges_ok(problem: Problem, vertices: List[Point], bonus: Optional[UsedBonus] = None) -> Optional[List[bool]]:
+    ''' Get whether each pose edge keeps to the rules valid_pose applies, None if the bonus doesn't fit
+
+    Under GLOBALIST the stretched edges are all bad if the shared budget is
+    overspent, under SUPERFLEX a lone stretched edge is fine, and under
+    WALLHACK the edges of a single vertex outside the hole may leave it.
+    '''
+    kind = bonus.bonus if bonus is not None else None
+    edges = pose_edges(problem, bonus)
+    if edges is None or len(vertices) != len(problem.vertices) + (kind == BREAK_A_LEG):
+        return None
+    vertices = [Point(*v) for v in vertices]
+    outside = [i for i, v in enumerate(vertices) if not point_in_hole(problem.hole, v)]
+    excused = set(outside) if kind == WALLHACK and len(outside) == 1 else set()
+    d_news = [scale * dist(vertices[a], vertices[b]) for a, b, _, scale in edges]
+    d_olds = [d_old for _, _, d_old, _ in edges]
+    if kind == GLOBALIST:
+        fits = globalist_ok(d_olds, d_news, problem.epsilon, len(problem.edges))
+        stretch = [fits or d_new == d_old for d_old, d_new in zip(d_olds, d_news)]
+    else:
+        stretch = [stretch_ok(d_old, d_new, problem.epsilon) for d_old, d_new in zip(d_olds, d_news)]
+        if kind == SUPERFLEX and stretch.count(False) == 1:
+            stretch = [True] * len(stretch)
+    return [ok and (a in excused or b in excused or edge_in_hole(problem.hole, vertices[a], vertices[b]))
+            for (a, b, _, _), ok in zip(edges, stretch)]
+
+
+@timed('validate')
+def valid_pose(problem: Problem, vertices: List[Point], bonus: Optional[UsedBonus] = None) -> bool:
+    ''' Return True if the pose is a valid placement of the problem figure, using bonus if given '''
+    kind = bonus.bonus if bonus is not None else None
+    outside = sum(not point_in_hole(problem.hole, Point(*v)) for v in vertices)
+    if outside > (1 if kind == WALLHACK else 0):
+        return False
+    ok = edges_ok(problem, vertices, bonus)
+    return ok is not None and all(ok)
@@ -1,28 +1,13 @@
 #!/usr/bin/env python3
 
 # %%
-import requests
 import json
 
-
-API_KEY = "b5d3e724-0d12-4926-b223-e9cd180c3003"
-def submit_url(problem_id):
-    return f'https://poses.live/api/problems/{problem_id}/solutions'
-def submit_solution(problem_id, pose):
-    headers = {'Authorization': f'Bearer {API_KEY}'}
-    r = requests.post(submit_url(problem_id), headers=headers, json=pose)
-    return r
-def status_url(problem_id, pose_id):
-    return f"https://poses.live/api/problems/{problem_id}/solutions/{pose_id}"
-def get_status(problem_id, pose_id):
-    headers = {'Authorization': f'Bearer {API_KEY}'}
-    r = requests.get(status_url(problem_id, pose_id), headers=headers)
-    return r
+from aray.submit import submit_poses, VALID
 
 
 # %%
-from glob import glob
-import re
+from aray.store import ResultStore
 
 problems_to_ignore = [104, 45]
 tablefile = '/tmp/scores.json'
@@ -30,34 +15,31 @@ with open(tablefile, 'r') as f:
     table = json.load(f)
 table = {int(k): v for k, v in table.items()}
 
-# regex to match the pattern {problem_number}-{score}-cpsolver3.json
-# we'll use the problem_number and score so they need to be grouped
-regex = re.compile(r'(\d+)-(\d+)-cpsolver3.json')
-
-# search for files that match the pattern in /tmp
-for filename in sorted(glob('/tmp/*-cpsolver3.json')):
-    match = regex.search(filename)
-    if match:
-        problem_number = int(match.group(1))
-        if problem_number in problems_to_ignore:
-            continue
-        score = int(match.group(2))
-        our_score = table[problem_number]['our_score']
-        # print('comparing our score', our_score, 'to', score)
-        if our_score is None or our_score > score:
-            print('Got a better score, submitting')
-            print('Problem', problem_number, 'our score', our_score, 'new score', score)
-
-            # read the file json
-            with open(filename, 'r') as f:
-                pose = json.load(f)
-            # submit the solution
-            r = submit_solution(problem_number, pose)
-            r.raise_for_status()
+# the store only keeps poses that check out as valid in its best table
+with ResultStore() as store:
+    best = store.best_all()
+poses = []
+for problem_number, result in best.items():
+    if problem_number in problems_to_ignore:
+        continue
+    score = result.dislikes
+    our_score = table[problem_number]['our_score']
+    # print('comparing our score', our_score, 'to', score)
+    if our_score is None or our_score > score:
+        print('Problem', problem_number, 'our score', our_score, 'new score', score, 'from', result.solver)
+        poses.append((problem_number, json.loads(result.pose.json())))
+
+# submit them all at once, paced under the server's rate limit, and poll for the scores
+print('Got', len(poses), 'better scores, submitting')
+for submission in submit_poses(poses):
+    expected = best[submission.problem].dislikes
+    if submission.state != VALID or submission.dislikes != expected:
+        print('Problem', submission.problem, submission.state, submission.dislikes,
+              'expected', expected, submission.error or '')
 
 # # %%
 # # get the problems page
-# headers = {'Authorization': f'Bearer {API_KEY}'}
+# headers = {'Authorization': 'Bearer ' + os.environ['ICFP2021_API_KEY']}
 # r = requests.get('https://poses.live/problems', headers=headers)
 # r.raise_for_status()
 # r.text
\ No newline at end of file
@@ -1,6 +1,6 @@
 #!/bin/bash
 
+# download every problem into the shared cache (problems/, or $ICFP2021_PROBLEMS) in one parallel burst
+cd "$(dirname "$0")/.." && python -m aray.fetch "$@"
 
-for i in $(seq 1 132); do curl -H "Authorization: Bearer $ICFP2021_API_KEY" https://poses.live/api/problems/$i > /tmp/$i.problem & done
-
-# for i in $(seq 1 132); do ./forbidden $i /tmp/$i.problem & done
\ No newline at end of file
+# for i in $(seq 1 132); do ./forbidden $i ../problems/$i.json & done
@@ -11,6 +11,7 @@ from aray.problem import Problem, Pose, BASE_PATH
 from aray.boxlet import polygon_points
 from aray.stretch import stretch, slow_stretch
 from aray.util import dist
+from aray.render import draw_hole, draw_lattice, draw_pose
 
 problem = Problem.get(38)
 # fname = os.path.join(BASE_PATH, 'candidates', '4-9172-cpsolver.json')
@@ -24,22 +25,14 @@ assert len(problem.vertices) == len(pose.vertices), f'{len(problem.vertices)} {l
 
 # %%
 fig, ax = plt.subplots()
-
+draw_lattice(ax, problem.hole)
+draw_hole(ax, problem.hole)
+draw_pose(ax, problem, pose)
+ax.autoscale_view()
 # flip y axis
 ax.invert_yaxis()
 
-points = sorted(polygon_points(problem.hole))
-ax.scatter([p.x for p in points], [p.y for p in points], c='k', s=1, alpha=0.5)
-
-
-cycle = problem.hole + [problem.hole[0]]
-for i in range(len(cycle) - 1):
-    u, v = cycle[i], cycle[i + 1]
-    ax.plot([u.x, v.x], [u.y, v.y], 'r-', linewidth=1)
-
-for a, b in problem.edges:
-    u, v = pose.vertices[a], pose.vertices[b]
-    ax.plot([u.x, v.x], [u.y, v.y], 'b-', linewidth=1)
+points = polygon_points(problem.hole)
 
 edge = problem.edges[1]
 u, v = pose.vertices[edge[0]], pose.vertices[edge[1]]
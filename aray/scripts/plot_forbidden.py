@@ -4,6 +4,7 @@
 import os
 import json
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 from aray.types import Pair, Point
 from aray.forbidden import get_forbidden
 from aray.problem import Problem
@@ -20,9 +21,9 @@ forbidden_edges = get_forbidden(problem_number)
 points = list(polygon_points(problem.hole))
 plt.scatter([p.x for p in points], [p.y for p in points], s=1)
 
-for pairs, _ in zip(forbidden_edges, range(1000)):
-    for (a, b), _ in zip(pairs, range(1000)):
-        plt.plot([a.x, b.x], [a.y, b.y], 'b-', linewidth=0.5)
+segments = [[(a.x, a.y), (b.x, b.y)] for pairs, _ in zip(forbidden_edges, range(1000))
+            for (a, b), _ in zip(pairs, range(1000))]
+plt.gca().add_collection(LineCollection(segments, colors='b', linewidths=0.5))
 
 cycle = problem.hole + [problem.hole[0]]
 plt.plot([c.x for c in cycle], [c.y for c in cycle], 'r-', linewidth=0.5)
@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 
 from aray.types import Point
 from aray.problem import Problem, Pose
+from aray.rigid import rigid_placements
 
 number = 126
 problem = Problem.get(number)
@@ -17,16 +18,17 @@ plt.plot([c.x for c in cycle], [c.y for c in cycle])
 #flip y axis
 plt.gca().invert_yaxis()
 
-vertices = problem.vertices
+# best valid rotation/reflection and translation of the original figure
+best = rigid_placements(problem, limit=1)[0]
+print(best.dislikes, best.matrix, best.offset)
+vertices = best.vertices
 
-x = 140
-y = 150
 edges = problem.edges
 for a, b in edges:
     v, u = vertices[a], vertices[b]
-    plt.plot([v.x + x, u.x + x], [v.y + y, u.y + y])
+    plt.plot([v.x, u.x], [v.y, u.y])
 
-pose = Pose(vertices=[Point(v.x + x, v.y + y) for v in vertices])
+pose = Pose(vertices=vertices)
 
 with open(f'/tmp/{number}.solution', 'w') as f:
     json_str = pose.json()
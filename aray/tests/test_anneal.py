@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# test_anneal.py
+
+import unittest
+from aray.problem import Problem
+from aray.anneal import Annealer
+from aray.dislike import dislikes
+from aray.types import Point
+
+
+class TestAnneal(unittest.TestCase):
+    def test_incremental_matches_full(self):
+        annealer = Annealer(Problem.get(1), seed=0)
+        annealer.run(2000)
+        penalty, score = annealer.penalty, annealer.dislikes
+        vertices = [Point(*p) for p in annealer.pose.tolist()]
+        annealer.reset(vertices)  # recomputes every term from scratch
+        self.assertAlmostEqual(penalty, annealer.penalty, places=6)
+        self.assertEqual(score, annealer.dislikes)
+        self.assertEqual(score, dislikes(annealer.problem.hole, vertices))
+
+    def test_stats(self):
+        annealer = Annealer(Problem.get(1), seed=0)
+        annealer.run(500)
+        metrics = annealer.stats.metrics()
+        self.assertEqual(metrics['iterations'], 500)
+        self.assertGreater(metrics['iterations_per_second'], 0)
+        self.assertLessEqual(metrics['acceptance_rate'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
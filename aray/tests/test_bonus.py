@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# test_bonus.py
+
+import json
+import unittest
+from aray.problem import Problem, Pose, Bonus, UsedBonus, GLOBALIST, SUPERFLEX, WALLHACK, BREAK_A_LEG
+from aray.types import Point, Edge
+from aray.valid import valid_pose, global_stretch
+from aray.partial import Partial
+from aray.bonus import unlocked, BonusGraph
+
+HOLE = [Point(0, 0), Point(10, 0), Point(10, 10), Point(0, 10)]
+
+
+def make_problem(vertices, edges, epsilon=0, bonuses=()):
+    vertices = [Point(*v) for v in vertices]
+    edges = [Edge(*e) for e in edges]
+    dists = [(vertices[a].x - vertices[b].x) ** 2 + (vertices[a].y - vertices[b].y) ** 2
+             for a, b in edges]
+    edge_map = {}
+    for i, (a, b) in enumerate(edges):
+        edge_map.setdefault(a, []).append(i)
+        edge_map.setdefault(b, []).append(i)
+    return Problem(HOLE, vertices, edges, dists, edge_map, epsilon, list(bonuses))
+
+
+class TestBonus(unittest.TestCase):
+    def test_pose_json_round_trip(self):
+        pose = Pose([Point(1, 2), Point(3, 4)], [UsedBonus(BREAK_A_LEG, 5, Edge(0, 1))])
+        data = json.loads(pose.json())
+        self.assertEqual(data, {'vertices': [[1, 2], [3, 4]],
+                                'bonuses': [{'bonus': BREAK_A_LEG, 'problem': 5, 'edge': [0, 1]}]})
+        self.assertEqual(Pose.from_json(data), pose)
+        self.assertEqual(json.loads(Pose([Point(1, 2)]).json()), {'vertices': [[1, 2]]})
+
+    def test_superflex(self):
+        problem = make_problem([(1, 1), (4, 1), (4, 5)], [(0, 1), (1, 2)])
+        one = [(1, 1), (8, 1), (8, 5)]
+        two = [(1, 1), (8, 1), (8, 8)]
+        self.assertFalse(valid_pose(problem, one))
+        self.assertTrue(valid_pose(problem, one, UsedBonus(SUPERFLEX, 1)))
+        self.assertFalse(valid_pose(problem, two, UsedBonus(SUPERFLEX, 1)))
+
+    def test_wallhack(self):
+        problem = make_problem([(1, 1), (4, 1), (4, 5)], [(0, 1), (1, 2)])
+        one = [(1, 1), (4, 1), (4, -3)]
+        two = [(1, -1), (4, -1), (4, 3)]
+        self.assertFalse(valid_pose(problem, one))
+        self.assertTrue(valid_pose(problem, one, UsedBonus(WALLHACK, 1)))
+        self.assertFalse(valid_pose(problem, two, UsedBonus(WALLHACK, 1)))
+
+    def test_globalist(self):
+        # epsilon 150000 per edge allows 300000 in total over two edges
+        problem = make_problem([(0, 0), (0, 4), (4, 4)], [(0, 1), (1, 2)], epsilon=150000)
+        lopsided = [(1, 1), (1, 6), (5, 6)]  # stretches 25/16 - 1 = 0.5625 on one edge
+        spread = [(1, 1), (1, 5), (5, 5)]
+        self.assertFalse(valid_pose(problem, lopsided, UsedBonus(GLOBALIST, 1)))
+        self.assertTrue(valid_pose(problem, spread, UsedBonus(GLOBALIST, 1)))
+        # 1/16 on one edge is over epsilon 40000 per edge, but within the 80000 total
+        problem = make_problem([(0, 0), (0, 4), (4, 4)], [(0, 1), (1, 2)], epsilon=40000)
+        nearly = [(1, 1), (1, 5), (5, 6)]
+        self.assertFalse(valid_pose(problem, nearly))
+        self.assertTrue(valid_pose(problem, nearly, UsedBonus(GLOBALIST, 1)))
+
+    def test_break_a_leg(self):
+        problem = make_problem([(1, 1), (9, 1)], [(0, 1)])
+        bonus = UsedBonus(BREAK_A_LEG, 1, Edge(0, 1))
+        self.assertTrue(valid_pose(problem, [(1, 1), (9, 1), (5, 1)], bonus))
+        self.assertTrue(valid_pose(problem, [(1, 1), (5, 5), (5, 1)], bonus))
+        self.assertFalse(valid_pose(problem, [(1, 1), (9, 1), (5, 2)], bonus))
+        self.assertFalse(valid_pose(problem, [(1, 1), (9, 1)], bonus))
+        self.assertFalse(valid_pose(problem, [(1, 1), (9, 1), (5, 1)], UsedBonus(BREAK_A_LEG, 1, Edge(0, 2))))
+
+    def test_partial_globalist(self):
+        # two edges of squared length 16, with a total budget of 0.08
+        problem = make_problem([(0, 0), (0, 4), (4, 4)], [(0, 1), (1, 2)], epsilon=40000)
+        partial = Partial.from_problem(problem, globalist=True)
+        partial.place_point(0, Point(2, 2))
+        partial.place_point(2, Point(7, 6))
+        self.assertEqual(partial.spent, 0)
+        expected = {p for p in partial.placement
+                    if global_stretch([16, 16], [(p.x - 2) ** 2 + (p.y - 2) ** 2,
+                                                 (p.x - 7) ** 2 + (p.y - 6) ** 2]) <= partial.budget}
+        got = partial.get_placement_for_point(1)
+        self.assertEqual(got, expected)
+        # 17 is over epsilon for one edge, but within the total
+        self.assertIn(Point(3, 6), got)
+        partial.place_point(1, Point(3, 6))
+        self.assertEqual(partial.spent, global_stretch([16, 16], [17, 16]))
+        self.assertTrue(valid_pose(problem, partial.vertices, UsedBonus(GLOBALIST, 1)))
+        self.assertFalse(valid_pose(problem, partial.vertices))
+
+    def test_unlocked(self):
+        bonus = Bonus(WALLHACK, 7, Point(2, 2))
+        problem = make_problem([(1, 1), (4, 1)], [(0, 1)], bonuses=[bonus])
+        self.assertEqual(unlocked(problem, [(2, 2), (5, 2)]), [bonus])
+        self.assertEqual(unlocked(problem, [(1, 1), (4, 1)]), [])
+
+    def test_plan(self):
+        near = Bonus(WALLHACK, 3, Point(2, 2))
+        far = Bonus(SUPERFLEX, 3, Point(8, 8))
+        graph = BonusGraph({1: make_problem([(1, 1), (4, 1)], [(0, 1)], bonuses=[near]),
+                            2: make_problem([(1, 1), (4, 1)], [(0, 1)], bonuses=[far]),
+                            3: make_problem([(1, 1), (4, 1)], [(0, 1)])})
+        self.assertEqual(len(graph.available(3)), 2)
+        plan = graph.plan({1: [Point(1, 1), Point(4, 1)], 2: [Point(8, 8), Point(5, 8)]})
+        self.assertEqual(list(plan), [3])
+        self.assertEqual(plan[3].source, 2)
+        self.assertTrue(plan[3].unlocked)
+        plan = graph.plan({1: [Point(1, 1), Point(4, 1)]})
+        self.assertEqual((plan[3].source, plan[3].cost), (1, 2))
+        plan = graph.plan({}, kinds=[SUPERFLEX])
+        self.assertEqual(plan[3].bonus, far)
+        self.assertIsNone(plan[3].cost)
+
+    def test_problem_bonuses(self):
+        problem = Problem.get(1)
+        self.assertTrue(problem.bonuses)
+        for bonus in problem.bonuses:
+            self.assertIn(bonus.bonus, (GLOBALIST, SUPERFLEX, WALLHACK, BREAK_A_LEG))
+
+
+if __name__ == '__main__':
+    unittest.main()
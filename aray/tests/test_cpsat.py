@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# test_cpsat.py
+
+import unittest
+from ortools.sat.python.cp_model import CpModel, CpSolver, FEASIBLE, OPTIMAL, INFEASIBLE
+from aray.types import Point
+from aray.problem import Problem
+from aray.valid import valid_pose
+from aray.cpsat import Crossings, PoseModel, IndexModel, pocket_edges
+
+# a U, the notch between x = 4 and 6 comes down from the top to y = 4
+U = [Point(0, 0), Point(10, 0), Point(10, 10), Point(6, 10), Point(6, 4), Point(4, 4), Point(4, 10), Point(0, 10)]
+
+
+def solve_segment(a: Point, b: Point) -> int:
+    model = CpModel()
+    pose_vars = [(model.NewIntVar(0, 10, f'P{i}x'), model.NewIntVar(0, 10, f'P{i}y')) for i in range(2)]
+    for (x, y), p in zip(pose_vars, (a, b)):
+        model.Add(x == p.x)
+        model.Add(y == p.y)
+    Crossings(model, U, pose_vars).add(0, 1)
+    return CpSolver().Solve(model)
+
+
+class TestCpsat(unittest.TestCase):
+    def test_pocket_edges(self):
+        self.assertEqual(pocket_edges(U), [3, 4, 5])
+        self.assertEqual(pocket_edges(Problem.get(11).hole), [])
+
+    def test_crossings(self):
+        self.assertEqual(solve_segment(Point(2, 8), Point(8, 8)), INFEASIBLE)  # across the notch
+        self.assertEqual(solve_segment(Point(8, 8), Point(3, 2)), INFEASIBLE)  # through its bottom
+        # only proper crossings, through a corner is for the lazy cuts
+        self.assertIn(solve_segment(Point(8, 8), Point(5, 2)), (OPTIMAL, FEASIBLE))
+        self.assertIn(solve_segment(Point(2, 2), Point(8, 2)), (OPTIMAL, FEASIBLE))  # under it
+        self.assertIn(solve_segment(Point(2, 8), Point(4, 4)), (OPTIMAL, FEASIBLE))  # to its corner
+
+    def test_pose_model(self):
+        problem = Problem.get(28)
+        model = PoseModel(problem)
+        model.add_crossings()
+        self.assertEqual(model.size()['products'], 2 * len(problem.edges))
+        pose = model.solve(timeout=30)
+        self.assertIsNotNone(pose)
+        self.assertTrue(valid_pose(problem, pose))
+
+    def test_index_model(self):
+        problem = Problem.get(28)
+        model = IndexModel(problem)
+        pose = model.solve(timeout=30)
+        self.assertIsNotNone(pose)
+        self.assertTrue(valid_pose(problem, pose))
+        self.assertEqual(model.rounds, 1)  # exact tables, nothing to cut
+        # the vertex domains are cut down to where their edges can go, as [lo, hi] intervals
+        proto = model.model.Proto()
+        domain = list(proto.variables[model.index_vars[0].Index()].domain)
+        size = sum(hi - lo + 1 for lo, hi in zip(domain[::2], domain[1::2]))
+        self.assertLess(size, len(model.lattice.points))
+
+
+if __name__ == '__main__':
+    unittest.main()
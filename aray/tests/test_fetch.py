@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# test_fetch.py
+
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+import requests
+from aray import fetch
+from aray.fetch import Fetcher, fetch_problem, load_problem, problem_path, NUM_PROBLEMS, CACHED, FETCHED, UNCHANGED
+from aray.mockserver import MockServer
+
+
+class TestFetch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fetcher(self, server, **kwargs):
+        return Fetcher(api_key='test', base_url=server.url, cache=self.cache, **kwargs)
+
+    def test_cold_start(self):
+        numbers = range(1, NUM_PROBLEMS + 1)
+        with MockServer() as server:
+            with self.fetcher(server, concurrency=8) as fetcher:
+                fetches = fetcher.prefetch(numbers)
+            stats = dict(server.stats)
+            self.assertTrue(all(f.state == FETCHED for f in fetches.values()))
+            self.assertEqual(stats['requests'], NUM_PROBLEMS)
+            self.assertLessEqual(stats['connections'], 8)
+            with open(os.path.join(server.problems_path, '42.json')) as f:
+                self.assertEqual(load_problem(42, self.cache), json.load(f))
+            # warm, nothing asked of the server
+            with self.fetcher(server) as fetcher:
+                fetches = fetcher.prefetch(numbers)
+            self.assertTrue(all(f.state == CACHED for f in fetches.values()))
+            self.assertEqual(server.stats['requests'], NUM_PROBLEMS)
+
+    def test_revalidate(self):
+        with MockServer() as server:
+            with self.fetcher(server) as fetcher:
+                fetcher.prefetch([1, 2])
+                fetches = fetcher.prefetch([1, 2], revalidate=True)
+            self.assertEqual({f.state for f in fetches.values()}, {UNCHANGED})
+            self.assertEqual(server.stats['not_modified'], 2)
+
+    def test_corrupt_cache_refetched(self):
+        with MockServer() as server:
+            with self.fetcher(server) as fetcher:
+                fetcher.fetch(3)
+                with open(problem_path(3, self.cache), 'a') as f:
+                    f.write(' ')
+                self.assertEqual(fetcher.fetch(3).state, FETCHED)
+                self.assertEqual(fetcher.fetch(3).state, CACHED)
+
+    def test_cache_only_holds_problems(self):
+        with MockServer() as server:
+            with self.fetcher(server) as fetcher:
+                fetcher.prefetch([1, 2, 3])
+        names = os.listdir(self.cache)
+        self.assertEqual(sorted(n for n in names if not n.startswith('.')), ['1.json', '2.json', '3.json'])
+
+    def test_hashed_once_per_process(self):
+        with MockServer() as server:
+            with self.fetcher(server) as fetcher:
+                fetcher.fetch(4)
+        with mock.patch.object(fetch, 'content_hash', wraps=fetch.content_hash) as hashed:
+            for _ in range(5):
+                self.assertIsNotNone(fetch.intact(4, self.cache))
+        self.assertEqual(hashed.call_count, 1)
+
+    def test_missing_problem(self):
+        with MockServer() as server:
+            with self.fetcher(server, retries=0) as fetcher:
+                with self.assertRaises(requests.HTTPError):
+                    fetcher.fetch(100000)
+        self.assertFalse(os.path.exists(problem_path(100000, self.cache)))
+
+    def test_repo_problems_need_no_server(self):
+        # the problems that come with the repo are a warm cache
+        self.assertTrue(os.path.exists(fetch_problem(11)))
+
+
+if __name__ == '__main__':
+    unittest.main()
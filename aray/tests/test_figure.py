@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# test_figure.py
+
+import math
+import unittest
+from aray.problem import Problem
+from aray.partial import Partial
+from aray.types import Point
+from aray.figure import path_bounds, get_bounds, get_reach, within_reach
+
+
+class TestFigure(unittest.TestCase):
+    def test_path_bounds(self):
+        problem = Problem.get(11)
+        bounds = path_bounds(problem)
+        scale = 1 + problem.epsilon / 1e6
+        for (a, b), d in zip(problem.edges, problem.dists):
+            self.assertLessEqual(bounds[a, b] ** 2, d * scale + 1e-9)
+        self.assertTrue((bounds == bounds.T).all())
+        self.assertTrue((bounds.diagonal() == 0).all())
+        # triangle inequality holds everywhere after Floyd-Warshall
+        n = len(problem.vertices)
+        for i in range(n):
+            for j in range(n):
+                for k in range(n):
+                    self.assertLessEqual(bounds[i, j], bounds[i, k] + bounds[k, j] + 1e-9)
+
+    def test_path_bounds_chain(self):
+        problem = Problem.get(1)
+        bounds = path_bounds(problem)
+        a, b = problem.edges[0]
+        scale = math.sqrt(1 + problem.epsilon / 1e6)
+        self.assertLessEqual(bounds[a, b], math.sqrt(problem.dists[0]) * scale + 1e-9)
+        self.assertTrue(math.isfinite(bounds.max()))  # connected figure
+
+    def test_cached(self):
+        problem = Problem.get(11)
+        self.assertIs(get_bounds(problem), get_bounds(Problem.get(11)))
+        self.assertIs(get_reach(problem), get_reach(Problem.get(11)))
+        reach = get_reach(problem)
+        (a, b), d = problem.edges[0], problem.dists[0]
+        self.assertTrue(within_reach(reach, a, Point(0, 0), b, Point(0, 0)))
+        far = int(math.ceil(math.sqrt(reach[a, b]))) + 1
+        self.assertFalse(within_reach(reach, a, Point(0, 0), b, Point(far, 0)))
+
+    def test_partial_placements_in_reach(self):
+        problem = Problem.get(11)
+        partial = Partial.from_problem(problem)
+        reach = get_reach(problem)
+        first = sorted(partial.placement)[0]
+        partial.place_point(0, first)
+        for i in range(1, len(problem.vertices)):
+            for p in partial.get_placement_for_point(i):
+                self.assertTrue(within_reach(reach, 0, first, i, p))
+
+    def test_partial_reach_computed_once(self):
+        problem = Problem.get(11)
+        partial = Partial.from_problem(problem)
+        self.assertIs(partial.reach, get_reach(problem))
+        self.assertIs(partial.copy().reach, partial.reach)
+        # any single GLOBALIST edge may take the whole budget
+        globalist = Partial.from_problem(problem, globalist=True)
+        wide = Partial.reach_problem(problem, True)
+        self.assertEqual(wide.epsilon, len(problem.edges) * problem.epsilon)
+        self.assertIs(globalist.reach, get_reach(wide))
+
+
+if __name__ == '__main__':
+    unittest.main()
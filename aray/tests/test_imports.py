@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# test_imports.py
+
+import os
+import sys
+import unittest
+import subprocess
+
+# what a pool worker doing geometry and scoring imports
+CORE = ['aray.problem', 'aray.valid', 'aray.dislike', 'aray.boxlet', 'aray.partial',
+        'aray.stretch', 'aray.store', 'aray.timing', 'aray.anneal', 'aray.rigid']
+# only the plotting and networking modules may pull these in
+HEAVY = ['matplotlib', 'requests', 'scipy']
+# and only the networking ones these, which a cache hit in Problem.get must not need
+NETWORK = ['requests', 'urllib3', 'asyncio', 'aray.fetch', 'aray.submit']
+
+
+def import_times(modules, then='pass', watch=HEAVY):
+    ''' Import modules in a fresh interpreter and run then, return the watched modules it loaded and the seconds per top-level import '''
+    code = (f'import sys; import {", ".join(modules)}; {then}; '
+            f'print(",".join(m for m in {watch!r} if m in sys.modules))')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=root,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        # 'import time: self [us] | cumulative | name', nested imports are indented
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if not name.startswith('  ') and cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1e6
+    loaded = [m for m in result.stdout.strip().split(',') if m]
+    return loaded, times
+
+
+class TestImports(unittest.TestCase):
+    def test_core_is_headless(self):
+        # the time it takes is checked in benchmarks/test_budgets.py
+        loaded, _ = import_times(CORE)
+        self.assertEqual(loaded, [])
+
+    def test_cached_problem_loads_offline(self):
+        # the first thing a solver does, and problem 1 comes with the repo
+        loaded, _ = import_times(['aray.problem'], then='aray.problem.Problem.get(1)', watch=NETWORK)
+        self.assertEqual(loaded, [])
+
+    def test_plotting_and_networking_still_import(self):
+        loaded, _ = import_times(['aray.render', 'aray.fetch', 'aray.submit'])
+        self.assertEqual(sorted(loaded), ['matplotlib', 'requests'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# test_match.py
+
+import itertools
+import unittest
+from aray.problem import Problem
+from aray.util import dist
+from aray.valid import stretch_ok
+from aray.figure import path_bounds
+from aray.match import HoleMatcher
+
+
+def consistent(problem, pins):
+    ''' Brute force check that pinned vertices' pairwise distances are possible '''
+    bounds = path_bounds(problem)
+    edges = {frozenset(e): d for e, d in zip(problem.edges, problem.dists)}
+    for (i, p), (j, q) in itertools.combinations(pins.items(), 2):
+        d = dist(p, q)
+        if frozenset((i, j)) in edges:
+            if not stretch_ok(edges[frozenset((i, j))], d, problem.epsilon):
+                return False
+        elif d > bounds[i, j] ** 2 * (1 + 1e-9):
+            return False
+    return True
+
+
+class TestMatch(unittest.TestCase):
+    def test_matches_brute_force(self):
+        problem = Problem.get(15)
+        n, m = len(problem.vertices), len(problem.hole)
+        expected = set()
+        for perm in itertools.permutations(range(n), m):
+            pins = {i: problem.hole[h] for h, i in enumerate(perm)}
+            if consistent(problem, pins):
+                expected.add(tuple(sorted(pins.items())))
+        matcher = HoleMatcher(problem)
+        got = [tuple(sorted(pins.items())) for pins in matcher.matches()]
+        self.assertEqual(len(got), len(set(got)))
+        self.assertEqual(set(got), expected)
+        self.assertGreater(len(got), 0)
+
+    def test_partial_depth(self):
+        problem = Problem.get(42)
+        matcher = HoleMatcher(problem)
+        pins = list(itertools.islice(matcher.matches(depth=2), 50))
+        self.assertGreater(len(pins), 0)
+        for p in pins:
+            self.assertEqual(len(p), 2)
+            self.assertTrue(consistent(problem, p))
+        self.assertEqual(matcher.stats.matches, len(pins))
+
+
+if __name__ == '__main__':
+    unittest.main()
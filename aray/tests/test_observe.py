@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# test_observe.py
+
+import os
+import time
+import tempfile
+import unittest
+from aray.problem import Problem
+from aray.anneal import Annealer
+from aray.observe import Observer, LiveView
+
+
+class Counter(Observer):
+    def __init__(self):
+        self.frames = []
+
+    def observe(self, iteration, pose, score):
+        self.frames.append((iteration, score))
+
+
+class TestObserve(unittest.TestCase):
+    def test_annealer_reports_every_iteration(self):
+        observer = Counter()
+        annealer = Annealer(Problem.get(11), seed=0)
+        annealer.run(100, observer=observer)
+        self.assertEqual([i for i, _ in observer.frames], list(range(1, 101)))
+
+    def test_live_view_decimates(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'live.png')
+            annealer = Annealer(Problem.get(11), seed=0)
+            view = LiveView(11, fps=20, path=path)
+            start = time.monotonic()
+            annealer.run(20_000, observer=view)
+            view.flush(annealer.stats.iterations, annealer.pose, annealer.dislikes)
+            elapsed = time.monotonic() - start
+            view.close()
+            self.assertTrue(os.path.exists(path))
+        self.assertEqual(view.calls, 20_000 + 1)
+        self.assertLessEqual(view.sent, elapsed * 20 + 2)
+        self.assertGreater(view.skipped, 10 * view.sent)
+        self.assertFalse(view.process.is_alive())
+
+    def test_between_frames_path(self):
+        # what this path costs against an iteration is checked in benchmarks/test_budgets.py
+        annealer = Annealer(Problem.get(11), seed=0)
+        with tempfile.TemporaryDirectory() as tmp, LiveView(11, path=os.path.join(tmp, 'live.png')) as view:
+            view.next_frame = float('inf')
+            for i in range(1000):
+                view.observe(i, annealer.pose, 0)
+        self.assertEqual(view.skipped, 1000)
+        self.assertEqual(view.sent, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# test_plan.py
+
+import unittest
+from aray.problem import Problem
+from aray.stretch import center_stretch
+from aray.tables import Lattice, pair_tables
+from aray.valid import valid_pose
+from aray.cpsat import PoseModel
+from aray.plan import plan, estimate, choose, EdgeClass, FREE, LAZY, ALLOWED, CROSSING
+
+
+class TestPlan(unittest.TestCase):
+    def test_convex_hole_is_free(self):
+        with self.assertLogs('aray.plan', 'INFO') as logs:
+            chosen = plan(Problem.get(11))
+        self.assertEqual(set(chosen.encodings.values()), {FREE})
+        self.assertEqual(chosen.rounds, 1.0)
+        self.assertIn('-> free', logs.output[0])
+
+    def test_free_needs_no_start_near_a_pocket(self):
+        # nothing sampled leaves the hole, but some start is near a pocket
+        self.assertEqual(choose(EdgeClass(4, [0], 4, pairs=100.0, forbidden=0.0, near=3)), LAZY)
+        self.assertEqual(choose(EdgeClass(4, [0], 4, pairs=100.0, forbidden=0.0, near=0)), FREE)
+        problem = Problem.get(19)
+        lattice = Lattice(problem.hole)
+        ring = center_stretch(3805, problem.epsilon)
+        near = lattice.ring_danger(ring)
+        for delta in ring[::7]:
+            self.assertFalse((lattice.danger(delta) & ~near).any())
+        c = estimate(lattice, 3805, [0], problem.epsilon)
+        self.assertGreater(c.near, 0)
+        self.assertNotEqual(choose(c), FREE)
+
+    def test_estimate_is_close(self):
+        problem = Problem.get(28)
+        lattice = Lattice(problem.hole)
+        d = problem.dists[0]
+        c = estimate(lattice, d, [0], problem.epsilon)
+        allowed, forbidden = pair_tables(lattice, center_stretch(d, problem.epsilon))
+        self.assertAlmostEqual(c.pairs / (len(allowed) + len(forbidden)), 1, delta=0.2)
+        self.assertAlmostEqual(c.forbidden / len(forbidden), 1, delta=0.2)
+
+    def test_budgets(self):
+        problem = Problem.get(28)  # most placements of its edges leave the hole
+        self.assertEqual(set(plan(problem).encodings.values()), {ALLOWED})
+        self.assertEqual(set(plan(problem, max_rows=100).encodings.values()), {CROSSING})
+
+    def test_planned_model_solves(self):
+        problem = Problem.get(28)
+        lattice = Lattice(problem.hole)
+        model = PoseModel(problem)
+        model.add_plan(plan(problem, lattice), lattice)
+        pose = model.solve(timeout=30)
+        self.assertIsNotNone(pose)
+        self.assertTrue(valid_pose(problem, pose))
+
+
+if __name__ == '__main__':
+    unittest.main()
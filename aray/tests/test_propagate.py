@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# test_propagate.py
+
+import unittest
+from aray.problem import Problem
+from aray.propagate import Propagator, Lattice
+from aray.partial import Partial, depth_first
+from aray.valid import stretch_ok
+from aray.util import dist
+from aray.boxlet import polygon_points
+from aray.stretch import center_stretch
+from aray.types import Point
+
+
+class TestPropagate(unittest.TestCase):
+    def test_lattice_roundtrip(self):
+        problem = Problem.get(1)
+        points = polygon_points(problem.hole)
+        lattice = Lattice.from_points(points, pad=10)
+        self.assertEqual(lattice.mask.bit_count(), len(points))
+        self.assertEqual(set(lattice.points(lattice.mask)), points)
+        for p in sorted(points)[::97]:
+            self.assertEqual(lattice.point(lattice.index(p)), p)
+
+    def test_support_matches_brute_force(self):
+        problem = Problem.get(1)
+        propagator = Propagator(problem)
+        points = polygon_points(problem.hole)
+        for domain in (sorted(points)[::401], sorted(points)[::3]):
+            propagator.domains[0] = propagator.lattice.bitset(domain)
+            for d in set(problem.dists):
+                ring = center_stretch(d, problem.epsilon)
+                brute = set(Point(a.x + c.x, a.y + c.y)
+                            for a in domain for c in ring) & points
+                support = propagator.support(0, d)
+                self.assertEqual(set(propagator.lattice.points(support)), brute)
+
+    def test_assign_prunes_neighbors(self):
+        problem = Problem.get(1)
+        propagator = Propagator(problem)
+        a, b = problem.edges[0]
+        self.assertTrue(propagator.assign(a, problem.hole[0]))
+        self.assertEqual(propagator.domain(a), [problem.hole[0]])
+        self.assertLess(propagator.domain_size(b), propagator.lattice.mask.bit_count())
+        self.assertGreater(propagator.stats.pruned, 0)
+
+    def test_assign_dead_end(self):
+        problem = Problem.get(1)
+        propagator = Propagator(problem)
+        a, b = problem.edges[0]
+        self.assertTrue(propagator.assign(a, problem.hole[0]))
+        # both ends of an edge on one point can never satisfy the stretch rule
+        self.assertFalse(propagator.assign(b, problem.hole[0]))
+        self.assertGreater(propagator.stats.wipeouts, 0)
+
+    def test_partial_search_fewer_nodes(self):
+        problem = Problem.get(18)
+        plain, plain_nodes = depth_first(Partial.from_problem(problem))
+        found, nodes = depth_first(Partial.from_problem(problem, propagate=True))
+        self.assertIsNotNone(plain)
+        self.assertIsNotNone(found)
+        self.assertLess(nodes, plain_nodes // 10)
+        for (a, b), d in zip(problem.edges, problem.dists):
+            self.assertTrue(stretch_ok(d, dist(found.vertices[a], found.vertices[b]), problem.epsilon))
+
+
+if __name__ == '__main__':
+    unittest.main()
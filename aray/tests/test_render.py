@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# test_render.py
+
+import os
+import tempfile
+import unittest
+from matplotlib.collections import LineCollection, PathCollection
+from aray.problem import Problem, Pose, UsedBonus, GLOBALIST, SUPERFLEX, WALLHACK
+from aray.types import Point, Edge
+from aray.valid import valid_pose
+from aray.render import render, render_cached, cache_path, edge_colors, GOOD_COLOR, BAD_COLOR
+
+POSE_11 = Pose([Point(10, 0), Point(10, 10), Point(0, 10)])
+
+
+class TestRender(unittest.TestCase):
+    def test_one_collection_per_layer(self):
+        problem = Problem.get(114)
+        fig = render(problem, lattice=True)
+        ax, = fig.axes
+        self.assertEqual(len(ax.lines), 0)
+        lines = [c for c in ax.collections if isinstance(c, LineCollection)]
+        self.assertEqual([len(c.get_segments()) for c in lines], [len(problem.hole), len(problem.edges)])
+        self.assertEqual(sum(isinstance(c, PathCollection) for c in ax.collections), 2)
+
+    def test_edge_colors(self):
+        problem = Problem.get(11)
+        self.assertEqual(edge_colors(problem, POSE_11), [GOOD_COLOR] * 3)
+        stretched = Pose([Point(10, 0), Point(10, 10), Point(0, 9)])
+        self.assertEqual(edge_colors(problem, stretched).count(BAD_COLOR), 2)
+
+    def test_edge_colors_follow_bonus_rules(self):
+        hole = [Point(0, 0), Point(10, 0), Point(10, 10), Point(0, 10)]
+        vertices = [Point(0, 0), Point(0, 4), Point(4, 4)]
+        edges = [Edge(0, 1), Edge(1, 2)]
+        def problem(epsilon):
+            return Problem(hole, vertices, edges, [16, 16], {0: [0], 1: [0, 1], 2: [1]}, epsilon, [])
+        cases = [
+            # 1/16 on one edge is over epsilon 40000 per edge, but within the 80000 total
+            (problem(40000), [(1, 1), (1, 5), (5, 6)], GLOBALIST, [GOOD_COLOR, GOOD_COLOR]),
+            (problem(40000), [(1, 1), (1, 6), (5, 6)], GLOBALIST, [BAD_COLOR, GOOD_COLOR]),
+            (problem(0), [(1, 1), (1, 5), (5, 6)], SUPERFLEX, [GOOD_COLOR, GOOD_COLOR]),
+            (problem(0), [(1, 1), (1, 6), (5, 7)], SUPERFLEX, [BAD_COLOR, BAD_COLOR]),
+            # the one vertex outside may take its edges with it
+            (problem(0), [(1, 1), (1, 5), (5, 11)], WALLHACK, [GOOD_COLOR, BAD_COLOR]),
+            (problem(0), [(4, 1), (4, 5), (8, 5)], WALLHACK, [GOOD_COLOR, GOOD_COLOR]),
+            (problem(0), [(7, 8), (7, 12), (11, 12)], WALLHACK, [BAD_COLOR, BAD_COLOR]),
+            (problem(0), [(4, -3), (4, 1), (8, 1)], WALLHACK, [GOOD_COLOR, GOOD_COLOR]),
+        ]
+        for problem, points, kind, colors in cases:
+            pose = Pose([Point(*v) for v in points], [UsedBonus(kind, 1)])
+            got = edge_colors(problem, pose)
+            self.assertEqual(got, colors, (kind, points))
+            self.assertEqual(BAD_COLOR not in got, valid_pose(problem, pose.vertices, pose.bonuses[0]))
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache:
+            path = render_cached(11, POSE_11, cache=cache)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(8), b'\x89PNG\r\n\x1a\n')
+            mtime = os.path.getmtime(path)
+            self.assertEqual(render_cached(11, POSE_11, cache=cache), path)
+            self.assertEqual(os.path.getmtime(path), mtime)
+            self.assertNotEqual(cache_path(11, None, cache=cache), path)
+            self.assertNotEqual(cache_path(11, POSE_11, lattice=True, cache=cache), path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# test_rigid.py
+
+import unittest
+from aray.problem import Problem
+from aray.types import Point, Edge
+from aray.boxlet import polygon_points
+from aray.dislike import dislikes
+from aray.valid import valid_pose
+from aray.rigid import RigidSearch, rigid_placements, translation_map
+
+# a U shape, open at the top, with a notch between x=4 and x=6
+HOLE = [Point(0, 0), Point(10, 0), Point(10, 10), Point(6, 10),
+        Point(6, 4), Point(4, 4), Point(4, 10), Point(0, 10)]
+
+
+def make_problem(vertices, edges, epsilon=0, hole=HOLE):
+    vertices = [Point(*v) for v in vertices]
+    edges = [Edge(*e) for e in edges]
+    dists = [(vertices[a].x - vertices[b].x) ** 2 + (vertices[a].y - vertices[b].y) ** 2
+             for a, b in edges]
+    edge_map = {}
+    for i, (a, b) in enumerate(edges):
+        edge_map.setdefault(a, []).append(i)
+        edge_map.setdefault(b, []).append(i)
+    return Problem(hole, vertices, edges, dists, edge_map, epsilon)
+
+
+class TestRigid(unittest.TestCase):
+    def test_translations_match_brute_force(self):
+        problem = make_problem([(0, 0), (0, 3), (2, 3)], [(0, 1), (1, 2)])
+        search = RigidSearch(problem)
+        pose = search.vertices
+        inside = polygon_points(HOLE)
+        expected = {(x, y) for x in range(-5, 15) for y in range(-5, 15)
+                    if all(Point(px + x, py + y) in inside for px, py in pose.tolist())}
+        got = {tuple(t) for t in search.translations(pose).tolist()}
+        self.assertEqual(got, expected)
+
+    def test_translation_map(self):
+        problem = make_problem([(0, 0), (0, 3), (2, 3)], [(0, 1), (1, 2)])
+        corner, vertex_map = translation_map(problem, check_edges=False)
+        _, valid = translation_map(problem)
+        self.assertTrue(valid.any())
+        self.assertFalse((valid & ~vertex_map).any())
+        for i in range(valid.shape[0]):
+            for j in range(valid.shape[1]):
+                pose = [Point(v.x + corner.x + i, v.y + corner.y + j) for v in problem.vertices]
+                self.assertEqual(bool(valid[i, j]), valid_pose(problem, pose))
+
+    def test_placements_valid_and_ranked(self):
+        problem = make_problem([(0, 0), (0, 3), (2, 3)], [(0, 1), (1, 2)])
+        found = rigid_placements(problem)
+        self.assertGreater(len(found), 0)
+        self.assertEqual([p.dislikes for p in found], sorted(p.dislikes for p in found))
+        for p in found:
+            self.assertTrue(valid_pose(problem, p.vertices))
+            self.assertEqual(p.dislikes, dislikes(HOLE, p.vertices))
+        self.assertEqual(rigid_placements(problem, limit=3), found[:3])
+
+    def test_needs_rotation(self):
+        # a lying bar in a tall thin hole has to be stood up
+        tall = [Point(0, 0), Point(2, 0), Point(2, 10), Point(0, 10)]
+        problem = make_problem([(0, 0), (8, 0)], [(0, 1)], hole=tall)
+        found = rigid_placements(problem)
+        self.assertGreater(len(found), 0)
+        self.assertTrue(all(p.matrix[0] == 0 for p in found))
+
+
+if __name__ == '__main__':
+    unittest.main()
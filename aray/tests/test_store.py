@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# test_store.py
+
+import os
+import json
+import tempfile
+import unittest
+import multiprocessing
+from aray.problem import Problem, Pose
+from aray.types import Point, Edge
+from aray.dislike import dislikes
+from aray.store import ResultStore, pose_hash
+
+HOLE = [Point(0, 0), Point(10, 0), Point(10, 10), Point(0, 10)]
+# a single edge of length 3 in a square hole, so it fits in lots of places
+PROBLEM = Problem(HOLE, [Point(0, 0), Point(3, 0)], [Edge(0, 1)], [9], {0: [0], 1: [0]}, 0, [])
+
+
+def pose(*points):
+    return Pose([Point(*p) for p in points])
+
+
+def add_row(path, y):
+    with ResultStore(path) as store:
+        for x in range(8):
+            store.add(0, pose((x, y), (x + 3, y)), f'worker{y}', problem=PROBLEM)
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'results.sqlite3')
+        self.store = ResultStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_add_checks_and_scores(self):
+        good = self.store.add(0, pose((0, 0), (3, 0)), 'test', problem=PROBLEM)
+        self.assertTrue(good.valid)
+        self.assertEqual(good.dislikes, dislikes(HOLE, good.pose.vertices))
+        bad = self.store.add(0, pose((0, 0), (4, 0)), 'test', problem=PROBLEM)
+        self.assertFalse(bad.valid)
+        self.assertEqual(self.store.best(0).id, good.id)
+        self.assertEqual(len(list(self.store.results(0))), 2)
+        self.assertEqual([r.id for r in self.store.results(0, valid=False)], [bad.id])
+
+    def test_duplicate_ignored(self):
+        first = self.store.add(0, pose((0, 0), (3, 0)), 'one', problem=PROBLEM)
+        again = self.store.add(0, pose((0, 0), (3, 0)), 'two', problem=PROBLEM)
+        self.assertEqual(first, again)
+        self.assertEqual(len(list(self.store.results())), 1)
+        self.assertEqual(first.pose_hash, pose_hash(pose((0, 0), (3, 0))))
+
+    def test_best_only_improves(self):
+        corner = self.store.add(0, pose((0, 0), (3, 0)), 'test', problem=PROBLEM)
+        middle = self.store.add(0, pose((4, 5), (7, 5)), 'test', problem=PROBLEM)
+        self.assertLess(middle.dislikes, corner.dislikes)
+        self.assertEqual(self.store.best(0).id, middle.id)
+        self.store.add(0, pose((0, 10), (3, 10)), 'test', problem=PROBLEM)
+        self.assertEqual(self.store.best(0).id, middle.id)
+        # invalid poses never become the best, however few dislikes they have
+        self.store.add(0, pose((0, 0), (10, 10)), 'test', problem=PROBLEM)
+        self.assertEqual(self.store.best(0).id, middle.id)
+        self.assertEqual(list(self.store.best_all()), [0])
+        self.assertIsNone(self.store.best(1))
+
+    def test_import_files(self):
+        solutions = os.path.join(self.tmp.name, 'solutions')
+        os.mkdir(solutions)
+        for name, vertices in (('11-0-rigid.json', [[10, 0], [10, 10], [0, 10]]),
+                               ('11-0-cpsolver3.json', [[10, 0], [0, 10], [10, 10]]),
+                               ('notes.json', [])):
+            with open(os.path.join(solutions, name), 'w') as f:
+                json.dump({'vertices': vertices}, f)
+        paths = sorted(os.path.join(solutions, f) for f in os.listdir(solutions))
+        added = self.store.import_files(paths)
+        self.assertEqual(sorted((r.solver, r.valid) for r in added), [('cpsolver3', False), ('rigid', True)])
+        self.assertEqual(self.store.best(11).solver, 'rigid')
+        self.assertEqual(self.store.best(11).dislikes, 0)
+
+    def test_concurrent_writers(self):
+        ctx = multiprocessing.get_context('fork')
+        processes = [ctx.Process(target=add_row, args=(self.path, y)) for y in range(1, 9)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+        results = list(self.store.results(0))
+        self.assertEqual(len(results), 8 * 8)
+        self.assertTrue(all(r.valid for r in results))
+        self.assertEqual(self.store.best(0).dislikes, min(r.dislikes for r in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
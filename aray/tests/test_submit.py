@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# test_submit.py
+
+import os
+import json
+import time
+import random
+import tempfile
+import asyncio
+import unittest
+import requests
+from aray.submit import TokenBucket, Submitter, backoff, submit_poses, VALID, INVALID, FAILED
+from aray.mockserver import MockServer
+from aray.problem import BASE_PATH
+
+# the rigid placement of problem 11's triangle, exactly on its hole
+POSE_11 = {'vertices': [[10, 0], [10, 10], [0, 10]]}
+BAD_11 = {'vertices': [[0, 0], [10, 0], [10, 10]]}
+
+
+def fast(server, **kwargs):
+    ''' A submitter against the mock server that doesn't wait around '''
+    options = dict(api_key='test', base_url=server.url, rate=1000, poll_interval=0.01,
+                   backoff_base=0.01, backoff_cap=0.05, seed=0)
+    options.update(kwargs)
+    return Submitter(**options)
+
+
+class TestSubmit(unittest.TestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(2, capacity=3)
+        now = bucket.updated
+        self.assertEqual([bucket.take(now) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.take(now), 0.5)
+        self.assertEqual(bucket.take(now + 0.5), 0)
+        self.assertEqual(bucket.take(now + 10), 0)  # refills, but only to capacity
+        self.assertAlmostEqual(bucket.tokens, 2)
+
+    def test_token_bucket_paces(self):
+        async def run():
+            bucket = TokenBucket(50, capacity=1)
+            start = time.monotonic()
+            for _ in range(11):
+                await bucket.acquire()
+            return time.monotonic() - start
+        self.assertGreaterEqual(asyncio.run(run()), 0.19)
+
+    def test_backoff_jitter(self):
+        rng = random.Random(0)
+        delays = [backoff(a, 1.0, 5.0, rng) for a in range(10) for _ in range(20)]
+        self.assertTrue(all(0 <= d <= 5.0 for d in delays))
+        self.assertGreater(len(set(delays)), 100)
+
+    def test_submit_and_poll(self):
+        with MockServer(pending_polls=2) as server:
+            results = submit_poses([(11, POSE_11), (11, BAD_11)], api_key='test', base_url=server.url,
+                                   rate=1000, poll_interval=0.01)
+        good, bad = results
+        self.assertEqual((good.state, good.dislikes), (VALID, 0))
+        self.assertEqual(good.attempts, 1 + 3)
+        self.assertEqual(bad.state, INVALID)
+        self.assertIsNotNone(bad.error)
+
+    def test_retries_through_failures_and_limits(self):
+        poses = [(11, POSE_11)] * 20
+        with MockServer(rate=200, burst=2, fail_rate=0.2, seed=1, pending_polls=0) as server:
+            async def run():
+                async with fast(server, retries=20) as submitter:
+                    return await submitter.submit_all(poses)
+            results = asyncio.run(run())
+            stats = dict(server.stats)
+        self.assertTrue(all(s.state == VALID for s in results), results)
+        self.assertGreater(stats['failed'], 0)
+        self.assertGreater(stats['limited'], 0)
+        self.assertEqual(stats['posted'], 20)
+
+    def test_connections_pooled(self):
+        poses = [(11, POSE_11)] * 30
+        with MockServer(pending_polls=0) as server:
+            async def run():
+                async with fast(server, concurrency=3) as submitter:
+                    return await submitter.submit_all(poses)
+            results = asyncio.run(run())
+            stats = dict(server.stats)
+        self.assertEqual(len(results), 30)
+        self.assertEqual(stats['requests'], 60)
+        self.assertLessEqual(stats['connections'], 3)
+
+    def test_scores_against_served_problems(self):
+        with open(os.path.join(BASE_PATH, 'problems', '11.json')) as f:
+            data = json.load(f)
+        data['hole'] = [[x + 100, y] for x, y in data['hole']]
+        moved = {'vertices': [[x + 100, y] for x, y in POSE_11['vertices']]}
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, '11.json'), 'w') as f:
+                json.dump(data, f)
+            with MockServer(problems_path=tmp, pending_polls=0) as server:
+                results = submit_poses([(11, POSE_11), (11, moved), (12, POSE_11)], api_key='test',
+                                       base_url=server.url, rate=1000, poll_interval=0.01)
+        self.assertEqual([r.state for r in results], [INVALID, VALID, INVALID])
+
+    def test_gives_up(self):
+        with MockServer(fail_rate=1.0) as server:
+            s, = submit_poses([(11, POSE_11)], api_key='test', base_url=server.url,
+                              rate=1000, retries=2, backoff_base=0.01)
+        self.assertEqual((s.state, s.attempts), (FAILED, 3))
+        self.assertIn('503', s.error)
+
+    def test_needs_key(self):
+        with MockServer() as server:
+            r = requests.get(server.url + '/api/problems/11')
+            self.assertEqual(r.status_code, 403)
+            r = requests.get(server.url + '/api/problems/11', headers={'Authorization': 'Bearer test'})
+            self.assertEqual(r.json()['epsilon'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
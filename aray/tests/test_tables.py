@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# test_tables.py
+
+import unittest
+import numpy as np
+from aray.problem import Problem
+from aray.stretch import center_stretch
+from aray.valid import edges_in_hole
+from aray.tables import Lattice, table_size, pair_tables, allowed_table, allowed_tables
+
+
+class TestTables(unittest.TestCase):
+    def test_tables_split_exactly(self):
+        problem = Problem.get(28)  # a hole with pockets
+        lattice = Lattice(problem.hole)
+        deltas = center_stretch(problem.dists[0], problem.epsilon)
+        allowed, forbidden = pair_tables(lattice, deltas)
+        self.assertEqual(allowed.shape[1], 4)
+        self.assertEqual(len(allowed) + len(forbidden), table_size(lattice, deltas))
+        self.assertGreater(len(forbidden), 0)
+        rows = np.vstack([allowed, forbidden]).astype(np.int64)
+        ok = edges_in_hole(problem.hole, rows[:, :2], rows[:, 2:])
+        self.assertTrue(ok[:len(allowed)].all())
+        self.assertFalse(ok[len(allowed):].any())
+        self.assertEqual(len({tuple(r) for r in rows.tolist()}), len(rows))
+
+    def test_convex_hole_allows_everything(self):
+        problem = Problem.get(11)
+        tables = allowed_tables(problem)
+        self.assertEqual(sorted(tables), sorted(set(problem.dists)))
+        pose = np.array([(10, 0), (10, 10), (0, 10)])  # a valid pose
+        for (a, b), d in zip(problem.edges, problem.dists):
+            self.assertIn(tuple(pose[[a, b]].ravel()), {tuple(r) for r in tables[d].tolist()})
+
+    def test_max_rows(self):
+        problem = Problem.get(28)
+        lattice = Lattice(problem.hole)
+        deltas = center_stretch(problem.dists[0], problem.epsilon)
+        with self.assertRaises(ValueError):
+            allowed_table(lattice, deltas, max_rows=table_size(lattice, deltas) - 1)
+        # deltas longer than the hole fit nowhere
+        self.assertEqual(len(allowed_table(lattice, [(10_000, 0)])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
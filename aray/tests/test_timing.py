@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# test_timing.py
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from aray.problem import Problem
+from aray.boxlet import polygon_points
+from aray.timing import Profile, active, stage, count, load_records
+
+
+class TestTiming(unittest.TestCase):
+    def test_records_stages_and_counts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'runs.jsonl')
+            with Profile('test', 11, path, size='small') as profile:
+                self.assertIs(active(), profile)
+                problem = Problem.get(11)
+                polygon_points(problem.hole)
+                with stage('work'):
+                    count('things', 3)
+                count('things')
+            self.assertIsNone(active())
+            records = list(load_records(path))
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual((record['solver'], record['problem']), ('test', 11))
+        self.assertEqual(record['info'], {'size': 'small'})
+        self.assertEqual(record['calls'], {'load': 1, 'lattice': 1, 'work': 1})
+        self.assertEqual(record['counts'], {'things': 4})
+        self.assertGreaterEqual(record['total'], record['seconds']['lattice'])
+        self.assertIsNone(record['error'])
+
+    def test_nothing_recorded_outside_a_run(self):
+        with stage('work'):
+            count('things')
+        profile = Profile('test')
+        self.assertEqual(profile.record()['calls'], {})
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(profile.emit())
+
+    def test_error_recorded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'runs.jsonl')
+            with self.assertRaises(ValueError):
+                with Profile('test', None, path):
+                    raise ValueError('boom')
+            record, = load_records(path)
+        self.assertIn('boom', record['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# test_valid.py
+
+import unittest
+from aray.types import Point
+import numpy as np
+from aray.valid import point_in_hole, edge_in_hole, stretch_ok, points_in_hole, edges_in_hole
+
+# a U shape, open at the top, with a notch between x=4 and x=6
+HOLE = [Point(0, 0), Point(10, 0), Point(10, 10), Point(6, 10),
+        Point(6, 4), Point(4, 4), Point(4, 10), Point(0, 10)]
+
+
+class TestValid(unittest.TestCase):
+    def test_point_in_hole(self):
+        self.assertTrue(point_in_hole(HOLE, Point(2, 2)))
+        self.assertTrue(point_in_hole(HOLE, Point(0, 5)))  # on boundary
+        self.assertTrue(point_in_hole(HOLE, Point(6, 4)))  # on a corner
+        self.assertFalse(point_in_hole(HOLE, Point(5, 5)))  # in the notch
+        self.assertFalse(point_in_hole(HOLE, Point(11, 5)))
+
+    def test_edge_in_hole(self):
+        self.assertTrue(edge_in_hole(HOLE, Point(1, 1), Point(9, 3)))
+        self.assertTrue(edge_in_hole(HOLE, Point(0, 0), Point(10, 0)))  # along boundary
+        self.assertTrue(edge_in_hole(HOLE, Point(4, 4), Point(6, 4)))  # along the notch floor
+        self.assertFalse(edge_in_hole(HOLE, Point(2, 8), Point(8, 8)))  # crosses the notch
+        # through both notch corners, running along the notch floor between
+        self.assertTrue(edge_in_hole(HOLE, Point(2, 4), Point(8, 4)))
+        # from a notch corner out through the notch to the other arm
+        self.assertFalse(edge_in_hole(HOLE, Point(4, 4), Point(6, 6)))
+        self.assertFalse(edge_in_hole(HOLE, Point(4, 10), Point(6, 10)))  # across the opening
+
+    def test_vectorized_match(self):
+        points = [Point(x, y) for x in range(-1, 12) for y in range(-1, 12)]
+        expected = [point_in_hole(HOLE, p) for p in points]
+        self.assertEqual(points_in_hole(HOLE, np.array(points)).tolist(), expected)
+        pairs = [(a, b) for a in points[::5] for b in points[::7]]
+        a, b = np.array([a for a, _ in pairs]), np.array([b for _, b in pairs])
+        expected = [edge_in_hole(HOLE, a, b) for a, b in pairs]
+        self.assertEqual(edges_in_hole(HOLE, a, b).tolist(), expected)
+
+    def test_stretch_ok(self):
+        self.assertTrue(stretch_ok(100, 100, 0))
+        self.assertFalse(stretch_ok(100, 101, 0))
+        self.assertTrue(stretch_ok(100, 115, 150000))
+        self.assertFalse(stretch_ok(100, 116, 150000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# run.py - run the benchmark suite and store or compare results per commit
+'''
+Run from the repository root, with aray importable:
+
+    python -m benchmarks.run run --subsets small medium
+    python -m benchmarks.run compare <base commit> <head commit>
+
+Each run writes benchmarks/results/<commit>.json, so a regression shows up
+as a compare between the results of two commits.
+'''
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from .suite import SUBSETS, BENCHMARKS, run_benchmark, select
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def git_commit() -> Tuple[str, bool]:
+    ''' Get the current commit hash, and whether the tree has uncommitted changes '''
+    commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()
+    status = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], text=True)
+    return commit, bool(status.strip())
+
+
+def machine() -> Dict:
+    return dict(python=platform.python_version(), platform=platform.platform(),
+                processor=platform.processor(), cpus=os.cpu_count())
+
+
+def results_file(commit: str) -> str:
+    ''' Get the results path for a commit, allowing a unique prefix of its hash '''
+    if os.path.exists(os.path.join(RESULTS_PATH, f'{commit}.json')):
+        return os.path.join(RESULTS_PATH, f'{commit}.json')
+    matches = [f for f in os.listdir(RESULTS_PATH) if f.startswith(commit)] if os.path.isdir(RESULTS_PATH) else []
+    assert len(matches) == 1, f'no unique results for {commit}: {matches}'
+    return os.path.join(RESULTS_PATH, matches[0])
+
+
+def run(names: Optional[List[str]] = None, subsets: Optional[List[str]] = None,
+        timeout: float = 30.0, repeat: int = 5, output: Optional[str] = None) -> str:
+    ''' Run the selected benchmarks, write the results for this commit, return their path '''
+    commit, dirty = git_commit()
+    results = []
+    for bench, number in select(names, subsets):
+        result = run_benchmark(bench, number, timeout, repeat)
+        print(f"{result['benchmark']:<16} {number:>4} {result['seconds']:>12.6f}s"
+              + ('' if result.get('found', True) else '  (none found)'), flush=True)
+        results.append(result)
+    if output is None:
+        os.makedirs(RESULTS_PATH, exist_ok=True)
+        output = os.path.join(RESULTS_PATH, f'{commit}.json')
+    record = dict(commit=commit, dirty=dirty, timestamp=time.time(),
+                  machine=machine(), results=results)
+    with open(output, 'w') as f:
+        json.dump(record, f, indent=1, sort_keys=True)
+    print('wrote', output)
+    return output
+
+
+def compare(base: Dict, head: Dict, threshold: float = 1.2) -> List[Dict]:
+    ''' Get the benchmarks that got slower than threshold times, or stopped finding a solution '''
+    before = {(r['benchmark'], r['problem']): r for r in base['results']}
+    regressions = []
+    for r in head['results']:
+        old = before.get((r['benchmark'], r['problem']))
+        if old is None:
+            continue
+        ratio = r['seconds'] / old['seconds'] if old['seconds'] > 0 else float('inf')
+        lost = old.get('found', True) and not r.get('found', True)
+        if ratio > threshold or lost:
+            regressions.append(dict(benchmark=r['benchmark'], problem=r['problem'],
+                                    before=old['seconds'], after=r['seconds'],
+                                    ratio=ratio, lost=lost))
+    return regressions
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run benchmarks and store results for this commit')
+    run_parser.add_argument('-b', '--benchmarks', nargs='+', choices=[b.name for b in BENCHMARKS])
+    run_parser.add_argument('-s', '--subsets', nargs='+', choices=list(SUBSETS))
+    run_parser.add_argument('-t', '--timeout', type=float, default=30.0, help='per solve')
+    run_parser.add_argument('-r', '--repeat', type=int, default=5, help='runs per kernel, best is kept')
+    run_parser.add_argument('-o', '--output', help='write here instead of results/<commit>.json')
+    compare_parser = commands.add_parser('compare', help='report regressions between two commits')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args.benchmarks, args.subsets, args.timeout, args.repeat, args.output)
+    else:
+        with open(results_file(args.base)) as f:
+            base = json.load(f)
+        with open(results_file(args.head)) as f:
+            head = json.load(f)
+        regressions = compare(base, head, args.threshold)
+        for r in regressions:
+            note = ' and found nothing' if r['lost'] else ''
+            print(f"{r['benchmark']:<16} {r['problem']:>4} {r['before']:.6f}s -> {r['after']:.6f}s "
+                  f"({r['ratio']:.2f}x){note}")
+        print(f'{len(regressions)} regressions over {args.threshold}x')
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# suite.py - benchmark definitions over a curated subset of the problems
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from aray.problem import Problem
+from aray.types import Pair
+from aray.boxlet import polygon_points
+from aray.stretch import center_stretch
+from aray.forbidden import forbidden
+from aray.dislike import dislikes
+from aray.valid import valid_pose, edges_in_hole
+from aray.rigid import rigid_placements
+from aray.anneal import Annealer
+
+# picked by figure size and hole area, so each size class has a spread of shapes
+SUBSETS = {
+    'small': [11, 16, 22, 28],
+    'medium': [1, 35, 55, 60],
+    'large': [62, 83, 126],
+    'huge': [90],  # 815 x 1153 hole, only for solvers that don't tabulate the lattice
+}
+
+
+@dataclass
+class Benchmark:
+    ''' A function of a problem, returning the callable to time (setup is not timed) '''
+    name: str
+    setup: Callable[[Problem], Callable[[], object]]
+    subsets: Tuple[str, ...]  # which subsets it runs on, slow ones skip the large problems
+    kind: str = 'kernel'  # kernels are repeated and take the best, solves run once
+
+
+@dataclass
+class Solve:
+    ''' An end-to-end solve, run until its first valid pose or its budget runs out '''
+    name: str
+    run: Callable[[Problem, float], Dict]  # (problem, timeout) -> dict with 'found' and counters
+    subsets: Tuple[str, ...]
+    kind: str = 'solve'
+
+
+def bench_polygon_points(problem: Problem):
+    return lambda: polygon_points(problem.hole)
+
+
+def bench_center_stretch(problem: Problem):
+    distances = sorted(set(problem.dists))
+    return lambda: [center_stretch(d, problem.epsilon) for d in distances]
+
+
+def bench_forbidden(problem: Problem):
+    edges = [Pair(problem.vertices[a], problem.vertices[b]) for a, b in problem.edges]
+    return lambda: forbidden(problem.hole, edges, problem.epsilon)
+
+
+def bench_allowed_tables(problem: Problem):
+    from aray.tables import Lattice, pair_tables
+    lattice = Lattice(problem.hole)
+    rings = [center_stretch(d, problem.epsilon) for d in sorted(set(problem.dists))]
+    return lambda: [pair_tables(lattice, deltas) for deltas in rings]
+
+
+def bench_dislikes(problem: Problem):
+    return lambda: dislikes(problem.hole, problem.vertices)
+
+
+def bench_valid_pose(problem: Problem):
+    # placements found by the rigid search are valid, so every check runs to the end
+    found = rigid_placements(problem, limit=1)
+    vertices = found[0].vertices if found else problem.vertices
+    return lambda: valid_pose(problem, vertices)
+
+
+def bench_edges_in_hole(problem: Problem):
+    vertices = np.array(problem.vertices, dtype=np.int64)
+    edges = np.array(problem.edges, dtype=np.int64)
+    a, b = vertices[edges[:, 0]], vertices[edges[:, 1]]
+    return lambda: edges_in_hole(problem.hole, a, b)
+
+
+def solve_rigid(problem: Problem, timeout: float) -> Dict:
+    found = rigid_placements(problem, limit=1)
+    return dict(found=bool(found), dislikes=found[0].dislikes if found else None)
+
+
+def solve_anneal(problem: Problem, timeout: float, chunk: int = 10_000) -> Dict:
+    annealer = Annealer(problem, seed=0)
+    start = time.perf_counter()
+    while annealer.best is None and time.perf_counter() - start < timeout:
+        annealer.run(chunk)
+    return dict(found=annealer.best is not None, dislikes=annealer.best_dislikes,
+                iterations=annealer.stats.iterations)
+
+
+def solve_construct(problem: Problem, timeout: float, max_steps: int = 20_000) -> Dict:
+    from vaniver.construct import figure, partial_figure, search
+    data = dict(hole=problem.hole, epsilon=problem.epsilon,
+                figure=dict(vertices=problem.vertices, edges=problem.edges))
+    f = figure(data)
+    initial = [partial_figure(f, v, h) for h in range(f.hole.num_vertices) for v in range(f.num_vertices)]
+    # any finished figure meets the target, so this stops at the first valid pose
+    s = search(initial, target=2 ** 62, verbose=False)
+    start = time.perf_counter()
+    while (len(s.candidates) > 0 and s.finished is None and s.num_searched < max_steps
+           and time.perf_counter() - start < timeout):
+        s.step()
+    return dict(found=s.finished is not None,
+                dislikes=s.finished.sum_dislikes if s.finished is not None else None,
+                nodes=s.num_searched)
+
+
+def solve_cpsat(model, timeout: float) -> Dict:
+    ''' Solve a built cpsat.PoseModel, reporting its size alongside '''
+    size = model.size()
+    pose = model.solve(timeout)
+    return dict(found=pose is not None, dislikes=dislikes(model.problem.hole, pose) if pose else None,
+                rounds=model.rounds, cuts=model.cuts, **size)
+
+
+def solve_cpsat_table(problem: Problem, timeout: float) -> Dict:
+    from aray.cpsat import PoseModel
+    model = PoseModel(problem)
+    edges = [Pair(problem.vertices[a], problem.vertices[b]) for a, b in problem.edges]
+    model.add_forbidden(forbidden(problem.hole, edges, problem.epsilon))
+    return solve_cpsat(model, timeout)
+
+
+def solve_cpsat_allowed(problem: Problem, timeout: float) -> Dict:
+    from aray.cpsat import PoseModel
+    from aray.tables import allowed_tables
+    model = PoseModel(problem)
+    model.add_allowed(allowed_tables(problem))
+    return solve_cpsat(model, timeout)
+
+
+def solve_cpsat_index(problem: Problem, timeout: float) -> Dict:
+    from aray.cpsat import IndexModel
+    return solve_cpsat(IndexModel(problem), timeout)
+
+
+def solve_cpsat_crossing(problem: Problem, timeout: float) -> Dict:
+    from aray.cpsat import PoseModel
+    model = PoseModel(problem)
+    model.add_crossings()
+    return solve_cpsat(model, timeout)
+
+
+def solve_cpsat_planned(problem: Problem, timeout: float) -> Dict:
+    from aray.cpsat import PoseModel
+    from aray.plan import plan
+    from aray.tables import Lattice
+    lattice = Lattice(problem.hole)
+    chosen = plan(problem, lattice)
+    model = PoseModel(problem)
+    model.add_plan(chosen, lattice)
+    return dict(solve_cpsat(model, timeout), planned_rounds=chosen.rounds)
+
+
+BENCHMARKS: List = [
+    Benchmark('polygon_points', bench_polygon_points, ('small', 'medium', 'large')),
+    Benchmark('center_stretch', bench_center_stretch, ('small', 'medium', 'large')),
+    Benchmark('forbidden', bench_forbidden, ('small',)),
+    Benchmark('allowed_tables', bench_allowed_tables, ('small', 'medium')),
+    Benchmark('dislikes', bench_dislikes, ('small', 'medium', 'large')),
+    Benchmark('valid_pose', bench_valid_pose, ('small', 'medium', 'large')),
+    Benchmark('edges_in_hole', bench_edges_in_hole, ('small', 'medium', 'large')),
+    Solve('rigid', solve_rigid, ('small', 'medium', 'large')),
+    Solve('anneal', solve_anneal, ('small', 'medium')),
+    Solve('construct', solve_construct, ('small', 'medium')),
+    # the forbidden tables take minutes to compute past the medium problems
+    Solve('cpsat_table', solve_cpsat_table, ('small', 'medium')),
+    Solve('cpsat_allowed', solve_cpsat_allowed, ('small',)),
+    Solve('cpsat_index', solve_cpsat_index, ('small',)),  # the same tables by lattice index
+    Solve('cpsat_crossing', solve_cpsat_crossing, ('small', 'medium', 'large', 'huge')),
+    Solve('cpsat_planned', solve_cpsat_planned, ('small', 'medium', 'large', 'huge')),
+]
+
+
+def time_kernel(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.05,
+                max_time: float = 10.0) -> Dict:
+    ''' Time fn asv style: grow the number of calls until a run takes min_time, then keep the best of repeat runs
+
+    Slow kernels stop repeating once max_time has been spent on them.
+    '''
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    times = [elapsed / number]
+    spent = elapsed
+    for _ in range(repeat - 1):
+        if spent >= max_time:
+            break
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        spent += elapsed
+        times.append(elapsed / number)
+    times.sort()
+    return dict(seconds=times[0], median=times[len(times) // 2], number=number, repeat=len(times))
+
+
+def run_benchmark(bench, number: int, timeout: float = 30.0, repeat: int = 5) -> Dict:
+    ''' Run one benchmark on one problem, return its result record '''
+    problem = Problem.get(number)
+    if bench.kind == 'kernel':
+        result = time_kernel(bench.setup(problem), repeat)
+    else:
+        start = time.perf_counter()
+        result = bench.run(problem, timeout)
+        result['seconds'] = time.perf_counter() - start
+    return dict(benchmark=bench.name, kind=bench.kind, problem=number, **result)
+
+
+def select(names: Optional[List[str]] = None, subsets: Optional[List[str]] = None) -> List[Tuple[object, int]]:
+    ''' Get the (benchmark, problem number) pairs to run '''
+    subsets = subsets or list(SUBSETS)
+    pairs = []
+    for bench in BENCHMARKS:
+        if names and bench.name not in names:
+            continue
+        for subset in subsets:
+            if subset in bench.subsets:
+                pairs.extend((bench, n) for n in SUBSETS[subset])
+    return pairs
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# test_benchmarks.py
+
+from benchmarks.suite import BENCHMARKS, SUBSETS, run_benchmark, select, time_kernel
+from benchmarks.run import compare
+
+
+def test_select_respects_subsets():
+    pairs = select(['forbidden', 'dislikes'], ['small', 'large'])
+    assert [n for b, n in pairs if b.name == 'forbidden'] == SUBSETS['small']
+    assert [n for b, n in pairs if b.name == 'dislikes'] == SUBSETS['small'] + SUBSETS['large']
+
+
+def test_run_kernel_and_solve():
+    by_name = {b.name: b for b in BENCHMARKS}
+    kernel = run_benchmark(by_name['dislikes'], 11, repeat=2)
+    assert kernel['kind'] == 'kernel' and kernel['seconds'] > 0 and kernel['number'] >= 1
+    solve = run_benchmark(by_name['rigid'], 11)
+    assert solve['kind'] == 'solve' and solve['found'] and solve['dislikes'] == 0
+
+
+def test_time_kernel_stops_slow_repeats():
+    result = time_kernel(lambda: None, repeat=3, min_time=0.0, max_time=0.0)
+    assert result['repeat'] == 1
+
+
+def test_compare_flags_slower_and_lost():
+    base = dict(results=[dict(benchmark='a', problem=1, seconds=1.0),
+                         dict(benchmark='b', problem=1, seconds=1.0, found=True),
+                         dict(benchmark='c', problem=1, seconds=1.0)])
+    head = dict(results=[dict(benchmark='a', problem=1, seconds=1.5),
+                         dict(benchmark='b', problem=1, seconds=0.5, found=False),
+                         dict(benchmark='c', problem=1, seconds=1.1)])
+    regressions = compare(base, head, threshold=1.2)
+    assert [(r['benchmark'], r['lost']) for r in regressions] == [('a', False), ('b', True)]
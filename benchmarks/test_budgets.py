@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# test_budgets.py - timing limits, kept out of the unit tests since they depend on the machine
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+from aray.problem import Problem
+from aray.anneal import Annealer
+from aray.observe import Observer, LiveView
+
+# what a pool worker doing geometry and scoring imports, see aray/tests/test_imports.py
+CORE = ['aray.problem', 'aray.valid', 'aray.dislike', 'aray.boxlet', 'aray.partial',
+        'aray.stretch', 'aray.store', 'aray.timing', 'aray.anneal', 'aray.rigid']
+# a fresh interpreter importing CORE takes about 0.1s, with matplotlib, requests and scipy it took over 1.5s
+IMPORT_BUDGET = 0.75
+# importing aray.problem and loading a cached problem, as every solver starts; about 0.02s,
+# and 0.13s when a cache hit still imported the networking stack
+LOAD_BUDGET = 0.08
+# a LiveView may add this fraction of an annealer iteration to every call between frames
+OBSERVE_BUDGET = 0.01
+
+
+def import_seconds(modules):
+    ''' Import modules in a fresh interpreter, return the seconds the top-level imports took '''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {", ".join(modules)}'],
+                            capture_output=True, text=True, check=True)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        # 'import time: self [us] | cumulative | name', nested imports are indented
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if not name.startswith('  ') and cumulative.strip().isdigit():
+                total += int(cumulative) / 1e6
+    return total
+
+
+def test_core_import_time():
+    total = import_seconds(CORE)
+    print(f'core import {total:.3f}s', file=sys.stderr)
+    assert total < IMPORT_BUDGET
+
+
+def test_problem_load_time():
+    code = ('import time; start = time.perf_counter(); from aray.problem import Problem; '
+            'Problem.get(1); print(time.perf_counter() - start)')
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    total = float(result.stdout.split()[-1])
+    print(f'problem load {total:.3f}s', file=sys.stderr)
+    assert total < LOAD_BUDGET
+
+
+def test_live_view_overhead():
+    annealer = Annealer(Problem.get(62), seed=0)
+    annealer.run(20_000)
+    per_iteration = 1 / annealer.stats.iterations_per_second
+    pose, calls = annealer.pose, 100_000
+
+    def per_call(observer):
+        start = time.perf_counter()
+        for i in range(calls):
+            observer.observe(i, pose, 0)
+        return (time.perf_counter() - start) / calls
+
+    with tempfile.TemporaryDirectory() as tmp, LiveView(62, path=os.path.join(tmp, 'live.png')) as view:
+        view.next_frame = float('inf')  # only the between-frames path, which is nearly every call
+        # over what the solver pays to call any observer at all, best of a few to skip noise
+        added = min(per_call(view) - per_call(Observer()) for _ in range(5))
+    assert view.skipped == 5 * calls
+    assert added < OBSERVE_BUDGET * per_iteration
@@ -1,16 +1,21 @@
-import json
+# Run with aray importable, e.g. from the repository root:
+#   PYTHONPATH=aray python constraints/linear.py
 import math
 
-with open("problems/1.json") as f:
-    p78 = json.loads(f.read())
+from aray.problem import Problem
+from aray.stretch import center_stretch
+from aray.tables import Lattice, table_size, allowed_table
 
-hole = p78["hole"]
-figure_edges = p78["figure"]["edges"]
-figure_vertices = p78["figure"]["vertices"]
-epsilon = p78["epsilon"]
+problem = Problem.get(1)
+hole = problem.hole
+figure_edges = problem.edges
+figure_vertices = problem.vertices
+epsilon = problem.epsilon
+
+# tables past this many rows take more memory than the model is worth
+MAX_ROWS = 10_000_000
 
 from ortools.sat.python import cp_model
-from shapely.geometry import Polygon, Point, LineString
 
 model = cp_model.CpModel()
 
@@ -21,15 +26,8 @@ hole_min_y = min([p[1] for p in hole])
 hole_max_y = max([p[1] for p in hole])
 print(f"Hole x={hole_min_x}:{hole_max_x} y={hole_min_y}:{hole_max_y}")
 
-sh_hole = Polygon(hole)
-sh_hole_linestring = sh_hole.exterior
-allowed_positions = []
-for x in range(hole_min_x, hole_max_x):
-  for y in range(hole_min_y, hole_max_y):
-    if sh_hole.contains(Point(x, y)):
-      allowed_positions.append((x, y))
-        # print(f"{x},{y} in hold= {sh_hole.contains(Point(x, y))}")
-print(f"Hole possible locations {len(allowed_positions)} / {(hole_max_x - hole_min_x) * (hole_max_y - hole_min_y)}")
+lattice = Lattice(problem.hole)
+print(f"Hole possible locations {lattice.grid.sum()} / {(hole_max_x - hole_min_x + 1) * (hole_max_y - hole_min_y + 1)}")
 
 # Create model variables for each pose vertex
 pose_vertexes = {}
@@ -39,31 +37,27 @@ for i, v in enumerate(figure_vertices):
     model.NewIntVar(hole_min_y, hole_max_y, f'{i}_y')
   )
 
-# Create a map of all possible starting and ending x,y for each edge
+# One table of allowed (ax, ay, bx, by) per distinct edge length, shared by its edges
 print(f"Total edges {len(figure_edges)}")
+rings = {d: center_stretch(d, epsilon) for d in sorted(set(problem.dists))}
+for d, deltas in rings.items():
+  print(f"Edge length {d} has up to {table_size(lattice, deltas)} assignments")
+tables = {d: allowed_table(lattice, deltas, MAX_ROWS) for d, deltas in rings.items()}
+
 for i, edge in enumerate(figure_edges):
-  print(f"Creating map for edge {i}")
   vertex = figure_vertices[edge[0]]
   v2 = figure_vertices[edge[1]]
-  distance = math.hypot(v2[0] - vertex[0], v2[1] - vertex[0])
-
-  allowed_assignments = []
-  for p1 in allowed_positions:
-    for p2 in allowed_positions:
-      if math.hypot(p2[0] - p1[0], p2[1] - p1[1]) / distance -1 <= (epsilon / 1000000):
-        # check if the line collides with the hole
-        sh_edge = LineString([p1, p2])
-        if not sh_edge.intersection(sh_hole_linestring):
-          allowed_assignments.append((p1[0], p1[1], p2[0], p2[1]))
+  d = problem.dists[i]
+  allowed_assignments = tables[d]
 
   model.AddAllowedAssignments([
       pose_vertexes[edge[0]][0],
       pose_vertexes[edge[0]][1],
       pose_vertexes[edge[1]][0],
       pose_vertexes[edge[1]][1]
-    ], allowed_assignments)
+    ], allowed_assignments.tolist())
 
-  print(f"{i}: ({edge[0]}) {vertex} -> ({edge[1]}) {v2} with distance {distance} has {len(allowed_assignments)} allowed assignments")
+  print(f"{i}: ({edge[0]}) {vertex} -> ({edge[1]}) {v2} with distance {math.sqrt(d)} has {len(allowed_assignments)} allowed assignments")
 
 # Add optimization criteria
 solver = cp_model.CpSolver()
@@ -1,6 +1,7 @@
 import sys
 import json
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 
 def plot_hole(hole):
     xs, ys = zip(*hole)
@@ -11,11 +12,10 @@ def plot_hole(hole):
     plt.plot(xs,ys,c='b')
 
 def plot_figure(edges, vertices):
-    for edge in edges:
-        a = vertices[edge[0]]
-        b = vertices[edge[1]]
-        xs, ys = zip(a,b)
-        plt.plot(xs, ys,c='r')
+    # one collection for all the edges, a plot call each is slow for big figures
+    segments = [(vertices[a], vertices[b]) for a, b in edges]
+    plt.gca().add_collection(LineCollection(segments, colors='r'))
+    plt.gca().autoscale_view()
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
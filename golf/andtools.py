@@ -7,8 +7,8 @@ import struct
 import subprocess
 import json
 import matplotlib.pyplot as plt
-import requests
 from shapely.geometry import LineString, Point, Polygon
+from aray.fetch import load_problem
 
 Coord = namedtuple('Coord', ['x', 'y'])
 Pair = namedtuple('Pair', ['ax', 'ay', 'bx', 'by'])
@@ -41,16 +41,8 @@ class Problem:
         return {"Authorization": "Bearer " + api_key}
 
     def get_problem(self) -> Dict:
-        ''' Download a problem JSON or load from cache '''
-        filepath = f'/tmp/{self.problem_number}.problem'
-        if not os.path.exists(filepath):
-            problem_url = f"https://poses.live/api/problems/{self.problem_number}"
-            r = requests.get(problem_url, headers=self.get_headers())
-            r.raise_for_status()
-            with open(filepath, 'w') as f:
-                json.dump(r.json(), f)
-        with open(filepath) as f:
-            return json.load(f)
+        ''' Load a problem JSON from the shared cache, downloading it on a miss '''
+        return load_problem(self.problem_number)
 
     def get_bound(self) -> Pair:
         ''' Get the bound of our solution xs and ys '''
@@ -7,9 +7,10 @@ import struct
 import subprocess
 import json
 import matplotlib.pyplot as plt
-import requests
 from ortools.sat.python.cp_model import CpModel, CpSolver, OPTIMAL, FEASIBLE
 from shapely.geometry import LineString, Point, Polygon
+from aray.fetch import load_problem, problem_path
+from aray.submit import Submission, submit_poses, FAILED
 
 Coord = namedtuple('Coord', ['x', 'y'])
 Pair = namedtuple('Pair', ['ax', 'ay', 'bx', 'by'])
@@ -45,16 +46,8 @@ class Problem:
         return {"Authorization": "Bearer " + api_key}
 
     def get_problem(self) -> Dict:
-        ''' Download a problem JSON or load from cache '''
-        filepath = f'/tmp/{self.problem_number}.problem'
-        if not os.path.exists(filepath):
-            problem_url = f"https://poses.live/api/problems/{self.problem_number}"
-            r = requests.get(problem_url, headers=self.get_headers())
-            r.raise_for_status()
-            with open(filepath, 'w') as f:
-                json.dump(r.json(), f)
-        with open(filepath) as f:
-            return json.load(f)
+        ''' Load a problem JSON from the shared cache, downloading it on a miss '''
+        return load_problem(self.problem_number)
 
     def get_bound(self) -> Pair:
         ''' Get the bound of our solution xs and ys '''
@@ -128,7 +121,7 @@ class Problem:
         assert self.forbidden is None, 'already loaded'
         filepath = f'/tmp/{self.problem_number}_forbidden_edges.bin'
         cmd = ['/home/aray/code/icfp2021/icfp2021/cc_gang/forbidden',
-                f'{self.problem_number}', f'/tmp/{self.problem_number}.problem']
+                f'{self.problem_number}', problem_path(self.problem_number)]
         print(f'running {cmd}')
         subprocess.check_call(cmd)
         assert os.path.exists(filepath)
@@ -174,12 +167,13 @@ class Problem:
             return True
         return False
 
-    def submit(self):
-        ''' Upload the submission '''
+    def submit(self) -> Submission:
+        ''' Upload the submission, rate limited and retried, without waiting for the score '''
         assert self.solution is not None
-        url = f'https://poses.live/api/problems/{self.problem_number}/solutions'
-        r = requests.post(url, headers=self.get_headers(), json=self.solution)
-        r.raise_for_status()
+        submission, = submit_poses([(self.problem_number, self.solution)], wait=False)
+        if submission.state == FAILED:
+            raise RuntimeError(f'Submitting problem {self.problem_number} failed: {submission.error}')
+        return submission
 
     def dislikes(self, solution=None) -> int:
         ''' Calculate the dislikes for a given solution '''
@@ -7,13 +7,24 @@ import struct
 import subprocess
 import json
 import matplotlib.pyplot as plt
-import requests
 from ortools.sat.python.cp_model import CpModel, CpSolver, OPTIMAL, FEASIBLE
 from shapely.geometry import LineString, Point, Polygon
+from aray.timing import Profile
+from aray.fetch import load_problem, problem_path
+from aray.submit import Submission, submit_poses, FAILED
+from aray.cpsat import Crossings
 
 Coord = namedtuple('Coord', ['x', 'y'])
 Pair = namedtuple('Pair', ['ax', 'ay', 'bx', 'by'])
 
+# Bonus kinds the model can be built to use
+GLOBALIST = 'GLOBALIST'
+SUPERFLEX = 'SUPERFLEX'
+WALLHACK = 'WALLHACK'
+BREAK_A_LEG = 'BREAK_A_LEG'
+# GLOBALIST deviations |d'/d - 1| are scaled by this and rounded up to integers
+DEVIATION_SCALE = 10 ** 9
+
 
 def dist(a: Coord, b: Coord) -> int:
     ''' Squared distance used in the problem '''
@@ -25,17 +36,25 @@ class Problem:
         self.problem_number = problem_number
         self.solution = None
         self.model = None
-        problem = self.get_problem()
+        self.profile = Profile('golf', problem_number)  # use as a context manager to emit
+        with self.profile.stage('load'):
+            problem = self.get_problem()
         self.hole = [Coord(x, y) for x, y in problem['hole']]
         self.vertices = [Coord(x, y) for x, y in problem['figure']['vertices']]
         self.edges = problem['figure']['edges']
         self.epsilon = problem['epsilon']
+        self.bonuses = problem.get('bonuses', [])  # bonuses this problem unlocks
+        self.bonus = None  # bonus the model uses, as in the pose JSON
         # Compute geometry
         self.bound = self.get_bound()
         self.poly = Polygon(self.hole)
-        self.points = self.get_points()
+        with self.profile.stage('lattice'):
+            self.points = self.get_points()
         self.edge_dists = [self.edge_dist(i) for i in range(len(self.edges))]
-        self.deltas = {d: self.get_deltas(d) for d in set(self.edge_dists)}
+        with self.profile.stage('rings'):
+            self.deltas = {d: self.get_deltas(d) for d in set(self.edge_dists)}
+        self.profile.count('points', len(self.points))
+        self.profile.count('deltas', sum(len(d) for d in self.deltas.values()))
         # If we're precomputing forbidden edges
         self.forbidden = None  # Will be map from delta -> forbidden
 
@@ -45,16 +64,8 @@ class Problem:
         return {"Authorization": "Bearer " + api_key}
 
     def get_problem(self) -> Dict:
-        ''' Download a problem JSON or load from cache '''
-        filepath = f'/tmp/{self.problem_number}.problem'
-        if not os.path.exists(filepath):
-            problem_url = f"https://poses.live/api/problems/{self.problem_number}"
-            r = requests.get(problem_url, headers=self.get_headers())
-            r.raise_for_status()
-            with open(filepath, 'w') as f:
-                json.dump(r.json(), f)
-        with open(filepath) as f:
-            return json.load(f)
+        ''' Load a problem JSON from the shared cache, downloading it on a miss '''
+        return load_problem(self.problem_number)
 
     def get_bound(self) -> Pair:
         ''' Get the bound of our solution xs and ys '''
@@ -75,34 +86,85 @@ class Problem:
         j, k = self.edges[i]
         return dist(self.vertices[j], self.vertices[k])
 
-    def get_deltas(self, d: int) -> List[Coord]:
-        ''' Get all valid delta x,y for a given distance and epsilon '''
-        n = int(d ** 0.5 + 1) * 2
+    def get_deltas(self, d: int, epsilon: Optional[int] = None) -> List[Coord]:
+        ''' Get all valid delta x,y for a given distance and epsilon (default the problem's) '''
+        if epsilon is None:
+            epsilon = self.epsilon
+        n = int((d * (1 + epsilon / 1e6)) ** 0.5) + 1
+        # no delta longer than the hole is any use
+        n = min(n, max(self.bound.bx - self.bound.ax, self.bound.by - self.bound.ay))
         deltas = []
         for x in range(-n, n + 1):
             for y in range(-n, n + 1):
-                if abs((x ** 2 + y ** 2) / d - 1) <= (self.epsilon / 1e6):
+                if abs((x ** 2 + y ** 2) / d - 1) <= (epsilon / 1e6):
                     deltas.append(Coord(x, y))
         return deltas
 
+    def get_deviation(self, delta: Coord, d: int) -> int:
+        ''' Get |d'/d - 1| for an edge delta, scaled by DEVIATION_SCALE and rounded up '''
+        return -(-DEVIATION_SCALE * abs(delta.x ** 2 + delta.y ** 2 - d) // d)
+
+    def get_model_edges(self) -> List[List[int]]:
+        ''' Get the edges of the model, with BREAK_A_LEG's edge split at a new vertex '''
+        edges = [list(e) for e in self.edges]
+        self.model_dists = list(self.edge_dists)
+        self.model_deltas = dict(self.deltas)
+        if self.bonus is not None and self.bonus['bonus'] == GLOBALIST:
+            # any one edge may take the whole budget, the linear sum does the rest
+            budget = len(self.edges) * self.epsilon
+            self.model_deltas = {d: self.get_deltas(d, budget) for d in self.deltas}
+        self.broken = None  # index of the broken edge
+        if self.bonus is not None and self.bonus['bonus'] == BREAK_A_LEG:
+            i, j = self.bonus['edge']
+            k = len(self.vertices)
+            self.broken = next(n for n, e in enumerate(edges) if set(e) == {i, j})
+            # the halves must be within epsilon of a quarter of the squared length
+            d = self.edge_dists[self.broken] / 4
+            edges[self.broken] = [i, k]
+            edges.append([k, j])
+            self.model_dists[self.broken] = d
+            self.model_dists.append(d)
+            if d not in self.model_deltas:
+                self.model_deltas[d] = self.get_deltas(d)
+        return edges
+
     def get_pose_vars(self) -> List[Coord]:
         ''' Get x, y pairs of our optimization variables '''
         pose = []
-        for i in range(len(self.vertices)):
+        self.out_vars = []
+        bound = self.bound
+        if self.bonus is not None and self.bonus['bonus'] == WALLHACK:
+            # let the vertex outside go as far as the longest edge reaches
+            m = int(max(self.edge_dists) ** 0.5 + 1)
+            bound = Pair(bound.ax - m, bound.ay - m, bound.bx + m, bound.by + m)
+        self.pose_bound = bound
+        num_vertices = len(self.vertices) + (self.broken is not None)
+        for i in range(num_vertices):
             # Optimization variables for x, y coordinates of pose vertices
-            xvar = self.model.NewIntVar(self.bound.ax, self.bound.bx, f'P{i}x')
-            yvar = self.model.NewIntVar(self.bound.ay, self.bound.by, f'P{i}y')
+            xvar = self.model.NewIntVar(bound.ax, bound.bx, f'P{i}x')
+            yvar = self.model.NewIntVar(bound.ay, bound.by, f'P{i}y')
             # Constrain pose points to be in set of valid points
-            self.model.AddAllowedAssignments([xvar, yvar], self.points)
+            constraint = self.model.AddAllowedAssignments([xvar, yvar], self.points)
+            if bound is not self.bound:
+                out = self.model.NewBoolVar(f'O{i}')
+                constraint.OnlyEnforceIf(out.Not())
+                self.out_vars.append(out)
 
             pose.append(Coord(xvar, yvar))
+        if self.out_vars:
+            self.model.AddAtMostOne(self.out_vars)
         return pose
 
     def get_edge_vars(self) -> List[Coord]:
         ''' Get the delta x, y variables we will use to constrain edges '''
-        dx, dy = self.bound.bx - self.bound.ax, self.bound.by - self.bound.ay
+        # under WALLHACK an edge may reach out to the widened pose bound
+        bound = self.pose_bound
+        dx, dy = bound.bx - bound.ax, bound.by - bound.ay
         edge_vars = []
-        for i, (j, k) in enumerate(self.edges):
+        self.flex_vars = []
+        deviation_vars = []
+        kind = self.bonus['bonus'] if self.bonus is not None else None
+        for i, (j, k) in enumerate(self.model_edges):
             # Optimization variables for pose edges (delta x, delta y)
             xvar = self.model.NewIntVar(-dx, dx, f'E{i}x')
             yvar = self.model.NewIntVar(-dy, dy, f'E{i}y')
@@ -111,17 +173,46 @@ class Problem:
             self.model.Add(xvar == b.x - a.x)
             self.model.Add(yvar == b.y - a.y)
             # Constrain edges to be in set of valid deltas for given distance
-            d = self.edge_dists[i]
-            self.model.AddAllowedAssignments([xvar, yvar], self.deltas[d])
+            d = self.model_dists[i]
+            if kind == GLOBALIST:
+                # table the scaled deviation alongside each delta, to sum up below
+                deltas = self.model_deltas[d]
+                table = [(x, y, self.get_deviation(Coord(x, y), d)) for x, y in deltas]
+                dvar = self.model.NewIntVar(0, max(t[2] for t in table), f'D{i}')
+                self.model.AddAllowedAssignments([xvar, yvar, dvar], table)
+                deviation_vars.append(dvar)
+                edge_vars.append(Coord(xvar, yvar))
+                continue
+            constraint = self.model.AddAllowedAssignments([xvar, yvar], self.model_deltas[d])
+            if kind == SUPERFLEX:
+                flex = self.model.NewBoolVar(f'F{i}')
+                constraint.OnlyEnforceIf(flex.Not())
+                self.flex_vars.append(flex)
 
             edge_vars.append(Coord(xvar, yvar))
+        if self.flex_vars:
+            self.model.AddAtMostOne(self.flex_vars)
+        if deviation_vars:
+            # sum |d'/d - 1| <= len(edges) * epsilon / 1e6, scaled to integers
+            budget = len(self.edges) * self.epsilon * DEVIATION_SCALE // 1_000_000
+            self.model.Add(sum(deviation_vars) <= budget)
         return edge_vars
 
-    def build_model(self):
-        ''' Initial construction of our constraints '''
-        self.model = CpModel()
-        self.pose_vars = self.get_pose_vars()
-        self.edge_vars = self.get_edge_vars()
+    def build_model(self, bonus: Optional[Dict] = None):
+        ''' Initial construction of our constraints
+
+        bonus is as in the pose JSON, e.g. {'bonus': 'SUPERFLEX', 'problem': 35},
+        with an 'edge' for BREAK_A_LEG.
+        '''
+        assert bonus is None or bonus['bonus'] in (GLOBALIST, SUPERFLEX, WALLHACK, BREAK_A_LEG), bonus
+        self.bonus = bonus
+        with self.profile.stage('model'):
+            self.model = CpModel()
+            self.model_edges = self.get_model_edges()
+            self.pose_vars = self.get_pose_vars()
+            self.edge_vars = self.get_edge_vars()
+        if bonus is not None:
+            self.profile.info['bonus'] = bonus['bonus']
 
     def constrain_zero(self):
         ''' Constrain to zero-dislikes solutions '''
@@ -138,6 +229,8 @@ class Problem:
     def constrain_translate(self):
         ''' Constrain solution to be a translation of original pose '''
         for i, (j, k) in enumerate(self.edges):
+            if i == self.broken:
+                continue
             a, b = self.vertices[j], self.vertices[k]
             xvar, yvar = self.edge_vars[i]
             self.model.Add(xvar == b.x - a.x)
@@ -146,6 +239,8 @@ class Problem:
     def hint_translate(self):
         ''' Hint the solution should be a translation of original pose '''
         for i, (j, k) in enumerate(self.edges):
+            if i == self.broken:
+                continue
             a, b = self.vertices[j], self.vertices[k]
             xvar, yvar = self.edge_vars[i]
             self.model.AddHint(xvar, b.x - a.x)
@@ -154,10 +249,16 @@ class Problem:
     def load_forbidden(self):
         ''' Load precomputed forbidden edges '''
         assert self.forbidden is None, 'already loaded'
+        with self.profile.stage('forbidden'):
+            self.forbidden = self.read_forbidden()
+        self.profile.count('forbidden_pairs', sum(len(f) for f in self.forbidden.values()) // 2)
+
+    def read_forbidden(self) -> Dict[Coord, List[Pair]]:
+        ''' Read the forbidden edges, computing them first if needed, as a map from delta -> pairs '''
         filepath = f'/tmp/{self.problem_number}_forbidden_edges.bin'
         if not os.path.exists(filepath):
             cmd = ['/home/aray/code/icfp2021/icfp2021/cc_gang/forbidden',
-                   f'{self.problem_number}', f'/tmp/{self.problem_number}.problem']
+                   f'{self.problem_number}', problem_path(self.problem_number)]
             print(f'running {cmd}')
             subprocess.check_call(cmd)
         assert os.path.exists(filepath)
@@ -176,18 +277,40 @@ class Problem:
             pair = Pair(bx, by, ax, ay)
             delta = Coord(ax - bx, ay - by)
             forbidden[delta].append(pair)
-        self.forbidden = forbidden
+        return forbidden
 
     def constrain_forbidden(self):
         ''' Constrain edges to not be in forbidden set '''
         self.load_forbidden()
-        for i, (j, k) in enumerate(self.edges):
+        with self.profile.stage('model'):
+            self.add_forbidden()
+
+    def add_forbidden(self):
+        ''' Add the loaded forbidden edges to the model '''
+        for i, (j, k) in enumerate(self.model_edges):
             a, b = self.pose_vars[j], self.pose_vars[k]
             vars = [a.x, a.y, b.x, b.y]
             forbidden = []
-            for delta in self.deltas[self.edge_dists[i]]:
+            for delta in self.model_deltas[self.model_dists[i]]:
                 forbidden.extend(self.forbidden[delta])
-            self.model.AddForbiddenAssignments(vars, forbidden)
+            constraint = self.model.AddForbiddenAssignments(vars, forbidden)
+            if self.out_vars:
+                # WALLHACK lets the outside vertex's edges leave the hole
+                constraint.OnlyEnforceIf([self.out_vars[j].Not(), self.out_vars[k].Not()])
+
+    def constrain_crossings(self):
+        ''' Constrain edges to not cross the hole's pocket edges, without precomputed tables
+
+        Much smaller than constrain_forbidden on big holes; edges leaving
+        through a hole vertex are left to the cuts of valid_solution.
+        '''
+        with self.profile.stage('model'):
+            crossings = Crossings(self.model, self.hole, self.pose_vars, self.pose_bound)
+            for j, k in self.model_edges:
+                enforce = [self.out_vars[j].Not(), self.out_vars[k].Not()] if self.out_vars else ()
+                crossings.add(j, k, enforce)
+        self.profile.count('pocket_edges', len(crossings.edges))
+        self.profile.count('products', crossings.products)
 
     def valid_edge(self, a: Coord, b: Coord) -> bool:
         ''' Returns True if this is a valid edge, else False '''
@@ -203,19 +326,29 @@ class Problem:
     def valid_solution(self) -> bool:
         ''' Return True if solution is invalid, otherwise False and add constraints '''
         vertices = [Coord(*p) for p in self.solution['vertices']]
+        outside = {i for i, v in enumerate(self.out_vars) if self.solver.Value(v)}
         valid = True
-        for i, (j, k) in enumerate(self.edges):
+        for i, (j, k) in enumerate(self.model_edges):
+            if j in outside or k in outside:
+                continue
             a, b = vertices[j], vertices[k]
             if not self.valid_edge(a, b):
                 u, v = self.pose_vars[j], self.pose_vars[k]
-                self.model.AddForbiddenAssignments(
+                constraint = self.model.AddForbiddenAssignments(
                     [u.x, u.y, v.x, v.y], [(a.x, a.y, b.x, b.y)])
+                if self.out_vars:
+                    constraint.OnlyEnforceIf([self.out_vars[j].Not(), self.out_vars[k].Not()])
                 valid = False
         return valid
 
     def solve_iter(self) -> bool:
         ''' Do a single round of solving/validating, return True if solution is valid '''
-        status = self.solver.Solve(self.model)
+        with self.profile.stage('search'):
+            status = self.solver.Solve(self.model)
+        # CP-SAT's presolve is inside its wall time; branches and conflicts are its search
+        self.profile.count('solves')
+        self.profile.count('branches', self.solver.NumBranches())
+        self.profile.count('conflicts', self.solver.NumConflicts())
         if status not in (FEASIBLE, OPTIMAL):
             print('Failed to find SAT, status:',
                   self.solver.StatusName(status))
@@ -223,7 +356,10 @@ class Problem:
         vertices = [(self.solver.Value(p.x), self.solver.Value(p.y))
                     for p in self.pose_vars]
         self.solution = {'vertices': vertices}
-        return self.valid_solution()
+        if self.bonus is not None:
+            self.solution['bonuses'] = [self.bonus]
+        with self.profile.stage('validate'):
+            return self.valid_solution()
 
     def solve(self, max_tries=10, plot=False, timeout=100.0) -> bool:
         ''' Get a solution '''
@@ -252,19 +388,20 @@ class Problem:
         # Plot our solution if we have one
         if self.solution is not None:
             vert = [Coord(*p) for p in self.solution['vertices']]
-            for i, j in self.edges:
+            for i, j in self.model_edges:
                 a, b = vert[i], vert[j]
                 color = 'g-' if self.valid_edge(a, b) else 'r-'
                 ax.plot([a.x, b.x], [a.y, b.y], color)
         ax.invert_yaxis()  # Flip since the problem renderings use inverted y
         plt.show()
 
-    def submit(self):
-        ''' Upload the submission '''
+    def submit(self) -> Submission:
+        ''' Upload the submission, rate limited and retried, without waiting for the score '''
         assert self.solution is not None
-        url = f'https://poses.live/api/problems/{self.problem_number}/solutions'
-        r = requests.post(url, headers=self.get_headers(), json=self.solution)
-        r.raise_for_status()
+        submission, = submit_poses([(self.problem_number, self.solution)], wait=False)
+        if submission.state == FAILED:
+            raise RuntimeError(f'Submitting problem {self.problem_number} failed: {submission.error}')
+        return submission
 
     def dislikes(self, solution=None) -> int:
         ''' Calculate the dislikes for a given solution '''
@@ -276,12 +413,14 @@ if __name__ == '__main__':
     for problem_number in range(2,132):
         print('Loading problem', problem_number)
         problem = Problem(problem_number)
-        print('Building model')
-        problem.build_model()
-        print('Adding forbidden edge constraints')
-        problem.constrain_forbidden()
-        print('Solving')
-        if problem.solve(max_tries=1, timeout=1000.0):
-            print('Submitting, expect score:', problem.dislikes())
-            problem.submit()
+        # emits a timing record per problem when ARAY_PROFILE names a file
+        with problem.profile:
+            print('Building model')
+            problem.build_model()
+            print('Adding forbidden edge constraints')
+            problem.constrain_forbidden()
+            print('Solving')
+            if problem.solve(max_tries=1, timeout=1000.0):
+                print('Submitting, expect score:', problem.dislikes())
+                problem.submit()
         print('Finished')
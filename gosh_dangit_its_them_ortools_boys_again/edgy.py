@@ -12,6 +12,9 @@ from aray.stretch import slow_stretch
 from aray.dislike import dislikes
 from aray.util import dist
 from aray.forbidden import get_forbidden
+from aray.match import HoleMatcher, bit_indexes
+from aray.timing import Profile, stage, count
+from aray.store import ResultStore
 from ortools.sat.python import cp_model
 
 
@@ -55,8 +58,61 @@ class VarArraySolutionPrinter(cp_model.CpSolverSolutionCallback):
         return self._best_solution, self._least_dislike
 
 
-def get_solution(problem_number, timeout_seconds=100.0, constraints=-1, get_all=False):
-
+def save_solution(problem, problem_number, vertices):
+    """Add a solution to the results store, which checks and scores it."""
+    with ResultStore() as store:
+        result = store.add(problem_number, Pose([Point(*v) for v in vertices]), 'cpsolver3', problem)
+    print('saved', result.problem, result.dislikes, 'valid' if result.valid else 'INVALID')
+
+
+def add_pins(model, problem, pose, domains):
+    """Require each hole vertex to be covered by a figure vertex its domain allows.
+
+    Returns the map (figure vertex index, hole point) -> literal of the pins made.
+    """
+    pins = {}
+    for i, h in enumerate(problem.hole):
+        vars = []
+        for j in bit_indexes(domains[i]):
+            p = pose[j]
+            var = model.NewBoolVar(f'H{i}_{j}')
+            model.Add(p.x == h.x).OnlyEnforceIf(var)
+            model.Add(p.y == h.y).OnlyEnforceIf(var)
+            pins[j, h] = var
+            vars.append(var)
+        model.AddBoolOr(vars)
+    return pins
+
+
+def solve_pinned(model, solver, matcher, domains, pins, depth):
+    """Try the matcher's partial assignments one at a time as assumptions.
+
+    The matches are searched from the same domains the pins were made from,
+    so every pin a match asks for exists. Returns the status of the first
+    feasible solve, or None if no match was feasible.
+    """
+    for match in matcher.matches(depth, domains):
+        model.ClearAssumptions()
+        model.AddAssumptions([pins[j, h] for j, h in match.items()])
+        with stage('search'):
+            status = solver.Solve(model)
+        count('pins_tried')
+        print('pins', match, 'status', solver.StatusName(status))
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return status
+    return None
+
+
+def get_solution(problem_number, timeout_seconds=100.0, constraints=-1, get_all=False,
+                 match_depth=None, pin_timeout=10.0, profile=None):
+    """Solve a problem, appending a timing record to the profile file if given."""
+    with Profile('edgy', problem_number, profile, constraints=constraints,
+                 match_depth=match_depth) as run:
+        return solve(run, problem_number, timeout_seconds, constraints, get_all,
+                     match_depth, pin_timeout)
+
+
+def solve(run, problem_number, timeout_seconds, constraints, get_all, match_depth, pin_timeout):
     model = cp_model.CpModel()
 
     problem = Problem.get(problem_number)
@@ -72,51 +128,53 @@ def get_solution(problem_number, timeout_seconds=100.0, constraints=-1, get_all=
     print('xmin', xmin, 'xmax', xmax, 'ymin',
           ymin, 'ymax', ymax, 'dx', dx, 'dy', dy)
 
-    pose = []
-    for i, v in enumerate(problem.vertices):
-        xvar = model.NewIntVar(xmin, xmax, 'V%i_x' % i)
-        yvar = model.NewIntVar(ymin, ymax, 'V%i_y' % i)
-        pose.append(Point(xvar, yvar))
-        # Add constraint that vertex is inside placement
-        model.AddAllowedAssignments([xvar, yvar], placement)
-    assert len(pose) == len(problem.vertices)
-
-    edges = []
-    for i, (a, b) in enumerate(problem.edges):
-        xvar = model.NewIntVar(-dx, dx, 'E%i_dx' % i)
-        yvar = model.NewIntVar(-dy, dy, 'E%i_dy' % i)
-        edges.append(Point(xvar, yvar))  # since we reference with .x and .y
-        # Add constraints that dx = u.x - v.x and dy = u.y - v.y
-        model.Add(xvar == pose[a].x - pose[b].x)
-        model.Add(yvar == pose[a].y - pose[b].y)
-        # Add contraints that the deltas must be in a given set
-        Pa, Pb = problem.vertices[a], problem.vertices[b]
-        circle = sorted((p.x, p.y) for p in slow_stretch(Pa, Pb, epsilon))
-        model.AddAllowedAssignments([xvar, yvar], circle)
-    assert len(edges) == len(problem.edges)
+    with stage('model'):
+        pose = []
+        for i, v in enumerate(problem.vertices):
+            xvar = model.NewIntVar(xmin, xmax, 'V%i_x' % i)
+            yvar = model.NewIntVar(ymin, ymax, 'V%i_y' % i)
+            pose.append(Point(xvar, yvar))
+            # Add constraint that vertex is inside placement
+            model.AddAllowedAssignments([xvar, yvar], placement)
+        assert len(pose) == len(problem.vertices)
+
+        edges = []
+        for i, (a, b) in enumerate(problem.edges):
+            xvar = model.NewIntVar(-dx, dx, 'E%i_dx' % i)
+            yvar = model.NewIntVar(-dy, dy, 'E%i_dy' % i)
+            edges.append(Point(xvar, yvar))  # since we reference with .x and .y
+            # Add constraints that dx = u.x - v.x and dy = u.y - v.y
+            model.Add(xvar == pose[a].x - pose[b].x)
+            model.Add(yvar == pose[a].y - pose[b].y)
+            # Add contraints that the deltas must be in a given set
+            Pa, Pb = problem.vertices[a], problem.vertices[b]
+            circle = sorted((p.x, p.y) for p in slow_stretch(Pa, Pb, epsilon))
+            model.AddAllowedAssignments([xvar, yvar], circle)
+        assert len(edges) == len(problem.edges)
 
     print('getting forbidden edges')
     forbidden_edges = get_forbidden(problem_number)
     print('got forbidden edges')
     assert len(forbidden_edges) == len(
         edges), f'{len(forbidden_edges)} {len(edges)}'
-    for f, (a, b) in zip(forbidden_edges, problem.edges):
-        vars = [pose[a].x, pose[a].y, pose[b].x, pose[b].y]
-        forbid = set()
-        for (ax, ay), (bx, by) in f:
-            forbid.add((ax, ay, bx, by))
-            forbid.add((bx, by, ax, ay))
-        model.AddForbiddenAssignments(vars, sorted(forbid))
-
+    with stage('model'):
+        for f, (a, b) in zip(forbidden_edges, problem.edges):
+            vars = [pose[a].x, pose[a].y, pose[b].x, pose[b].y]
+            forbid = set()
+            for (ax, ay), (bx, by) in f:
+                forbid.add((ax, ay, bx, by))
+                forbid.add((bx, by, ax, ay))
+            model.AddForbiddenAssignments(vars, sorted(forbid))
+
+    matcher = None
+    pins = {}  # map (figure vertex index, hole point) -> literal
     if constraints == 0:
-        for i, h in enumerate(problem.hole):
-            vars = []
-            for j, p in enumerate(pose):
-                var = model.NewBoolVar(f'H{i}_{j}')
-                model.Add(p.x == h.x).OnlyEnforceIf(var)
-                model.Add(p.y == h.y).OnlyEnforceIf(var)
-                vars.append(var)
-            model.AddBoolOr(vars)
+        # only the figure vertices the matcher says each hole vertex could take
+        with stage('match'):
+            matcher = HoleMatcher(problem)
+            domains = matcher.root_domains()
+        print('hole vertex candidates', [d.bit_count() for d in domains])
+        pins = add_pins(model, problem, pose, domains)
     elif constraints > 0:
         hole_vars = []
         for i, h in enumerate(problem.hole):
@@ -143,8 +201,12 @@ def get_solution(problem_number, timeout_seconds=100.0, constraints=-1, get_all=
     if get_all:
         pose_vertices = {i: (p.x, p.y) for i, p in enumerate(pose)}
         solution_printer = VarArraySolutionPrinter(pose_vertices, problem.hole)
-        status = solver.SearchForAllSolutions(model, solution_printer)
+        with stage('search'):
+            status = solver.SearchForAllSolutions(model, solution_printer)
+        count('branches', solver.NumBranches())
+        count('conflicts', solver.NumConflicts())
         best, score = solution_printer.best_solution()
+        run.info['dislikes'] = score
         assert score is not None, "failed to find a solution"
         print('got best', best)
         print('got best_score', score)
@@ -153,24 +215,25 @@ def get_solution(problem_number, timeout_seconds=100.0, constraints=-1, get_all=
         # score = dislikes(problem.hole, vertices)
         # assert score == best_score
         print('score', score)
-        # def dislikes(hole: List[Point], points: List[Point]) -> int:
-        filename = f'/tmp/{problem_number}-{score}-cpsolver3.json'
-        with open(filename, 'w') as f:
-            data = dict(vertices=vertices)
-            json.dump(data, f)
-        print('saved', filename)
+        save_solution(problem, problem_number, vertices)
     else:
-        status = solver.Solve(model)
+        if matcher is not None and match_depth is not None:
+            solver.parameters.max_time_in_seconds = pin_timeout
+            status = solve_pinned(model, solver, matcher, domains, pins, match_depth)
+            if status is None:
+                print('no pins left', matcher.stats)
+                return
+        else:
+            with stage('search'):
+                status = solver.Solve(model)
         print('got status', status)
+        count('branches', solver.NumBranches())
+        count('conflicts', solver.NumConflicts())
         vertices = [Point(solver.Value(v.x), solver.Value(v.y)) for v in pose]
         score = dislikes(problem.hole, vertices)
+        run.info['dislikes'] = score
         print('score', score)
-        # def dislikes(hole: List[Point], points: List[Point]) -> int:
-        filename = f'/tmp/{problem_number}-{score}-cpsolver3.json'
-        with open(filename, 'w') as f:
-            data = dict(vertices=vertices)
-            json.dump(data, f)
-        print('saved', filename)
+        save_solution(problem, problem_number, vertices)
 
 
 if __name__ == '__main__':
@@ -180,6 +243,12 @@ if __name__ == '__main__':
     parser.add_argument('-t', '--timeout', type=float, default=1000.0)
     parser.add_argument('-c', '--constraints', type=int, default=-1)
     parser.add_argument('-a', '--get_all', action='store_true')
+    parser.add_argument('-m', '--match_depth', type=int, default=None,
+                        help='with -c 0, pin this many hole vertices at a time')
+    parser.add_argument('-p', '--pin_timeout', type=float, default=10.0)
+    parser.add_argument('--profile', default=None,
+                        help='append a JSON record of where the time went to this file')
     args = parser.parse_args()
     get_solution(args.problem_number, args.timeout,
-                 args.constraints, args.get_all)
+                 args.constraints, args.get_all, args.match_depth, args.pin_timeout,
+                 args.profile)
@@ -0,0 +1,42 @@
+from ortools.sat.python import cp_model
+
+from aray.types import Point
+from aray.problem import Problem
+from aray.match import HoleMatcher
+from edgy import add_pins, solve_pinned
+
+
+def pinned_model(problem, domains):
+    """A pose model of problem with only the hole vertex pins, no edge constraints."""
+    xs, ys = [h.x for h in problem.hole], [h.y for h in problem.hole]
+    model = cp_model.CpModel()
+    pose = [Point(model.NewIntVar(min(xs), max(xs), f'V{i}_x'), model.NewIntVar(min(ys), max(ys), f'V{i}_y'))
+            for i in range(len(problem.vertices))]
+    return model, pose, add_pins(model, problem, pose, domains)
+
+
+def test_solve_pinned_uses_pinned_domains():
+    """Every match tried as pins has literals, even where the root domains rule vertices out."""
+    problem = Problem.get(11)
+    matcher = HoleMatcher(problem)
+    domains = matcher.root_domains()
+    assert any(d != matcher.full for d in domains)
+    model, pose, pins = pinned_model(problem, domains)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 10.0
+    for depth in range(1, len(problem.hole) + 1):
+        status = solve_pinned(model, solver, matcher, domains, pins, depth)
+        assert status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+
+def test_solve_pinned_tries_every_match():
+    """With no feasible pins, every match is tried and None comes back."""
+    problem = Problem.get(11)
+    matcher = HoleMatcher(problem)
+    domains = matcher.root_domains()
+    model, pose, pins = pinned_model(problem, domains)
+    model.Add(pose[0].x != pose[0].x)
+    for depth in range(1, len(problem.hole) + 1):
+        before = matcher.stats.matches
+        assert solve_pinned(model, cp_model.CpSolver(), matcher, domains, pins, depth) is None
+        assert matcher.stats.matches > before
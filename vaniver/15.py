@@ -5,6 +5,9 @@ import matplotlib.pyplot as plt
 import os
 import time
 
+from aray.problem import Problem
+from aray.match import hole_matches
+
 def dist(a, b):
     return (a[0]-b[0])**2 + (a[1]-b[1])**2
 
@@ -69,14 +72,14 @@ def check_edge_dists(guess_pos, edge_dists, p):
     return any([g < ed[0] or g > ed[1] if g > 0 else False for g, ed in zip(guess_ed, edge_dists)])
 
 best_sol = 9999999
-things_to_try = itertools.permutations(range(len(p["figure"]["vertices"])))
-lenph = len(p["hole"])
+# maps of figure vertex -> hole vertex whose pairwise distances the edges allow
+things_to_try = hole_matches(Problem.get(15))
 tried = 0
 # plot_hole(p["hole"])
 # plot_figure(p["figure"]["edges"], p["figure"]["vertices"])
 # plt.show()
-for guess in things_to_try:
-    guess_pos = [p["hole"][g] if g < lenph else [-1, -1] for g in guess]
+for pins in things_to_try:
+    guess_pos = [list(pins[i]) if i in pins else [-1, -1] for i in range(len(p["figure"]["vertices"]))]
     if check_edge_dists(guess_pos, edge_dists, p):
         continue
     tried += 1
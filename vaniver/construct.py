@@ -1,6 +1,8 @@
+import heapq
 import itertools
 import json
 import math
+import multiprocessing
 import os
 import random
 import sys
@@ -10,8 +12,15 @@ from matplotlib.colors import to_hex
 from shapely.geometry import Point, Polygon
 
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import numpy as np
 
+from aray.timing import Profile, stage, count
+from aray.observe import Observer, LiveView
+from aray.ordering import nearest_to_matched
+from aray.types import Point as LatticePoint
+from aray.valid import edge_in_hole, edges_in_hole
+
 PROBLEM_FILEDIR = "problems"
 SOLUTION_FILEDIR = "solutions"
 
@@ -35,18 +44,17 @@ def plot_hole(hole):
     plt.plot(xs,ys,c='b')
 
 def plot_figure(edges, vertices):
-    for edge in edges:
-        a = vertices[edge[0]]
-        b = vertices[edge[1]]
-        xs, ys = zip(a,b)
-        plt.plot(xs, ys,c='r')
+    # one collection for all the edges, a plot call each is slow for big figures
+    segments = [(vertices[a], vertices[b]) for a, b in edges]
+    plt.gca().add_collection(LineCollection(segments, colors='r'))
+    plt.gca().autoscale_view()
 
 class problem():
-    def __init__(self, number):
+    def __init__(self, number, globalist=False):
         json_state = json.load(open(os.path.join(PROBLEM_FILEDIR, str(number) + ".json")))
         self.number = number
         self.hole = hole(json_state["hole"])
-        self.figure = figure(json_state)
+        self.figure = figure(json_state, globalist)
 
 class hole():
     def __init__(self, vertices):
@@ -55,14 +63,17 @@ class hole():
         self.vertex_cycle = self.vertices + [self.vertices[0]]
         self.edges = list(zip(self.vertex_cycle[:-1], self.vertex_cycle[1:]))
         self.polygon = Polygon(self.vertices)
+        self.vertex_set = set(map(tuple, self.vertices))
+        self.points = [LatticePoint(x, y) for x, y in self.vertices]
         self.inside_set = set()
         self.dist_dict = {}
         xs, ys = zip(*self.vertices)
-        for x in range(min(xs), max(xs)+1):
-            for y in range(min(ys), max(ys)+1):
-                if self.polygon.covers(Point(x,y)):
-                    self.inside_set.add((x,y))
-                    self.dist_dict[x,y] = [dist((x,y), v) for v in self.vertices]
+        with stage("lattice"):
+            for x in range(min(xs), max(xs)+1):
+                for y in range(min(ys), max(ys)+1):
+                    if self.polygon.covers(Point(x,y)):
+                        self.inside_set.add((x,y))
+                        self.dist_dict[x,y] = np.array([dist((x,y), v) for v in self.vertices], dtype=np.int32)
 
     def inside(self, point):
         """Checks if point is inside the hole."""
@@ -80,20 +91,30 @@ class hole():
         plt.plot(xs,ys,c='b')
 
 class figure():
-    def __init__(self, problem):
+    def __init__(self, problem, globalist=False):
+        """With globalist, edges share one budget of sum(|d'/d - 1|) <= num_edges * epsilon instead of
+        each being within epsilon, so any one edge may stretch by as much as the whole budget."""
         self.edges = [(min(a,b), max(a,b)) for (a,b) in problem["figure"]["edges"]]
         orig_vertices = problem["figure"]["vertices"]
+        self.budget = len(self.edges) * problem["epsilon"]/1000000.0 if globalist else None
+        slack = problem["epsilon"]/1000000.0 if self.budget is None else self.budget
+        self.orig_dists = []
         self.edge_dists = []
         for edge in self.edges:
             edge_dist = dist(orig_vertices[edge[0]], orig_vertices[edge[1]])
-            self.edge_dists.append([edge_dist * (1 - problem["epsilon"]/1000000.0), edge_dist * (1 + problem["epsilon"]/1000000.0)])
+            self.orig_dists.append(edge_dist)
+            self.edge_dists.append([max(edge_dist * (1 - slack), 0), edge_dist * (1 + slack)])
         self.hole = hole(problem["hole"])
-        self.build_adjacency()
+        with stage("rings"):
+            self.build_adjacency()
         self.num_vertices = len(self.adjacency)
+        self.ordering = order_lowest_index
 
     def build_adjacency(self):
         self.adjacency = {}
+        self.adj_masks = {}
         self.adj_dists = {}
+        self.adj_orig = {}
         self.adj_vecs = {}
         for edge_ind, edge in enumerate(self.edges):
             if edge[0] in self.adjacency:
@@ -106,13 +127,17 @@ class figure():
                 self.adjacency[edge[1]] = [edge[0]]
             self.adj_dists[edge[0],edge[1]] = self.edge_dists[edge_ind]
             self.adj_dists[edge[1],edge[0]] = self.edge_dists[edge_ind]
+            self.adj_orig[edge[0],edge[1]] = self.orig_dists[edge_ind]
+            self.adj_orig[edge[1],edge[0]] = self.orig_dists[edge_ind]
             self.adj_vecs[edge[0],edge[1]] = ring_options((0,0), *self.edge_dists[edge_ind])
             self.adj_vecs[edge[1],edge[0]] = self.adj_vecs[edge[0],edge[1]]
+            self.adj_masks[edge[0]] = self.adj_masks.get(edge[0], 0) | 1 << edge[1]
+            self.adj_masks[edge[1]] = self.adj_masks.get(edge[1], 0) | 1 << edge[0]
 
-    def begin_search(self, best_sol = None):
+    def begin_search(self, best_sol = None, beam_width = None, max_candidates = None, observer = None):
         """Begin the search for a solution. If passed best_sol, will return the first solution at least that good."""
         initial_candidates = [partial_figure(self, vertex_index, hole_index) for hole_index in range(self.hole.num_vertices) for vertex_index in range(self.num_vertices)]
-        result = search(initial_candidates, target=best_sol).run()
+        result = search(initial_candidates, target=best_sol, beam_width=beam_width, max_candidates=max_candidates, observer=observer).run()
                 # if v_result is None:
                 #     continue
                 # if best_sol is not None:
@@ -128,19 +153,45 @@ class figure():
         print("result", result)
         return result
 
+    def begin_parallel_search(self, best_sol = None, processes = None, seeds_per_task = 1, beam_width = None, max_candidates = None, max_steps = None):
+        """Run an independent search per group of seeds in a process pool, sharing the best dislikes found.
+
+        Workers stop as soon as any of them finds a figure with at most best_sol dislikes."""
+        seeds = [(vertex_index, hole_index) for hole_index in range(self.hole.num_vertices) for vertex_index in range(self.num_vertices)]
+        tasks = [seeds[i:i + seeds_per_task] for i in range(0, len(seeds), seeds_per_task)]
+        best = multiprocessing.Value('q', 2**62)
+        stop = multiprocessing.Event()
+        result = None
+        with multiprocessing.Pool(processes, initializer=init_seed_worker, initargs=(self, best, stop, best_sol, beam_width, max_candidates, max_steps)) as pool:
+            for found in pool.imap_unordered(seed_search, tasks):
+                if found is not None and (result is None or found[0] < result.sum_dislikes):
+                    result = partial_figure.from_vertices(self, found[1])
+                    print("found", result.sum_dislikes)
+                if stop.is_set():
+                    pool.terminate()
+                    break
+        print("result", result)
+        return result
+
+
+seed_worker = {}  # per-process state for seed_search, filled in by init_seed_worker
+
 
-def check_line_intersection(line1, line2):
-    """Given two line segments (each defined by two (x,y) pairs), return true if the two segments intersect and false if they do not."""
-    x1, y1 = line1[0]
-    x2, y2 = line1[1]
-    x3, y3 = line2[0]
-    x4, y4 = line2[1]
-    denom = (x1-x2)*(y3-y4) - (y1-y2)*(x3-x4)
-    if denom == 0:
-        return False
-    ua = ((x1*y2 - y1*x2) * (x3-x4) - (x1-x2) * (x3*y4 - y3*x4)) / denom
-    ub = ((x1*y2 - y1*x2) * (y3-y4) - (y1-y2) * (x3*y4 - y3*x4)) / denom
-    return 0 <= ua <= 1 and 0 <= ub <= 1
+def init_seed_worker(figure, best, stop, target, beam_width, max_candidates, max_steps):
+    seed_worker.update(figure=figure, best=best, stop=stop, target=target, beam_width=beam_width, max_candidates=max_candidates, max_steps=max_steps)
+
+
+def seed_search(seeds):
+    """Search from a group of (vertex_index, hole_index) seeds; return (sum_dislikes, vertices) if it beat the shared best."""
+    w = seed_worker
+    if w["stop"].is_set():
+        return None
+    initial_candidates = [partial_figure(w["figure"], vertex_index, hole_index) for vertex_index, hole_index in seeds]
+    result = search(initial_candidates, target=w["target"], beam_width=w["beam_width"], max_candidates=w["max_candidates"],
+                    best=w["best"], stop=w["stop"], verbose=False).run(w["max_steps"])
+    if result is None or result.sum_dislikes > w["best"].value:
+        return None
+    return result.sum_dislikes, result.vertices
 
 
 def ring_intersection(hole, ca, cb, ed_a, ed_b):
@@ -172,7 +223,7 @@ def ring_intersection(hole, ca, cb, ed_a, ed_b):
 
 def ring_quad_options(r1, r2):
     """Given two squared radii, yield all integer lattice points in the first quadrant of that ring."""
-    for x in range(math.floor(math.sqrt(r2))):
+    for x in range(math.floor(math.sqrt(r2)) + 1):  # inclusive, so on-axis deltas like (10, 0) are in
         if x ** 2 > r1:
             min_y1 = 0
         else:
@@ -197,70 +248,171 @@ def ring_options(center, r1, r2):
     return set(result)
 
 
+def mask_indices(mask):
+    """Return the indices of the set bits of mask, lowest first."""
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
+
+
+def order_lowest_index(partial):
+    """Extend the lowest numbered vertex waiting in to_extend."""
+    return (partial.to_extend & -partial.to_extend).bit_length() - 1
+
+
+def order_most_placed(partial):
+    """Extend the vertex with the most placed neighbours, since its options are the most constrained."""
+    return max(mask_indices(partial.to_extend), key=lambda v: ((partial.figure.adj_masks[v] & partial.placed).bit_count(), -v))
+
+
+def order_smallest_domain(partial):
+    """Extend the vertex with the fewest options left (fail first)."""
+    return min(mask_indices(partial.to_extend), key=lambda v: (len(partial.options(v)), v))
+
+
+def order_highest_degree(partial):
+    """Extend the vertex with the most edges, since it constrains the most of the rest of the figure."""
+    return max(mask_indices(partial.to_extend), key=lambda v: (len(partial.figure.adjacency[v]), -v))
+
+
+def order_hole_bfs(partial):
+    """Extend the vertex fewest hops from a vertex sitting on a hole vertex, growing out from the matches.
+    The same rule as aray.ordering.hole_bfs, falling back to the highest degree vertex before any match."""
+    vertices = partial.vertices
+    matched = [i for i, v in enumerate(vertices) if v in partial.figure.hole.vertex_set]
+    return nearest_to_matched(mask_indices(partial.to_extend), matched, partial.figure.adjacency)
+
+
+ORDERINGS = {
+    "lowest_index": order_lowest_index,
+    "most_placed": order_most_placed,
+    "smallest_domain": order_smallest_domain,
+    "highest_degree": order_highest_degree,
+    "hole_bfs": order_hole_bfs,
+}
+
+
 class partial_figure():
-    def __init__(self, figure, vertex_index = None, hole_index = None, to_plot = False):
+    __slots__ = ("figure", "coords", "placed", "extended", "to_extend", "dislikes", "sum_dislikes", "stretch")
+
+    def __init__(self, figure, vertex_index = None, hole_index = None):
+        """A partial placement of the figure. Vertex sets are bitmasks over vertex indices, coords
+        is an int16 (num_vertices, 2) array and dislikes an int32 array over hole vertices.
+        stretch is the sum of |d'/d - 1| over placed edges, spent from the globalist budget."""
         self.figure = figure
-        self.adjacency = figure.adjacency
-        self.adj_dists = figure.adj_dists
-        self.vertices = [(None, None) for _ in range(self.figure.num_vertices)]
-        self.to_extend = set()
-        self.extended = set()
-        self.dislikes = [9999999 for _ in range(self.figure.hole.num_vertices)]
+        self.coords = np.zeros((figure.num_vertices, 2), dtype=np.int16)
+        self.placed = 0
+        self.extended = 0
+        self.to_extend = 0
+        self.dislikes = np.full(figure.hole.num_vertices, 9999999, dtype=np.int32)
+        self.sum_dislikes = int(self.dislikes.sum())
+        self.stretch = 0.0
         if vertex_index is not None and hole_index is not None:
             self.begin(vertex_index, hole_index)
-        self.plot = to_plot
+
+    @classmethod
+    def from_vertices(cls, figure, vertices):
+        """Return a complete partial figure with every vertex placed at vertices."""
+        novel = cls(figure)
+        novel.coords[:] = vertices
+        novel.placed = novel.extended = (1 << figure.num_vertices) - 1
+        novel.dislikes = np.array(figure.hole.dislikes(vertices), dtype=np.int32)
+        novel.sum_dislikes = int(novel.dislikes.sum())
+        novel.stretch = sum(abs(dist(vertices[a], vertices[b]) / d - 1) for (a, b), d in zip(figure.edges, figure.orig_dists))
+        return novel
+
+    def placed_coords(self):
+        """Positions as a float (num_vertices, 2) array, with NaN for unplaced vertices."""
+        coords = self.coords.astype(np.float64)
+        for i in range(self.figure.num_vertices):
+            if not self.placed >> i & 1:
+                coords[i] = np.nan
+        return coords
 
     @property
-    def sum_dislikes(self):
-        return sum(self.dislikes)
+    def vertices(self):
+        """Positions as a list of (x, y) tuples, with (None, None) for unplaced vertices."""
+        return [tuple(c) if self.placed >> i & 1 else (None, None) for i, c in enumerate(self.coords.tolist())]
+
+    @property
+    def depth(self):
+        return self.extended.bit_count()
+
+    def position(self, vertex_index):
+        return tuple(self.coords[vertex_index].tolist())
+
+    def key(self):
+        """Return the placed vertices, frozen so they can go in a set; equal placements expand identically.
+        The placement itself rather than its hash, so two placements with colliding hashes are both kept."""
+        return (self.placed, self.coords.tobytes())
+
+    def added_stretch(self, vertex_index, next_pos):
+        """Return how much stretch placing vertex_index at next_pos adds, over its edges to placed vertices."""
+        added = 0.0
+        for edge in self.figure.adjacency[vertex_index]:
+            if self.placed >> edge & 1:
+                d = self.figure.adj_orig[vertex_index, edge]
+                added += abs(dist(next_pos, self.position(edge)) / d - 1)
+        return added
 
     def valid(self, vertex_index, next_pos):
         """Return True iff the part of the figure relating to making vertex_index next_pos is valid."""
         if not self.figure.hole.inside(next_pos):
             return False
-        for edge in self.adjacency[vertex_index]:
-            edge_pos = self.vertices[edge]
-            if edge_pos[0] is not None:
+        for edge in self.figure.adjacency[vertex_index]:
+            if self.placed >> edge & 1:
+                edge_pos = self.position(edge)
                 dee = dist(next_pos, edge_pos)
-                if dee < self.adj_dists[vertex_index, edge][0] or dee > self.adj_dists[vertex_index, edge][1]:
+                if dee < self.figure.adj_dists[vertex_index, edge][0] or dee > self.figure.adj_dists[vertex_index, edge][1]:
+                    return False
+                # the same exact rule as vaniver.search; one edge at a time is faster in scalar
+                if not edge_in_hole(self.figure.hole.points, LatticePoint(*next_pos), LatticePoint(*edge_pos)):
                     return False
-                for hedge in self.figure.hole.edges:
-                    if check_line_intersection([next_pos, edge_pos], hedge):
-                        return False 
         return True
 
     def valid_full(self):
         """Return True iff the figure is valid. This checks the validity of the whole figure."""
-        for vertex in self.vertices:
+        if self.placed != (1 << self.figure.num_vertices) - 1:
+            return False
+        vertices = self.vertices
+        for vertex in vertices:
             if not self.figure.hole.inside(vertex):
                 return False
         for edge in self.figure.edges:
-            edge0 = tuple(self.vertices[edge[0]])
-            edge1 = tuple(self.vertices[edge[1]])
-            if edge0 is None or edge1 is None:
-                return False
+            edge0 = vertices[edge[0]]
+            edge1 = vertices[edge[1]]
             dee = dist(edge0, edge1)
-            if dee < self.adj_dists[(edge[0], edge[1])][0] or dee > self.adj_dists[(edge[0], edge[1])][1]:
+            if dee < self.figure.adj_dists[(edge[0], edge[1])][0] or dee > self.figure.adj_dists[(edge[0], edge[1])][1]:
                 return False
-            for hedge in self.figure.hole.edges:
-                if check_line_intersection([edge0, edge1], hedge):
-                    return False 
+        a = [vertices[i] for i, _ in self.figure.edges]
+        b = [vertices[j] for _, j in self.figure.edges]
+        if not edges_in_hole(self.figure.hole.points, a, b, check_endpoints=False).all():
+            return False
+        if self.figure.budget is not None and self.stretch > self.figure.budget:
+            return False
         return True
 
     def begin(self, vertex_index, hole_index):
         """Initialize with the vertex_index at hole_index; return self."""
-        self.vertices[vertex_index] = self.figure.hole.vertices[hole_index]
-        self.to_extend = self.to_extend.union(self.adjacency[vertex_index])
-        self.extended.add(vertex_index)
-        self.dislikes = self.figure.hole.dislikes([self.vertices[vertex_index]])
+        pos = tuple(self.figure.hole.vertices[hole_index])
+        self.coords[vertex_index] = pos
+        self.placed |= 1 << vertex_index
+        self.extended |= 1 << vertex_index
+        self.to_extend = self.figure.adj_masks[vertex_index] & ~self.extended
+        self.dislikes = self.figure.hole.dist_dict[pos].copy()
+        self.sum_dislikes = int(self.dislikes.sum())
         return self
 
     def expand(self):
         """Return a list of partial figures or placeholder partial figures, each of which has been extended by the next edge removed from to_extend."""
-        if len(self.to_extend) == 0:
+        if self.to_extend == 0:
             return None
-        next_vertex = self.to_extend.pop()
-        self.extended.add(next_vertex)
+        next_vertex = self.figure.ordering(self)
+        self.to_extend &= ~(1 << next_vertex)
+        self.extended |= 1 << next_vertex
         return_list = []
         for next_pos in self.options(next_vertex):
             if next_pos is not None:
@@ -273,14 +425,14 @@ class partial_figure():
     def options(self, next_vertex):
         """Return a list of positions where it would be possible to place the next vertex."""
         # Later I check for other validity; should I just do integer validity here?
-        constraints = [(v, self.vertices[v]) for v in self.adjacency[next_vertex] if v in self.extended]
+        constraints = [(v, self.position(v)) for v in self.figure.adjacency[next_vertex] if self.placed >> v & 1]
         
         other_ind, other_pos = constraints[0]
         poss = {vadd(other_pos, vec) for vec in self.figure.adj_vecs[next_vertex, other_ind]}
         poss = {v for v in poss if v in self.figure.hole.inside_set}
         for constraint in constraints[1:]:
             other_ind, other_pos = constraint
-            [v for v in poss if vsub(other_pos, v) in self.figure.adj_vecs[next_vertex, other_ind]]
+            poss = {v for v in poss if vsub(v, other_pos) in self.figure.adj_vecs[next_vertex, other_ind]}
         return poss
         # elif len(constraints) == 2:
         #     return ring_intersection(self.figure.hole, constraints[0][0], constraints[1][0], constraints[0][1], constraints[1][1])
@@ -299,68 +451,194 @@ class partial_figure():
 
     def copy_with(self, next_vertex, next_pos):
         """Return a copy of self, extended by the next vertex at next_pos."""
+        stretch = self.stretch
+        if self.figure.budget is not None:
+            # prune as soon as the running sum goes over budget
+            stretch += self.added_stretch(next_vertex, next_pos)
+            if stretch > self.figure.budget:
+                return None
         if not self.valid(next_vertex, next_pos):
             return None
-        novel = partial_figure(self.figure)
-        novel.vertices = self.vertices.copy()
-        novel.vertices[next_vertex] = next_pos
-        novel.to_extend = self.to_extend.union([v for v in self.adjacency[next_vertex] if v not in self.extended])
-        novel.extended = self.extended.copy()
-        novel.dislikes = [min(a,b) for a,b in zip(self.dislikes, self.figure.hole.dislikes([next_pos]))]
-        if self.plot:
-            plot_hole(self.figure.hole.vertices)
-            pruned_edges = [e for e in self.figure.edges if e[0] in novel.extended and e[1] in novel.extended]
-            plot_figure(pruned_edges, novel.vertices)
-            plt.scatter(next_pos[0], next_pos[1], c='m')
-            plt.title(str(next_pos))
-            plt.show()
+        novel = partial_figure.__new__(partial_figure)
+        novel.figure = self.figure
+        novel.coords = self.coords.copy()
+        novel.coords[next_vertex] = next_pos
+        novel.placed = self.placed | 1 << next_vertex
+        novel.extended = self.extended
+        novel.to_extend = (self.to_extend | self.figure.adj_masks[next_vertex]) & ~self.extended
+        novel.dislikes = np.minimum(self.dislikes, self.figure.hole.dist_dict[next_pos])
+        novel.sum_dislikes = int(novel.dislikes.sum())
+        novel.stretch = stretch
         return novel
 
+class frontier():
+    def __init__(self, beam_width=None, max_size=None):
+        """Binary heap of partial figures ordered by sum_dislikes, preferring deeper figures on ties.
+
+        beam_width caps the live candidates per depth (number of placed vertices), and max_size caps
+        the live candidates overall; the worst candidates are dropped when either is exceeded."""
+        self.heap = []  # (sum_dislikes, -depth, id, candidate)
+        self.worst = {}  # depth -> max heap of (-sum_dislikes, -id) for the beam
+        self.depth_count = {}  # depth -> number of live candidates at that depth
+        self.dead = set()  # ids popped or dropped but possibly still sitting in a heap
+        self.seen = set()  # keys (any hashable) of every candidate ever pushed
+        self.ids = itertools.count()
+        self.size = 0
+        self.beam_width = beam_width
+        self.max_size = max_size
+        self.num_dropped = 0
+        self.num_duplicates = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, candidate):
+        """Add a candidate unless one with the same placement has been seen; return True if added."""
+        key = candidate.key()
+        if key in self.seen:
+            self.num_duplicates += 1
+            return False
+        self.seen.add(key)
+        depth = candidate.depth
+        entry_id = next(self.ids)
+        heapq.heappush(self.heap, (candidate.sum_dislikes, -depth, entry_id, candidate))
+        self.depth_count[depth] = self.depth_count.get(depth, 0) + 1
+        self.size += 1
+        if self.beam_width is not None:
+            worst = self.worst.setdefault(depth, [])
+            heapq.heappush(worst, (-candidate.sum_dislikes, -entry_id))
+            while self.depth_count[depth] > self.beam_width:
+                _, neg_id = heapq.heappop(worst)
+                if -neg_id not in self.dead:
+                    self.kill(-neg_id, depth)
+                    self.num_dropped += 1
+        if self.max_size is not None and self.size > self.max_size:
+            self.compact(self.max_size // 2)
+        elif len(self.dead) > max(1024, self.size):
+            self.compact(self.size)
+        return True
+
+    def kill(self, entry_id, depth):
+        """Mark an entry as no longer live; the heaps drop it lazily."""
+        self.dead.add(entry_id)
+        self.depth_count[depth] -= 1
+        self.size -= 1
+
+    def compact(self, size):
+        """Keep only the best size live candidates, rebuilding the heaps without dead entries."""
+        kept = heapq.nsmallest(size, (e for e in self.heap if e[2] not in self.dead))
+        self.num_dropped += self.size - len(kept)
+        heapq.heapify(kept)
+        self.heap = kept
+        self.dead = set()
+        self.size = len(kept)
+        self.depth_count = {}
+        self.worst = {}
+        for sum_dislikes, neg_depth, entry_id, _ in kept:
+            self.depth_count[-neg_depth] = self.depth_count.get(-neg_depth, 0) + 1
+            if self.beam_width is not None:
+                self.worst.setdefault(-neg_depth, []).append((-sum_dislikes, -entry_id))
+        for worst in self.worst.values():
+            heapq.heapify(worst)
+
+    def pop(self):
+        """Remove and return the best live candidate."""
+        while self.heap:
+            _, neg_depth, entry_id, candidate = heapq.heappop(self.heap)
+            if entry_id in self.dead:
+                if self.beam_width is None:
+                    self.dead.discard(entry_id)
+                continue
+            if self.beam_width is None:
+                self.depth_count[-neg_depth] -= 1
+                self.size -= 1
+            else:
+                self.kill(entry_id, -neg_depth)  # so the beam skips it later
+            return candidate
+        raise IndexError("pop from empty frontier")
+
+
 class search():
-    def __init__(self, candidates: list, target=None):
-        if len(candidates) == 0:
-            return None
+    def __init__(self, candidates: list, target=None, beam_width=None, max_candidates=None, best=None, stop=None, verbose=True, observer=None):
+        """Best-first search from candidates. Stops early at a finished figure with at most target dislikes.
+
+        best and stop are an optional shared multiprocessing Value and Event, so that searches in other
+        processes learn of the best finished figure and can all stop once one reaches target.
+        observer, an aray.observe.Observer, sees (step, coords, dislikes) of every expanded figure."""
         self.num_searched=0
-        self.candidates = set(candidates)
+        self.candidates = frontier(beam_width, max_candidates)
+        for candidate in candidates:
+            self.candidates.push(candidate)
         self.finished = None
         self.target = target
-    
-    def run(self):
-        while len(self.candidates) > 0 and (self.finished is None or self.finished.sum_dislikes > self.target):
-            self.step()
+        self.best = best
+        self.stop = stop
+        self.verbose = verbose
+        self.observer = observer
+
+    def done(self):
+        if self.finished is not None and self.target is not None and self.finished.sum_dislikes <= self.target:
+            return True
+        # checking the shared event takes a lock, so only do it every so often
+        return self.stop is not None and self.num_searched % 100 == 0 and self.stop.is_set()
+
+    def run(self, max_steps=None):
+        start = self.num_searched
+        with stage("search"):
+            while len(self.candidates) > 0 and not self.done():
+                if max_steps is not None and self.num_searched >= max_steps:
+                    break
+                self.step()
+        count("expanded", self.num_searched - start)
+        count("dropped", self.candidates.num_dropped)
+        count("duplicates", self.candidates.num_duplicates)
         return self.finished
 
+    def publish(self, e):
+        """Share a new finished figure with other processes, flagging them to stop if it reaches target."""
+        with self.best.get_lock():
+            if e.sum_dislikes < self.best.value:
+                self.best.value = e.sum_dislikes
+        if self.stop is not None and self.target is not None and e.sum_dislikes <= self.target:
+            self.stop.set()
+
+    def validate(self, e):
+        with stage("validate"):
+            return e.valid_full()
+
     def step(self):
-        """step randomly picks a candidate to expand from the set and expands it."""
-        # if target is not None and len(candidates[0].to_extend) == 0 and sum(candidates[0].dislikes) <= target:
-        #     return candidates[0]
-        # next_expansion = self.candidates.pop()
-        next_expansion = sorted(self.candidates, key=lambda f: f.sum_dislikes)[0]
-        self.candidates.remove(next_expansion)
-        if self.num_searched % 100 == 0:
-            print(self.num_searched, len(self.candidates), 
-            self.finished.sum_dislikes if self.finished else "-", 
-            len(next_expansion.extended), len(next_expansion.to_extend))
+        """step pops the candidate with the fewest dislikes from the frontier and expands it."""
+        next_expansion = self.candidates.pop()
+        if self.verbose and self.num_searched % 100 == 0:
+            print(self.num_searched, len(self.candidates),
+            self.finished.sum_dislikes if self.finished else "-",
+            next_expansion.depth, next_expansion.to_extend.bit_count())
+        if self.observer is not None:
+            self.observer.observe(self.num_searched, next_expansion.placed_coords, next_expansion.sum_dislikes)
         expansion = next_expansion.expand()
         if expansion is not None:
             for e in expansion:
                 if e is None:
                     continue
-                if len(e.to_extend) == 0 and e.valid_full():
-                    if self.finished is None:
-                        self.finished = e
-                    elif e.sum_dislikes < self.finished.sum_dislikes:
+                if e.to_extend == 0 and self.validate(e):
+                    if self.finished is None or e.sum_dislikes < self.finished.sum_dislikes:
                         self.finished = e
-                elif len(e.to_extend) > 0 and e not in self.candidates:
-                    self.candidates.add(e)
+                        if self.best is not None:
+                            self.publish(e)
+                elif e.to_extend != 0:
+                    self.candidates.push(e)
         self.num_searched += 1
 
 
 if __name__ == "__main__":
     numbers = [24] #[21, 24, 25, 26, 34, 35, 38, 39, 41]
+    watch = "--watch" in sys.argv  # draw the search live, without slowing it down
     for number in numbers:
-        p = problem(number)
-        result = p.figure.begin_search(best_sol=0)
+        # writes a timing record per problem when ARAY_PROFILE names a file
+        with Profile("construct", number) as run, (LiveView(number) if watch else Observer()) as view:
+            p = problem(number)
+            result = p.figure.begin_search(best_sol=0, observer=view)
+            run.info["dislikes"] = result.sum_dislikes if result is not None else None
         if result is None:
             print("No solution found")
         else:
@@ -0,0 +1,71 @@
+"""Compare vertex ordering strategies for the constructive search.
+
+For each problem and ordering, runs a best-first search until the first valid pose and records the
+nodes expanded and the time taken. Run from the repository root, e.g.
+
+    python -m vaniver.ordering_benchmark --problems 11 24 --max-steps 20000 --timeout 60
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from vaniver.construct import ORDERINGS, PROBLEM_FILEDIR, partial_figure, problem, search
+
+
+def first_valid(args):
+    """Search problem number with ordering until the first valid pose; return a result record."""
+    number, ordering, max_steps, timeout = args
+    start = time.time()
+    p = problem(number)
+    p.figure.ordering = ORDERINGS[ordering]
+    initial_candidates = [partial_figure(p.figure, vertex_index, hole_index) for hole_index in range(p.figure.hole.num_vertices) for vertex_index in range(p.figure.num_vertices)]
+    setup = time.time() - start
+    # any finished figure at all meets the target, so this stops at the first valid pose
+    s = search(initial_candidates, target=2**62, verbose=False)
+    while len(s.candidates) > 0 and s.finished is None and s.num_searched < max_steps and time.time() - start < timeout:
+        s.step()
+    return {
+        "problem": number,
+        "ordering": ordering,
+        "found": s.finished is not None,
+        "dislikes": s.finished.sum_dislikes if s.finished is not None else None,
+        "nodes": s.num_searched,
+        "setup_seconds": round(setup, 4),
+        "seconds": round(time.time() - start, 4),
+        "exhausted": len(s.candidates) == 0,
+    }
+
+
+def summarize(records):
+    """Print per-ordering totals: problems solved, nodes expanded and time over all runs."""
+    print(f"{'ordering':<16} {'found':>6} {'nodes':>10} {'seconds':>10}")
+    for ordering in ORDERINGS:
+        runs = [r for r in records if r["ordering"] == ordering]
+        if not runs:
+            continue
+        print(f"{ordering:<16} {sum(r['found'] for r in runs):>6} {sum(r['nodes'] for r in runs):>10} {sum(r['seconds'] for r in runs):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--problems", type=int, nargs="*", help="problem numbers, default all")
+    parser.add_argument("--orderings", nargs="*", default=list(ORDERINGS), choices=list(ORDERINGS))
+    parser.add_argument("--max-steps", type=int, default=10000)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", help="write one JSON record per line to this file")
+    args = parser.parse_args()
+    numbers = args.problems or sorted(int(f.split(".")[0]) for f in os.listdir(PROBLEM_FILEDIR) if f.endswith(".json"))
+    tasks = [(n, o, args.max_steps, args.timeout) for n in numbers for o in args.orderings]
+    records = []
+    with multiprocessing.Pool(args.processes) as pool:
+        for record in pool.imap_unordered(first_valid, tasks):
+            print(json.dumps(record))
+            records.append(record)
+    if args.output:
+        with open(args.output, "w") as f:
+            for record in sorted(records, key=lambda r: (r["problem"], r["ordering"])):
+                f.write(json.dumps(record) + "\n")
+    summarize(records)
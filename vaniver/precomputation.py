@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 problems = {}
 filedir = "problems"
 for filename in os.listdir(filedir):
+    if not filename.endswith(".json"):
+        continue
     with open(os.path.join(filedir,filename)) as file:
         problems[int(filename.split(".")[0])] = json.loads(file.read())
 
@@ -2,9 +2,14 @@ import json
 import math
 import os
 import random
+import sys
+import time
 
 import numpy as np
 
+from aray.types import Point
+from aray.valid import edges_in_hole
+
 PROBLEM_FILEDIR = "problems"
 SOLUTION_FILEDIR = "solutions"
 
@@ -16,15 +21,18 @@ class hole():
         self.vertices = vertices
         self.vertex_cycle = self.vertices + [self.vertices[0]]
         self.edges = list(zip(self.vertex_cycle[:-1], self.vertex_cycle[1:]))
+        self.points = [Point(x, y) for x, y in self.vertices]
 
     def inside(self, point):
-        """Given a list of (x,y) pairs in hole, calculate the winding number of the vectors from point to those pairs in hole."""
+        """Return True if point is inside the hole or on its boundary, by the winding number of the hole around point."""
         x, y = point
         sum_theta = 0
-        for h in self.vertex_cycle:
-            x1, y1 = h
-            sum_theta += math.atan2(y1-y, x1-x)
-        return abs(sum_theta) < math.pi / 2
+        for (x1, y1), (x2, y2) in self.edges:
+            cross = (x1-x)*(y2-y) - (y1-y)*(x2-x)
+            if cross == 0 and min(x1, x2) <= x <= max(x1, x2) and min(y1, y2) <= y <= max(y1, y2):
+                return True
+            sum_theta += math.atan2(cross, (x1-x)*(x2-x) + (y1-y)*(y2-y))
+        return abs(sum_theta) > math.pi
 
     def calc_dislikes(self, positions):
         """Calculates the minimum distance to a vertex in positions for each vertex in the hole."""
@@ -41,36 +49,70 @@ class figure():
         for edge in self.edges:
             edge_dist = dist(self.vertices[edge[0]], self.vertices[edge[1]])
             self.edge_dists.append([edge_dist * (1 - problem["epsilon"]/1000000.0), edge_dist * (1 + problem["epsilon"]/1000000.0)])
+        self.adjacency = {i: [] for i in range(len(self.vertices))}
+        for a, b in self.edges:
+            self.adjacency[a].append(b)
+            self.adjacency[b].append(a)
+
+    def flap(self, hinge, start):
+        """Return the vertices reachable from start without passing through hinge."""
+        seen = {start}
+        frontier = [start]
+        while frontier:
+            v = frontier.pop()
+            for w in self.adjacency[v]:
+                if w != hinge and w not in seen:
+                    seen.add(w)
+                    frontier.append(w)
+        return seen
 
 class pose():
-    def __init__(self, hole, figure):
+    def __init__(self, hole, figure, vertices=None):
         self.hole = hole
         self.figure = figure
-        self.valid = self.check_valid()
+        self.vertices = [list(v) for v in (figure.vertices if vertices is None else vertices)]
+        self.update()
+
+    def update(self):
+        self.violations = self.count_violations()
+        self.valid = self.violations == 0
         self.dislikes = self.calc_dislikes()
 
+    def copy(self):
+        return pose(self.hole, self.figure, self.vertices)
+
+    def count_violations(self):
+        """Count the vertices outside the hole, and the edges that are stretched or leave the hole.
+        Whether an edge leaves the hole is aray.valid's exact check, so edges through a reflex vertex count too."""
+        violations = sum(not self.hole.inside(v) for v in self.vertices)
+        a = np.array([self.vertices[i] for i, _ in self.figure.edges]).reshape(-1, 2)
+        b = np.array([self.vertices[j] for _, j in self.figure.edges]).reshape(-1, 2)
+        lo, hi = np.array(self.figure.edge_dists).reshape(-1, 2).T
+        d = ((a - b) ** 2).sum(axis=1)
+        stretched = (d < lo) | (d > hi)
+        inside = edges_in_hole(self.hole.points, a[~stretched], b[~stretched])
+        return violations + int(stretched.sum()) + int((~inside).sum())
+
     def check_valid(self):
         """Determines whether the figure fits within the hole. Checks both vertices and edges."""
-        for edge in self.figure.edges:
-            edge1 = self.figure.vertices[edge[0]]
-            edge2 = self.figure.vertices[edge[1]]
-            if not self.hole.inside(edge1):
-                return False
-            if not self.hole.inside(edge2):
-                return False
-            for hedge in self.hole.edges:
-                if check_line_intersection([edge1, edge2], hedge):
-                    return False 
-        return True
+        return self.count_violations() == 0
 
     def calc_dislikes(self):
-        return self.hole.calc_dislikes(self.figure.vertices)
+        return self.hole.calc_dislikes(self.vertices)
+
+    def energy(self, penalty=10000):
+        """Dislikes plus a penalty per violation, so valid poses always beat invalid ones."""
+        return self.dislikes + penalty * self.violations
 
     def move(self, vertex, x, y):
         """Move a single point by x,y, then recheck validity. """
+        self.vertices[vertex][0] += x
+        self.vertices[vertex][1] += y
+        self.update()
 
-def check_line_intersection(line1, line2):
-    """Given two line segments (each defined by two (x,y) pairs), return true if the two segments intersect and false if they do not."""
+def check_line_intersection(line1, line2, strict=False):
+    """Given two line segments (each defined by two (x,y) pairs), return true if the two segments intersect and false if they do not.
+    If strict, segments that only touch at an endpoint of either one don't count."""
     x1, y1 = line1[0]
     x2, y2 = line1[1]
     x3, y3 = line2[0]
@@ -78,14 +120,82 @@ def check_line_intersection(line1, line2):
     denom = (x1-x2)*(y3-y4) - (y1-y2)*(x3-x4)
     if denom == 0:
         return False
-    ua = ((x1*y2 - y1*x2) * (x3-x4) - (x1-x2) * (x3*y4 - y3*x4)) / denom
-    ub = ((x1*y2 - y1*x2) * (y3-y4) - (y1-y2) * (x3*y4 - y3*x4)) / denom
+    ua = ((x1-x3)*(y3-y4) - (y1-y3)*(x3-x4)) / denom
+    ub = ((x1-x3)*(y1-y2) - (y1-y3)*(x1-x2)) / denom
+    if strict:
+        return 0 < ua < 1 and 0 < ub < 1
     return 0 <= ua <= 1 and 0 <= ub <= 1
 
 
+# Lattice rotations about the origin, as (xx, xy, yx, yy) matrices; these keep integer points integer and lengths exact.
+ROTATIONS = [(0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0)]
+# Reflections in the x axis, y axis and both diagonals.
+REFLECTIONS = [(1, 0, 0, -1), (-1, 0, 0, 1), (0, 1, 1, 0), (0, -1, -1, 0)]
+
+def pick_flap(current, rng):
+    """Pick a hinge vertex and one side of it; return (hinge, flap vertices), or None if the hinge has no edges."""
+    hinge = rng.randrange(len(current.vertices))
+    if not current.figure.adjacency[hinge]:
+        return None
+    return hinge, current.figure.flap(hinge, rng.choice(current.figure.adjacency[hinge]))
+
+def transform_flap(current, rng, matrices):
+    """Pick a hinge vertex and one side of it, and map that side through a matrix about the hinge."""
+    picked = pick_flap(current, rng)
+    if picked is None:
+        return None
+    hinge, flap = picked
+    xx, xy, yx, yy = rng.choice(matrices)
+    hx, hy = current.vertices[hinge]
+    new_pose = current.copy()
+    for v in flap:
+        dx, dy = current.vertices[v][0] - hx, current.vertices[v][1] - hy
+        new_pose.vertices[v] = [hx + xx*dx + xy*dy, hy + yx*dx + yy*dy]
+    new_pose.update()
+    return new_pose
+
+def shift_vertex(current, rng):
+    """Move one vertex by a small random step."""
+    new_pose = current.copy()
+    new_pose.move(rng.randrange(len(current.vertices)), rng.randint(-2, 2), rng.randint(-2, 2))
+    return new_pose
+
+def rotate_subgraph(current, rng):
+    """Rotate one side of a hinge vertex by a multiple of 90 degrees about the hinge."""
+    return transform_flap(current, rng, ROTATIONS)
+
+def translate_flap(current, rng):
+    """Translate one side of a hinge vertex by a small random step, stretching only the edges to the hinge."""
+    picked = pick_flap(current, rng)
+    if picked is None:
+        return None
+    _, flap = picked
+    dx, dy = rng.randint(-3, 3), rng.randint(-3, 3)
+    new_pose = current.copy()
+    for v in flap:
+        new_pose.vertices[v] = [current.vertices[v][0] + dx, current.vertices[v][1] + dy]
+    new_pose.update()
+    return new_pose
+
+def reflect_hinge(current, rng):
+    """Reflect one side of a hinge vertex in an axis or diagonal through the hinge."""
+    return transform_flap(current, rng, REFLECTIONS)
+
+def snap_to_hole(current, rng):
+    """Move the pose vertex nearest to a random hole vertex right onto it."""
+    h = rng.choice(current.hole.vertices)
+    v = min(range(len(current.vertices)), key=lambda i: dist(h, current.vertices[i]))
+    new_pose = current.copy()
+    new_pose.vertices[v] = list(h)
+    new_pose.update()
+    return new_pose
+
+NEIGHBORHOODS = [shift_vertex, rotate_subgraph, translate_flap, reflect_hinge, snap_to_hole]
+
+
 class problem():
     def __init__(self, number):
-        json_state = json.load(os.path.join(PROBLEM_FILEDIR, str(number) + ".json"))
+        json_state = json.load(open(os.path.join(PROBLEM_FILEDIR, str(number) + ".json")))
         self.number = number
         self.hole = hole(json_state["hole"])
         self.figure = figure(json_state)
@@ -93,47 +203,68 @@ class problem():
         self.current_pose = self.initial_pose
 
 class search():
-    def __init__(self, problem, neighborhoods, random_nbhd = 0.5):
-        """Sets up a search. random_nbhd is the percentage of times a random neighborhood is picked, rather than the best one."""
+    def __init__(self, problem, neighborhoods=NEIGHBORHOODS, exploration=1.0, seed=None, start=None):
+        """Sets up a search. Neighborhoods are picked by UCB1 on energy improvement per CPU millisecond,
+        with exploration scaling the confidence bonus."""
         self.problem = problem
-        self.current_pose = self.problem.initial_pose
+        self.current_pose = self.problem.initial_pose if start is None else start
         self.best_pose = self.current_pose
-        self.valid = self.problem.initial_pose.valid
-        self.neighborhoods = {n: (1,2) for n in neighborhoods}
-        self.random_nbhd = random_nbhd
+        self.valid = self.current_pose.valid
+        self.neighborhoods = {n: [0, 0.0] for n in neighborhoods}  # neighborhood -> [uses, total reward]
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.num_steps = 0
 
     def pick_neighborhood(self):
         """Pick a neighborhood function from the list of neighborhoods."""
-        if random.rand() < self.random_nbhd:
-            return random.choice(self.problem.neighborhoods.keys())
-        best_nbrhd = (None, (0, 1))
-        for nbrhd in self.neighborhoods.items():
-            if nbrhd[1][0] / nbrhd[1][0] > best_nbrhd[1][0] / best_nbrhd[1][0]:
-                best_nbrhd = nbrhd
-        self.neighborhoods[best_nbrhd[0]][1][0] += 1
-        return best_nbrhd[0]
+        for nbrhd, (uses, _) in self.neighborhoods.items():
+            if uses == 0:
+                return nbrhd
+        # rewards are in energy per ms, so scale the means into [0, 1] by the best one
+        scale = max(reward / uses for uses, reward in self.neighborhoods.values()) or 1.0
+        log_total = math.log(sum(uses for uses, _ in self.neighborhoods.values()))
+        def ucb(item):
+            uses, reward = item[1]
+            return reward / uses / scale + self.exploration * math.sqrt(2 * log_total / uses)
+        return max(self.neighborhoods.items(), key=ucb)[0]
 
     def step(self):
         """Takes a step from the current pose."""
         step_fn = self.pick_neighborhood()
-        new_pose = step_fn(self.current_pose)
-        if new_pose.valid and not self.valid:
-            self.valid = True
-            self.best_pose = new_pose
-            step_fn
-            self.neighborhoods[step_fn][1] += 1
-        elif new_pose.valid:
-            if new_pose.dislikes < self.best_pose.dislikes:
+        start = time.process_time()
+        new_pose = step_fn(self.current_pose, self.rng)
+        elapsed_ms = max((time.process_time() - start) * 1000, 1e-3)
+        reward = 0.0
+        if new_pose is not None:
+            improvement = self.current_pose.energy() - new_pose.energy()
+            reward = max(improvement, 0) / elapsed_ms
+            if improvement >= 0:
+                self.current_pose = new_pose
+            if new_pose.valid and (not self.valid or new_pose.dislikes < self.best_pose.dislikes):
+                self.valid = True
                 self.best_pose = new_pose
-                self.neighborhoods[step_fn][1] += 1
-        elif new_pose.dislikes < self.best_pose.dislikes:
-            self.best_pose = new_pose
-            self.neighborhoods[step_fn][1] += 1
+        stats = self.neighborhoods[step_fn]
+        stats[0] += 1
+        stats[1] += reward
+        self.num_steps += 1
 
-def main():
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+        return self.best_pose if self.valid else None
+
+def main(steps=10000):
     """Main function."""
+    os.makedirs(SOLUTION_FILEDIR, exist_ok=True)
     for i in range(1, 78):
-        if any([i in x for x in os.listdir(SOLUTION_FILEDIR)]):
+        if any([x.startswith(f"{i}-") for x in os.listdir(SOLUTION_FILEDIR)]):
             continue
-        problem = problem(i)
-        search(problem, {})
\ No newline at end of file
+        p = problem(i)
+        s = search(p)
+        result = s.run(steps)
+        print(i, result.dislikes if result else "-", {n.__name__: stats for n, stats in s.neighborhoods.items()})
+        if result is not None:
+            json.dump({"vertices": result.vertices}, open(os.path.join(SOLUTION_FILEDIR, f"{i}-{result.dislikes}-{time.time()}.json"), 'w'))
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
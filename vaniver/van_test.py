@@ -1,6 +1,7 @@
 import pytest
 
-from vaniver.search import check_line_intersection
+from vaniver.search import check_line_intersection, hole, figure, pose, search, shift_vertex, snap_to_hole, translate_flap
+from vaniver.construct import frontier
 
 
 def test_check_line_intersection_1():
@@ -10,4 +11,196 @@ def test_check_line_intersection_1():
     # Intersecting ones
     assert(check_line_intersection([[0,0], [1,1]], [[1,0], [0,1]]))
     assert(check_line_intersection([[0,0], [1,1]], [[1,0], [1,1]]))
-    assert(check_line_intersection([[0,0], [1,1]], [[-1,0], [1,0]]))
\ No newline at end of file
+    assert(check_line_intersection([[0,0], [1,1]], [[-1,0], [1,0]]))
+
+class fake_figure():
+    def __init__(self, sum_dislikes, vertices):
+        self.sum_dislikes = sum_dislikes
+        self.vertices = vertices
+        self.depth = sum(v is not None for v in vertices)
+
+    def key(self):
+        return hash(tuple(self.vertices))
+
+
+def test_ring_has_axis_deltas():
+    """Rings include their on-axis points, e.g. (10, 0) at squared distance 100."""
+    from vaniver.construct import ring_options
+    ring = ring_options((0, 0), 100, 100)
+    assert {(10, 0), (-10, 0), (0, 10), (0, -10), (6, 8)} <= ring
+    assert all(x * x + y * y == 100 for x, y in ring)
+
+
+def test_construct_solves_problem_11():
+    """Problem 11 needs axis-aligned edges, and has a zero dislike placement."""
+    from vaniver.construct import problem as construct_problem, partial_figure, search as construct_search
+    f = construct_problem(11).figure
+    initial = [partial_figure(f, v, h) for h in range(f.hole.num_vertices) for v in range(f.num_vertices)]
+    result = construct_search(initial, target=0, verbose=False).run()
+    assert result is not None and result.sum_dislikes == 0 and result.valid_full()
+
+
+def test_hole_bfs_matches_aray():
+    """vaniver and aray share one hole_bfs rule, including before anything sits on a hole vertex."""
+    from aray.problem import Problem
+    from aray.partial import Partial
+    from aray.ordering import hole_bfs
+    from vaniver.construct import problem as construct_problem, partial_figure, order_hole_bfs
+    f = construct_problem(18).figure
+    partial = Partial.from_problem(Problem.get(18))
+    highest = max(range(f.num_vertices), key=lambda v: (len(f.adjacency[v]), -v))
+    assert highest != 0 and hole_bfs(partial) == highest
+    p = partial_figure(f)
+    p.to_extend = (1 << f.num_vertices) - 1
+    assert order_hole_bfs(p) == highest
+
+
+def test_frontier_order_and_dedup():
+    """Pops come out by dislikes, deeper first on ties, and repeated placements are skipped."""
+    f = frontier()
+    assert f.push(fake_figure(5, [(0, 0), None]))
+    assert f.push(fake_figure(3, [(1, 0), None]))
+    assert f.push(fake_figure(3, [(1, 0), (2, 0)]))
+    assert not f.push(fake_figure(1, [(0, 0), None]))
+    assert len(f) == 3
+    assert [f.pop().sum_dislikes for _ in range(3)] == [3, 3, 5]
+    assert len(f) == 0
+    with pytest.raises(IndexError):
+        f.pop()
+
+
+def test_frontier_beam_and_cap():
+    """The beam keeps the best per depth, and the cap keeps the best overall."""
+    f = frontier(beam_width=2)
+    for i in range(5):
+        f.push(fake_figure(10 - i, [(i, 0), None]))
+    assert len(f) == 2
+    assert [f.pop().sum_dislikes for _ in range(2)] == [6, 7]
+    f = frontier(max_size=10)
+    for i in range(11):
+        f.push(fake_figure(i, [(i, 0), None]))
+    assert len(f) == 5
+    assert f.pop().sum_dislikes == 0
+
+
+def square_problem():
+    """A 10x10 square hole and a two-edge path figure, in the shape search expects."""
+    class fake_problem():
+        pass
+    p = fake_problem()
+    p.hole = hole([[0, 0], [10, 0], [10, 10], [0, 10]])
+    p.figure = figure({"figure": {"vertices": [[1, 1], [1, 3], [3, 3]], "edges": [[0, 1], [1, 2]]}, "epsilon": 0})
+    p.initial_pose = pose(p.hole, p.figure)
+    return p
+
+
+def test_hole_inside_and_flap():
+    p = square_problem()
+    assert p.hole.inside((5, 5))
+    assert p.hole.inside((0, 5))
+    assert not p.hole.inside((11, 5))
+    assert p.figure.flap(1, 2) == {2}
+    assert p.figure.flap(1, 0) == {0}
+
+
+def test_edge_through_reflex_vertex_leaves_hole():
+    """An edge can leave the hole through a reflex vertex without crossing any hole edge, or its midpoint leaving."""
+    u = hole([[-10, -10], [10, -10], [10, 10], [7, 10], [7, 3], [3, 3], [3, 10], [-10, 10]])
+    def violations(b):
+        f = figure({"figure": {"vertices": [[-4, -4], b], "edges": [[0, 1]]}, "epsilon": 1000000})
+        return pose(u, f).count_violations()
+    assert violations([2, 2]) == 0
+    assert violations([7, 7]) == 1  # (3, 3) to (7, 7) runs through the notch
+
+
+def test_construct_agrees_on_reflex_vertex():
+    """construct rejects the edge through the notch's reflex corner, like search.count_violations."""
+    from vaniver.construct import figure as construct_figure, partial_figure
+    u = [[-10, -10], [10, -10], [10, 10], [7, 10], [7, 3], [3, 3], [3, 10], [-10, 10]]
+    for end, ok in (([2, 2], True), ([7, 7], False)):
+        problem = {"hole": u, "epsilon": 0, "figure": {"vertices": [[-4, -4], end], "edges": [[0, 1]]}}
+        f = construct_figure(problem)
+        p = partial_figure(f)
+        p.coords[0] = (-4, -4)
+        p.placed = p.extended = 1
+        p.to_extend = f.adj_masks[0]
+        assert p.valid(1, tuple(end)) == ok
+        assert (pose(hole(u), figure(problem)).count_violations() == 0) == ok
+        done = p.copy_with(1, tuple(end))
+        assert (done is not None and done.valid_full()) == ok
+
+
+def test_translate_flap_moves_one_side():
+    """A translation moves one side of a hinge as a block, never the whole figure."""
+    import random
+    p = square_problem()
+    rng = random.Random(0)
+    start = p.initial_pose
+    for _ in range(50):
+        moved_pose = translate_flap(start, rng)
+        moved = [i for i, (a, b) in enumerate(zip(start.vertices, moved_pose.vertices)) if a != b]
+        assert len(moved) < len(start.vertices)
+        steps = {(b[0] - a[0], b[1] - a[1]) for a, b in zip(start.vertices, moved_pose.vertices) if a != b}
+        assert len(steps) <= 1
+        if moved:
+            assert set(moved) in ({0}, {2}, {0, 1}, {1, 2})
+
+
+def test_bandit_tries_every_neighborhood_then_exploits():
+    """Each neighborhood is tried once, then the one with the best reward rate is favoured."""
+    s = search(square_problem(), neighborhoods=[shift_vertex, snap_to_hole], exploration=0.1, seed=0)
+    first = {s.pick_neighborhood()}
+    s.neighborhoods[shift_vertex] = [1, 0.0]
+    first.add(s.pick_neighborhood())
+    assert first == {shift_vertex, snap_to_hole}
+    s.neighborhoods[snap_to_hole] = [1, 5.0]
+    assert s.pick_neighborhood() is snap_to_hole
+    s.run(50)
+    assert sum(uses for uses, _ in s.neighborhoods.values()) == 52
+    assert s.best_pose.valid
+
+
+def test_globalist_budget():
+    """Under globalist one edge may go past epsilon, but the running sum of stretch prunes placements."""
+    from vaniver.construct import figure as construct_figure, partial_figure
+    problem = {"hole": [[0, 0], [10, 0], [10, 10], [0, 10]], "epsilon": 40000,
+               "figure": {"vertices": [[0, 0], [0, 4], [4, 4]], "edges": [[0, 1], [1, 2]]}}
+    def start(f):
+        p = partial_figure(f)
+        p.coords[0] = (2, 2)
+        p.placed = p.extended = 1
+        p.to_extend = f.adj_masks[0]
+        return p
+    assert start(construct_figure(problem)).copy_with(1, (3, 6)) is None
+    f = construct_figure(problem, globalist=True)
+    p = start(f).copy_with(1, (3, 6))
+    assert p is not None and p.stretch == pytest.approx(1 / 16)
+    assert p.copy_with(2, (7, 7)) is None
+    done = p.copy_with(2, (7, 6))
+    assert done is not None and done.valid_full()
+
+
+def test_search_reports_to_observer():
+    """The observer sees every expansion, with unplaced vertices as NaN."""
+    import numpy as np
+    from aray.observe import Observer
+    from vaniver.construct import figure as construct_figure, partial_figure, search as construct_search
+    class recorder(Observer):
+        def __init__(self):
+            self.frames = []
+        def observe(self, iteration, pose, score):
+            self.frames.append((iteration, pose(), score))
+    problem = {"hole": [[0, 0], [10, 0], [10, 10], [0, 10]], "epsilon": 0,
+               "figure": {"vertices": [[0, 0], [0, 4], [4, 4]], "edges": [[0, 1], [1, 2]]}}
+    f = construct_figure(problem)
+    p = partial_figure(f)
+    p.coords[0] = (2, 2)
+    p.placed = p.extended = 1
+    p.to_extend = f.adj_masks[0]
+    observer = recorder()
+    s = construct_search([p], verbose=False, observer=observer)
+    s.run(max_steps=3)
+    assert [i for i, _, _ in observer.frames] == list(range(s.num_searched))
+    _, coords, score = observer.frames[0]
+    assert coords[0].tolist() == [2, 2] and np.isnan(coords[1:]).all()
+    assert score == p.sum_dislikes